@@ -0,0 +1,496 @@
+"""
+Crop Data Benchmarks
+Small timing harness for the crop dataset loaders and lookup structures
+
+Usage:
+    python benchmark.py startup [--excel PATH] [--repeat N]
+    python benchmark.py hierarchy [--excel PATH] [--repeat N]
+    python benchmark.py workers [--excel PATH] [--workers N]
+    python benchmark.py memory [--excel PATH]
+    python benchmark.py search [--excel PATH] [--repeat N]
+    python benchmark.py bulk [--excel PATH] [--repeat N] [--locations N]
+    python benchmark.py rules [--repeat N] [--profiles N]
+    python benchmark.py recompute [--excel PATH] [--rows N] [--workers N]
+    python benchmark.py filter [--excel PATH] [--repeat N]
+    python benchmark.py shc [--cards N]
+    python benchmark.py similar [--excel PATH] [--queries N]
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from bitmap_index import VillageBitmapIndex
+from crop_dataset import (
+    CROP_COLUMNS, LOCATION_COLUMNS, SOIL_COLUMNS, clean_dataframe, load_crop_dataframe,
+    load_snapshot_matrices, read_snapshot, write_snapshot
+)
+from crop_recommendation import CropRecommendationService
+from crop_rules import AMENDABLE_ATTRIBUTES, ATTRIBUTE_LEVELS, RULE_ENGINE, SuitabilityTable
+from location_store import LocationStore, _deep_sizeof
+from shc_ingest import ingest_csv
+from soil_bands import BAND_BOUNDARIES
+from soil_scoring import SOIL_SCORER
+from suitability_recompute import recompute_dataframe
+from village_similarity import VillageSimilarityIndex
+
+
+DEFAULT_EXCEL = 'cropresults_with_state (1).xlsx'
+
+
+def _time(fn, repeat):
+    """Run fn `repeat` times and return (best seconds, last result)"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def bench_startup(args):
+    """Compare parsing the workbook with reading the columnar snapshot"""
+    xlsx_time, df = _time(lambda: clean_dataframe(pd.read_excel(args.excel)), args.repeat)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot = os.path.join(tmp, 'crop.snapshot')
+        write_time, _ = _time(lambda: write_snapshot(df, snapshot, excel_path=args.excel), 1)
+        snapshot_time, snap_df = _time(lambda: read_snapshot(snapshot), args.repeat)
+        size = sum(os.path.getsize(os.path.join(snapshot, f)) for f in os.listdir(snapshot))
+
+    assert snap_df.equals(df), "snapshot does not round-trip the workbook"
+
+    print(f"Rows: {len(df)}  columns: {len(df.columns)}")
+    print(f"xlsx size:            {os.path.getsize(args.excel) / 1024:10.1f} KiB")
+    print(f"snapshot size:        {size / 1024:10.1f} KiB")
+    print(f"read_excel + cleanup: {xlsx_time * 1000:10.1f} ms")
+    print(f"snapshot build:       {write_time * 1000:10.1f} ms")
+    print(f"snapshot load:        {snapshot_time * 1000:10.1f} ms")
+    print(f"speedup:              {xlsx_time / snapshot_time:10.1f}x")
+
+
+def _legacy_hierarchy(df):
+    """The row-by-row builder LocationStore replaced, kept as the baseline"""
+    dropdown_data = {}
+    for _, row in df.iterrows():
+        block_villages = (
+            dropdown_data
+            .setdefault(row['STATE'], {})
+            .setdefault(row['DISTRICT NAME'], {})
+            .setdefault(row['BLOCK NAME'], [])
+        )
+        if row['VILLAGE NAME'] not in block_villages:
+            block_villages.append(row['VILLAGE NAME'])
+    return dropdown_data
+
+
+def bench_hierarchy(args):
+    """Compare the iterrows hierarchy build with the vectorized LocationStore"""
+    df = load_crop_dataframe(args.excel)
+    legacy_time, legacy = _time(lambda: _legacy_hierarchy(df), args.repeat)
+    store_time, store = _time(lambda: LocationStore(df), args.repeat)
+
+    print(f"Rows: {len(df)}")
+    print(f"iterrows hierarchy:   {legacy_time * 1000:10.1f} ms  {_deep_sizeof(legacy) / 1024:8.0f} KiB")
+    print(f"LocationStore build:  {store_time * 1000:10.1f} ms  "
+          f"{store.build_stats['hierarchy_bytes'] / 1024:8.0f} KiB hierarchy, "
+          f"{store.build_stats['total_bytes'] / 1024:.0f} KiB with all lookups")
+
+
+def _private_kib(pid='self'):
+    """Memory only this process holds (USS): private clean + dirty pages"""
+    total = 0
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            if line.startswith(('Private_Clean:', 'Private_Dirty:')):
+                total += int(line.split()[1])
+    return total
+
+
+def _exercise(service):
+    """Touch every lookup a worker serves so inherited pages get used"""
+    for state in service.get_states():
+        for district in service.get_districts(state):
+            for block in service.get_blocks(state, district):
+                for village in service.get_villages(state, district, block):
+                    service.get_crop_suitability(state, district, block, village)
+    service.get_dropdown_data()
+
+
+def _fork_workers(count, excel, preloaded):
+    """Fork workers like a preforking server and return each one's private KiB"""
+    readers, pids = [], []
+    for _ in range(count):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            gc.enable()
+            sys.stdout = open(os.devnull, 'w')
+            service = preloaded or CropRecommendationService(excel, shared_memory=True)
+            _exercise(service)
+            os.write(write_fd, str(_private_kib()).encode())
+            os.close(write_fd)
+            # Stay alive until the parent has measured every worker and kills us
+            time.sleep(3600)
+        os.close(write_fd)
+        readers.append(read_fd)
+        pids.append(pid)
+
+    sizes = []
+    for fd in readers:
+        sizes.append(int(os.read(fd, 64).decode()))
+        os.close(fd)
+    for pid in pids:
+        os.kill(pid, 9)
+        os.waitpid(pid, 0)
+    return sizes
+
+
+def bench_workers(args):
+    """
+    Private memory per forked worker, with and without a preloaded dataset
+
+    Fails when a preloaded worker still holds more than a quarter of what a
+    worker that loads its own copy holds, i.e. when memory no longer stays
+    flat as workers are added.
+    """
+    own = _fork_workers(args.workers, args.excel, None)
+
+    devnull, sys.stdout = sys.stdout, open(os.devnull, 'w')
+    service = CropRecommendationService(args.excel, shared_memory=True)
+    sys.stdout = devnull
+    gc.disable()
+    gc.freeze()
+    shared = _fork_workers(args.workers, args.excel, service)
+    gc.unfreeze()
+    gc.enable()
+
+    print(f"Workers: {args.workers}")
+    print(f"own copy per worker:  {sum(own) / len(own) / 1024:8.1f} MiB private  {own}")
+    print(f"preloaded + shared:   {sum(shared) / len(shared) / 1024:8.1f} MiB private  {shared}")
+    if max(shared) > 0.25 * min(own):
+        print("FAIL: per-worker memory is not flat in shared mode")
+        sys.exit(1)
+    print("OK: each additional worker adds only its private working set")
+
+
+def bench_memory(args):
+    """Bytes per row of the crop data as object strings vs dictionary-encoded"""
+    encoded = load_crop_dataframe(args.excel)
+    # The pre-categorical layout: one Python str reference per cell
+    plain = encoded.astype(object)
+    store = LocationStore(encoded, matrices=load_snapshot_matrices(args.excel))
+    rows = len(encoded)
+
+    def per_row(df, columns):
+        return df[columns].memory_usage(index=False, deep=True).sum() / rows
+
+    print(f"Rows: {rows}")
+    print(f"{'columns':<12}{'object B/row':>14}{'encoded B/row':>15}{'ratio':>8}")
+    for name, columns in (('location', LOCATION_COLUMNS), ('soil', SOIL_COLUMNS), ('crop', CROP_COLUMNS), ('all', list(encoded.columns))):
+        before, after = per_row(plain, columns), per_row(encoded, columns)
+        print(f"{name:<12}{before:14.1f}{after:15.1f}{before / after:7.1f}x")
+    matrix_bytes = store.crop_codes.nbytes + store.soil_codes.nbytes
+    print(f"store crop+soil code matrices: {matrix_bytes / rows:.1f} B/row "
+          f"({store.crop_codes.dtype}, {len(store.crop_labels) + len(store.soil_labels)} shared labels)")
+
+
+SEARCH_QUERIES = ['a', 'ak', 'akole', 'agastinager', 'pimpalgav', 'kolapur', 'nasik', 'savarkutte', 'bk']
+
+
+def bench_search(args):
+    """Latency of the location search index per query"""
+    store = LocationStore(load_crop_dataframe(args.excel))
+    build_time, _ = _time(lambda: store.search('warmup'), 1)
+    print(f"Index build (first search): {build_time * 1000:.1f} ms")
+
+    worst = 0.0
+    for query in SEARCH_QUERIES:
+        runs = 200 * args.repeat
+        start = time.perf_counter()
+        for _ in range(runs):
+            results = store.search(query, limit=10)
+        per_query = (time.perf_counter() - start) / runs
+        worst = max(worst, per_query)
+        top = results[0]['label'] if results else '-'
+        print(f"{query!r:<14} {per_query * 1e6:8.0f} us  {len(results):2d} results  top: {top}")
+    print(f"worst query: {worst * 1e6:.0f} us")
+
+
+def bench_bulk(args):
+    """
+    Bulk suitability for many locations, index join plus serialization
+
+    Fails when resolving and serializing --locations tuples takes a second
+    or more.
+    """
+    devnull, sys.stdout = sys.stdout, open(os.devnull, 'w')
+    service = CropRecommendationService(args.excel)
+    sys.stdout = devnull
+
+    villages = [
+        (state, district, block, village)
+        for state in service.get_states()
+        for district in service.get_districts(state)
+        for block in service.get_blocks(state, district)
+        for village in service.get_villages(state, district, block)
+    ]
+    rng = random.Random(0)
+    # Mostly known villages, with a few misses mixed in
+    locations = [rng.choice(villages) for _ in range(args.locations)]
+    for i in range(0, len(locations), 50):
+        locations[i] = locations[i][:3] + ('No Such Village',)
+
+    def run():
+        lines, not_found = service.get_bulk_suitability(locations)
+        return '\n'.join(lines), not_found
+
+    total, (body, not_found) = _time(run, args.repeat)
+    single, _ = _time(lambda: [service.get_crop_suitability(*location) for location in locations[:5000]], 1)
+
+    print(f"Locations: {len(locations)}  not found: {not_found}  body: {len(body) / 1024 / 1024:.1f} MiB")
+    print(f"bulk join + NDJSON:          {total * 1000:8.1f} ms")
+    print(f"single lookups (projected):  {single * len(locations) / 5000 * 1000:8.1f} ms, without serialization")
+    if total >= 1.0:
+        print("FAIL: bulk suitability took a second or more")
+        sys.exit(1)
+    print("OK")
+
+
+def bench_rules(args):
+    """Per-profile cost of the compiled crop rules, one profile vs a large batch"""
+    rng = np.random.default_rng(0)
+    columns = {
+        name: rng.choice(np.array(levels, dtype=object), size=args.profiles)
+        for name, levels in ATTRIBUTE_LEVELS.items()
+    }
+    one = {name: values[0] for name, values in columns.items()}
+
+    runs = 2000
+    single, _ = _time(lambda: [RULE_ENGINE.evaluate_one(one) for _ in range(runs)], args.repeat)
+    build_time, table = _time(lambda: SuitabilityTable.build(RULE_ENGINE), 1)
+    lookup, _ = _time(lambda: [table.evaluate_one(one) for _ in range(runs)], args.repeat)
+    encode_time, codes = _time(lambda: RULE_ENGINE.encode_columns(columns), args.repeat)
+    batch_time, labels = _time(lambda: RULE_ENGINE.evaluate_codes(codes), args.repeat)
+    bits_time, _ = _time(lambda: RULE_ENGINE.evaluate_codes(codes, with_bits=True), args.repeat)
+
+    sample = [{name: values[i] for name, values in columns.items()} for i in range(1000)]
+    assert (RULE_ENGINE.evaluate_codes(RULE_ENGINE.encode(sample)) == labels[:1000]).all()
+    dict_time, _ = _time(lambda: RULE_ENGINE.evaluate(sample), args.repeat)
+
+    print(f"Crops: {len(RULE_ENGINE.crops)}  attributes: {len(RULE_ENGINE.attributes)}")
+    print(f"N=1 (engine, packed ints):         {single / runs * 1e6:10.2f} us/profile")
+    print(f"N=1 (precomputed table):           {lookup / runs * 1e6:10.2f} us/profile"
+          f"  ({len(table.packed)} profiles, {table.packed.nbytes / 1024 / 1024:.1f} MiB, built in {build_time:.2f}s)")
+    print(f"N=1000 (dict profiles, evaluate):  {dict_time / len(sample) * 1e6:10.2f} us/profile")
+    print(f"N={args.profiles} encode_columns:       {encode_time / args.profiles * 1e6:10.3f} us/profile")
+    print(f"N={args.profiles} evaluate_codes:       {batch_time / args.profiles * 1e6:10.3f} us/profile"
+          f"  ({batch_time * 1000:.0f} ms total)")
+    print(f"N={args.profiles} with condition bits: {bits_time / args.profiles * 1e6:10.3f} us/profile"
+          f"  ({bits_time * 1000:.0f} ms total)")
+
+    score_one, _ = _time(lambda: [SOIL_SCORER.score(one) for _ in range(runs)], args.repeat)
+    score_codes = SOIL_SCORER.encode(sample)
+    score_batch, _ = _time(lambda: SOIL_SCORER.score_codes(score_codes), args.repeat)
+    print(f"soil scores, all crops, N=1:       {score_one / runs * 1e6:10.2f} us/profile")
+    print(f"soil scores, all crops, N=1000:    {score_batch / len(sample) * 1e6:10.3f} us/profile")
+
+    uncertain = {name: dict.fromkeys(levels, 1.0) for name, levels in ATTRIBUTE_LEVELS.items()}
+    exact, _ = _time(lambda: RULE_ENGINE.probabilities(uncertain), args.repeat)
+    print(f"label probabilities, all uncertain: {exact * 1000:9.2f} ms"
+          f"  ({int(np.prod([len(levels) for levels in ATTRIBUTE_LEVELS.values()]))} band combinations)")
+
+    # What-if search over every soil level combination, worst crop
+    RULE_ENGINE.what_if(one, RULE_ENGINE.crops[0])
+    worst = max(_time(lambda: RULE_ENGINE.what_if(one, crop), args.repeat)[0] for crop in RULE_ENGINE.crops)
+    print(f"what-if search (worst crop):       {worst * 1000:10.2f} ms")
+
+
+def bench_recompute(args):
+    """
+    Recompute every row's suitability from its soil columns
+
+    The workbook is tiled up to --rows rows; fails when recomputing, diffing
+    and writing the snapshot takes 10 seconds or more.
+    """
+    df = load_crop_dataframe(args.excel)
+    df = pd.concat([df] * -(-args.rows // len(df)), ignore_index=True).iloc[:args.rows]
+
+    recompute_time, (result, report, summary) = _time(lambda: recompute_dataframe(df, args.workers), 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        write_time, _ = _time(lambda: write_snapshot(result, os.path.join(tmp, 'crop.snapshot')), 1)
+        report_time, _ = _time(lambda: report.to_csv(os.path.join(tmp, 'diff.csv'), index=False), 1)
+
+    total = recompute_time + write_time + report_time
+    print(f"Rows: {summary['rows']}  changed cells: {summary['cells_changed']}  changed rows: {summary['rows_changed']}")
+    print(f"recompute + diff:  {recompute_time * 1000:8.1f} ms")
+    print(f"write snapshot:    {write_time * 1000:8.1f} ms")
+    print(f"write diff CSV:    {report_time * 1000:8.1f} ms")
+    print(f"total:             {total:8.2f} s")
+    if total >= 10:
+        print("FAIL: recompute took 10 seconds or more")
+        sys.exit(1)
+    print("OK")
+
+
+FILTER_QUERIES = {
+    'Cotton High, Soyabean >= Moderate, EC Non-Saline': {'and': [
+        {'column': 'Cotton', 'eq': 'Highly Suitable'},
+        {'column': 'Soyabean', 'at_least': 'Moderately Suitable'},
+        {'column': 'EC', 'eq': 'Non-Saline'}
+    ]},
+    'Wheat or Rice High, not Pune': {'and': [
+        {'or': [{'column': 'Wheat', 'eq': 'Highly Suitable'}, {'column': 'Rice', 'eq': 'Highly Suitable'}]},
+        {'not': {'column': 'DISTRICT NAME', 'eq': 'PUNE'}}
+    ]},
+    'Low nitrogen, pH Acidic, Onion not Not Suitable': {'and': [
+        {'column': 'NITROGEN', 'eq': 'Low'},
+        {'column': 'pH', 'eq': 'Acidic'},
+        {'not': {'column': 'Onion', 'eq': 'Not Suitable'}}
+    ]}
+}
+
+
+def _pandas_mask(df, expression):
+    """The same filter as a pandas boolean mask, for comparison"""
+    if 'and' in expression or 'or' in expression:
+        masks = [_pandas_mask(df, operand) for operand in expression.get('and', expression.get('or'))]
+        combine = np.logical_and if 'and' in expression else np.logical_or
+        return combine.reduce(masks)
+    if 'not' in expression:
+        return ~_pandas_mask(df, expression['not'])
+    values = df[expression['column']].astype(str).str.strip().str.lower()
+    if 'at_least' in expression:
+        return values.isin(['highly suitable', 'moderately suitable'])
+    return (values == expression['eq'].lower()).to_numpy()
+
+
+def bench_filter(args):
+    """Compound village filters, bitmap index vs pandas masks"""
+    df = load_crop_dataframe(args.excel)
+    store = LocationStore(df)
+    build_time, index = _time(lambda: VillageBitmapIndex.build(store), 1)
+    villages = df.iloc[store.village_rows()[1]]
+    print(f"Villages: {index.build_stats['villages']}  bitmaps: {index.build_stats['bitmaps']}"
+          f"  ({index.build_stats['bytes'] / 1024:.0f} KiB, built in {build_time * 1000:.0f} ms)")
+
+    runs = 200
+    for name, expression in FILTER_QUERIES.items():
+        bitmap_time, match = _time(lambda: [index.evaluate(expression) for _ in range(runs)][-1], args.repeat)
+        page_time, page = _time(lambda: [match.positions(limit=100) for _ in range(runs)][-1], args.repeat)
+        pandas_time, mask = _time(lambda: _pandas_mask(villages, expression), args.repeat)
+        assert len(match) == int(mask.sum()) and (page == np.flatnonzero(mask)[:100]).all()
+        print(f"{name:<50} {len(match):6d} villages  bitmap {bitmap_time / runs * 1e6:7.1f} us"
+              f"  page {page_time / runs * 1e6:6.1f} us  pandas {pandas_time * 1e6:8.0f} us")
+
+
+def bench_shc(args):
+    """
+    Soil Health Card CSV ingestion, banding and evaluation of --cards cards
+
+    Readings are drawn around each attribute's band boundaries; fails when
+    a million cards take a minute or more.
+    """
+    rng = np.random.default_rng(0)
+    columns = {'Card No': np.char.zfill(np.arange(args.cards).astype(str), 9)}
+    for name in AMENDABLE_ATTRIBUTES:
+        _, boundaries, _ = BAND_BOUNDARIES[name]
+        low, high = boundaries[0] * 0.5, boundaries[-1] * 1.5
+        columns[name] = rng.uniform(low, high, args.cards).round(2).astype(str)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source, output = os.path.join(tmp, 'cards.csv'), os.path.join(tmp, 'results.csv')
+        with open(source, 'w', encoding='utf-8') as handle:
+            handle.write(','.join(columns) + '\n')
+            handle.write('\n'.join(','.join(row) for row in zip(*columns.values())) + '\n')
+        size = os.path.getsize(source)
+        summary = ingest_csv([source], output)
+        written = os.path.getsize(output)
+
+    per_million = summary['seconds'] / summary['rows'] * 1e6
+    print(f"Cards: {summary['rows']}  input: {size / 1024 / 1024:.0f} MiB  output: {written / 1024 / 1024:.0f} MiB")
+    print(f"read + band + evaluate + write: {summary['seconds']:8.2f} s  ({per_million:.1f} s per million cards)")
+    if per_million >= 60:
+        print("FAIL: a million cards would take a minute or more")
+        sys.exit(1)
+    print("OK")
+
+
+def bench_similar(args):
+    """
+    Similar-village queries, KD-tree vs a scan of every village
+
+    Fails when a query's worst case is 10 ms or more.
+    """
+    store = LocationStore(load_crop_dataframe(args.excel))
+    build_time, index = _time(lambda: VillageSimilarityIndex.build(store), 1)
+    print(f"Villages: {index.build_stats['villages']}  tree points: {index.build_stats['points']}"
+          f"  (built in {build_time * 1000:.0f} ms)")
+
+    rng = np.random.default_rng(0)
+    features = index.features
+    times = []
+    for i in rng.integers(0, len(features), args.queries).tolist():
+        start = time.perf_counter()
+        villages = index.nearest(features[i], 10, exclude=index.keys[i])
+        times.append(time.perf_counter() - start)
+        distances = np.sqrt(((features - features[i]) ** 2).sum(axis=1))
+        distances[i] = np.inf
+        assert [village['distance'] for village in villages] == np.round(np.sort(distances)[:10], 4).tolist()
+    scan_time, _ = _time(lambda: np.argsort(((features - features[0]) ** 2).sum(axis=1))[:10], args.repeat)
+
+    times = np.array(times) * 1000
+    print(f"k=10 query: median {np.median(times):.2f} ms  worst {times.max():.2f} ms"
+          f"  (full scan {scan_time * 1000:.2f} ms, results checked against it)")
+    if times.max() >= 10:
+        print("FAIL: a query took 10 ms or more")
+        sys.exit(1)
+    print("OK")
+
+
+def main():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--excel', default=DEFAULT_EXCEL, help='Path to the crop workbook')
+    common.add_argument('--repeat', type=int, default=3, help='Timed repetitions (best is reported)')
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('startup', parents=[common], help='Workbook parse vs snapshot load').set_defaults(func=bench_startup)
+    sub.add_parser('hierarchy', parents=[common], help='iterrows vs vectorized hierarchy build').set_defaults(func=bench_hierarchy)
+    workers = sub.add_parser('workers', parents=[common], help='Private memory per forked worker')
+    workers.add_argument('--workers', type=int, default=4, help='Number of workers to fork')
+    workers.set_defaults(func=bench_workers)
+    sub.add_parser('memory', parents=[common], help='Bytes per row, object vs dictionary-encoded').set_defaults(func=bench_memory)
+    sub.add_parser('search', parents=[common], help='Location search latency per query').set_defaults(func=bench_search)
+    bulk = sub.add_parser('bulk', parents=[common], help='Bulk suitability for many locations')
+    bulk.add_argument('--locations', type=int, default=50000, help='Number of locations per request')
+    bulk.set_defaults(func=bench_bulk)
+    rules = sub.add_parser('rules', parents=[common], help='Crop rule engine cost per soil profile')
+    rules.add_argument('--profiles', type=int, default=1000000, help='Profiles in the large batch')
+    rules.set_defaults(func=bench_rules)
+    recompute = sub.add_parser('recompute', parents=[common], help='Vectorized suitability recompute of every row')
+    recompute.add_argument('--rows', type=int, default=1000000, help='Rows to recompute (workbook tiled)')
+    recompute.add_argument('--workers', type=int, default=None, help='Process pool size')
+    recompute.set_defaults(func=bench_recompute)
+    sub.add_parser('filter', parents=[common], help='Compound village filters on bitmaps').set_defaults(func=bench_filter)
+    shc = sub.add_parser('shc', parents=[common], help='Soil Health Card CSV ingestion')
+    shc.add_argument('--cards', type=int, default=1000000, help='Cards in the generated CSV')
+    shc.set_defaults(func=bench_shc)
+    similar = sub.add_parser('similar', parents=[common], help='Similar-village queries on the KD-tree')
+    similar.add_argument('--queries', type=int, default=500, help='Villages queried')
+    similar.set_defaults(func=bench_similar)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,367 @@
+"""
+Bitmap Index Module
+One compressed bitmap of villages per (column, value), combined with
+AND/OR/NOT for compound crop and soil filters
+"""
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from crop_dataset import LOCATION_COLUMNS
+from crop_rules import SUITABILITY_LABELS
+
+# Villages per container; a bitmap keeps one container per non-empty chunk
+CHUNK_BITS = 16
+CHUNK_SIZE = 1 << CHUNK_BITS
+
+# Chunks with at most this many villages are kept as a sorted uint16 array
+# (2 bytes a village), denser ones as a 8 KiB uint64 bitset
+ARRAY_MAX = 4096
+
+# Set bits per byte value, for numpy releases without np.bitwise_count
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint16)
+
+
+def _popcounts(words: np.ndarray) -> np.ndarray:
+    """Set bits per uint64 word"""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words)
+    return _POPCOUNT[words.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+def _cardinality(container: np.ndarray) -> int:
+    """Villages in one container"""
+    if container.dtype == np.uint16:
+        return len(container)
+    return int(_popcounts(container).sum())
+
+
+def _to_words(container: np.ndarray) -> np.ndarray:
+    """Bitset form of a container (a copy for arrays, the container itself for bitsets)"""
+    if container.dtype == np.uint64:
+        return container
+    bits = np.zeros(CHUNK_SIZE, dtype=bool)
+    bits[container] = True
+    return np.packbits(bits, bitorder='little').view(np.uint64)
+
+
+def _offsets(container: np.ndarray, start: int = 0, limit: Optional[int] = None) -> np.ndarray:
+    """
+    Sorted offsets of a container from ``start`` on, at most ``limit`` of them
+
+    Bitsets are decoded only over the non-zero words the page needs.
+    """
+    if container.dtype == np.uint16:
+        offsets = container[np.searchsorted(container, start):] if start else container
+        return (offsets if limit is None else offsets[:limit]).astype(np.int64)
+    first = start >> 6
+    words = container[first:].copy()
+    if len(words):
+        words[0] &= ~np.uint64((1 << (start & 63)) - 1)
+    nonzero = np.flatnonzero(words)
+    if limit is not None:
+        nonzero = nonzero[:np.searchsorted(np.cumsum(_popcounts(words[nonzero])), limit) + 1]
+    bits = np.flatnonzero(np.unpackbits(words[nonzero].view(np.uint8), bitorder='little'))
+    offsets = (nonzero[bits >> 6] + first) * 64 + (bits & 63)
+    return offsets if limit is None else offsets[:limit]
+
+
+def _compact(container: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Container after an operation, or None if it is empty
+
+    Arrays that outgrow ARRAY_MAX become bitsets. Bitsets stay bitsets:
+    operation results are short-lived, and decoding one back to an array
+    would cost more than the memory it saves.
+    """
+    if _cardinality(container) == 0:
+        return None
+    if container.dtype == np.uint16 and len(container) > ARRAY_MAX:
+        return _to_words(container)
+    return container
+
+
+def _contains(words: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """Which of a set of offsets are set in a bitset"""
+    offsets = offsets.astype(np.uint64)
+    return ((words[offsets >> np.uint64(6)] >> (offsets & np.uint64(63))) & np.uint64(1)).astype(bool)
+
+
+def _and(a: np.ndarray, b: np.ndarray) -> Optional[np.ndarray]:
+    if a.dtype == np.uint16 and b.dtype == np.uint16:
+        return _compact(np.intersect1d(a, b, assume_unique=True))
+    if a.dtype == np.uint16:
+        return _compact(a[_contains(b, a)])
+    if b.dtype == np.uint16:
+        return _compact(b[_contains(a, b)])
+    return _compact(a & b)
+
+
+def _or(a: np.ndarray, b: np.ndarray) -> Optional[np.ndarray]:
+    if a.dtype == np.uint16 and b.dtype == np.uint16:
+        return _compact(np.union1d(a, b).astype(np.uint16))
+    return _compact(_to_words(a) | _to_words(b))
+
+
+def _and_not(a: np.ndarray, b: np.ndarray) -> Optional[np.ndarray]:
+    if a.dtype == np.uint16 and b.dtype == np.uint16:
+        return _compact(np.setdiff1d(a, b, assume_unique=True))
+    if a.dtype == np.uint16:
+        return _compact(a[~_contains(b, a)])
+    return _compact(a & ~_to_words(b))
+
+
+class Bitmap:
+    """
+    Compressed set of village positions
+
+    Positions are split into 65536-wide chunks, each held as a sorted
+    offset array when sparse or a bitset when dense (the container scheme of
+    Roaring bitmaps). Set operations work chunk by chunk on whole numpy
+    arrays, so combining bitmaps costs microseconds per chunk.
+    """
+
+    __slots__ = ('_chunks', '_cardinality')
+
+    def __init__(self, chunks: Optional[Dict[int, np.ndarray]] = None):
+        """
+        Args:
+            chunks: Chunk number -> non-empty container, in ascending order
+        """
+        self._chunks = chunks or {}
+        self._cardinality: Optional[int] = None
+
+    @classmethod
+    def from_positions(cls, positions: np.ndarray) -> 'Bitmap':
+        """Bitmap of sorted, distinct positions"""
+        positions = np.asarray(positions, dtype=np.int64)
+        chunk_ids = positions >> CHUNK_BITS
+        bounds = np.flatnonzero(np.diff(chunk_ids)) + 1
+        chunks = {}
+        for part in np.split(positions, bounds) if len(positions) else []:
+            container = (part & (CHUNK_SIZE - 1)).astype(np.uint16)
+            chunks[int(part[0] >> CHUNK_BITS)] = _to_words(container) if len(container) > ARRAY_MAX else container
+        return cls(chunks)
+
+    @classmethod
+    def full(cls, size: int) -> 'Bitmap':
+        """Bitmap of positions 0 to size - 1"""
+        return cls.from_positions(np.arange(size, dtype=np.int64))
+
+    def __len__(self) -> int:
+        if self._cardinality is None:
+            self._cardinality = sum(_cardinality(container) for container in self._chunks.values())
+        return self._cardinality
+
+    def __and__(self, other: 'Bitmap') -> 'Bitmap':
+        return Bitmap(self._merge(other, _and, keys=[k for k in self._chunks if k in other._chunks]))
+
+    def __or__(self, other: 'Bitmap') -> 'Bitmap':
+        chunks = {}
+        for key in sorted(self._chunks.keys() | other._chunks.keys()):
+            if key not in other._chunks:
+                chunks[key] = self._chunks[key]
+            elif key not in self._chunks:
+                chunks[key] = other._chunks[key]
+            else:
+                chunks[key] = _or(self._chunks[key], other._chunks[key])
+        return Bitmap(chunks)
+
+    def __sub__(self, other: 'Bitmap') -> 'Bitmap':
+        chunks = {}
+        for key, container in self._chunks.items():
+            if key in other._chunks:
+                container = _and_not(container, other._chunks[key])
+            if container is not None:
+                chunks[key] = container
+        return Bitmap(chunks)
+
+    def _merge(self, other: 'Bitmap', operation, keys: List[int]) -> Dict[int, np.ndarray]:
+        """Apply a container operation to the chunks both bitmaps hold"""
+        chunks = {}
+        for key in keys:
+            container = operation(self._chunks[key], other._chunks[key])
+            if container is not None:
+                chunks[key] = container
+        return chunks
+
+    def positions(self, after: int = -1, limit: Optional[int] = None) -> np.ndarray:
+        """
+        Sorted positions greater than ``after``, at most ``limit`` of them
+
+        Chunks wholly before ``after`` are skipped without being decoded.
+        """
+        parts = []
+        remaining = limit
+        for key, container in self._chunks.items():
+            base = key << CHUNK_BITS
+            if base + CHUNK_SIZE <= after + 1:
+                continue
+            values = _offsets(container, max(after + 1 - base, 0), remaining) + base
+            if remaining is not None:
+                remaining -= len(values)
+            parts.append(values)
+            if remaining == 0:
+                break
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+    def nbytes(self) -> int:
+        """Memory held by the containers"""
+        return sum(container.nbytes for container in self._chunks.values())
+
+
+class VillageBitmapIndex:
+    """
+    Bitmaps of the villages of a LocationStore per (column, value)
+
+    Covers the state, district and block names, every soil band column and
+    every crop's suitability label. A filter is a JSON-style expression
+    tree evaluated as bitmap AND/OR/NOT:
+
+    - ``{"column": "Cotton", "eq": "Highly Suitable"}``
+    - ``{"column": "EC", "in": ["Non-Saline", "Slightly Saline"]}``
+    - ``{"column": "Soyabean", "at_least": "Moderately Suitable"}`` (crop
+      columns only, ordered as SUITABILITY_LABELS)
+    - ``{"and": [...]}``, ``{"or": [...]}``, ``{"not": {...}}``
+
+    Column names and values are matched case-insensitively and without
+    surrounding whitespace.
+    """
+
+    def __init__(self, keys: List[Tuple[str, str, str, str]],
+                 bitmaps: Dict[str, Dict[str, Bitmap]], values: Dict[str, Dict[str, str]],
+                 crop_columns: List[str], build_stats: Dict[str, Any]):
+        """
+        Use ``VillageBitmapIndex.build`` rather than calling this directly
+
+        Args:
+            keys: (state, district, block, village) per village position
+            bitmaps: Column -> value -> villages with that value
+            values: Lowercased column -> lowercased value -> (column, value)
+                as stored, for case-insensitive lookups
+            crop_columns: Columns holding suitability labels
+            build_stats: Timing and size figures of the build
+        """
+        self.keys = keys
+        self._bitmaps = bitmaps
+        self._columns = {column.strip().lower(): column for column in bitmaps}
+        self._values = values
+        self._crop_columns = set(crop_columns)
+        self._all = Bitmap.full(len(keys))
+        self.build_stats = build_stats
+
+    @classmethod
+    def build(cls, store) -> 'VillageBitmapIndex':
+        """Index the distinct villages of a LocationStore"""
+        start = time.perf_counter()
+        keys, positions = store.village_rows()
+
+        columns: Dict[str, Tuple[np.ndarray, List[Any]]] = {}
+        for level, column in enumerate(LOCATION_COLUMNS[:3]):
+            names = [key[level].strip() for key in keys]
+            labels, codes = np.unique(np.array(names, dtype=object), return_inverse=True) if names else ([], np.zeros(0, dtype=np.int64))
+            columns[column] = (np.asarray(codes).ravel(), list(labels))
+        soil_codes = np.asarray(store.soil_codes)[positions]
+        for i, column in enumerate(store.soil_columns):
+            columns[column] = (soil_codes[:, i], list(store.soil_labels))
+        crop_codes = np.asarray(store.crop_codes)[positions]
+        for i, column in enumerate(store.crop_columns):
+            columns[column] = (crop_codes[:, i], list(store.crop_labels))
+
+        bitmaps: Dict[str, Dict[str, Bitmap]] = {}
+        values: Dict[str, Dict[str, str]] = {}
+        for column, (codes, labels) in columns.items():
+            # One stable sort per column; each value's villages are then a
+            # contiguous, ascending run
+            order = np.argsort(codes, kind='stable')
+            sorted_codes = codes[order]
+            bounds = np.flatnonzero(np.diff(sorted_codes)) + 1
+            column_bitmaps = bitmaps.setdefault(column, {})
+            for run in np.split(order, bounds) if len(order) else []:
+                code = int(codes[run[0]])
+                if code < 0:
+                    continue
+                value = str(labels[code]).strip()
+                existing = column_bitmaps.get(value)
+                bitmap = Bitmap.from_positions(run)
+                column_bitmaps[value] = existing | bitmap if existing is not None else bitmap
+                values.setdefault(column.strip().lower(), {})[value.lower()] = value
+
+        build_stats = {
+            'seconds': time.perf_counter() - start,
+            'villages': len(keys),
+            'bitmaps': sum(len(column_bitmaps) for column_bitmaps in bitmaps.values()),
+            'bytes': sum(bitmap.nbytes() for column_bitmaps in bitmaps.values() for bitmap in column_bitmaps.values())
+        }
+        return cls(keys, bitmaps, values, list(store.crop_columns), build_stats)
+
+    def columns(self) -> Dict[str, List[str]]:
+        """Filterable columns with their values"""
+        return {column: sorted(column_bitmaps) for column, column_bitmaps in self._bitmaps.items()}
+
+    def evaluate(self, expression: Dict[str, Any]) -> Bitmap:
+        """
+        Villages matching a filter expression
+
+        Raises:
+            ValueError: For a malformed expression or an unknown column
+        """
+        if not isinstance(expression, dict):
+            raise ValueError('filter expression must be an object')
+        if 'and' in expression or 'or' in expression:
+            operator = 'and' if 'and' in expression else 'or'
+            operands = expression[operator]
+            if not isinstance(operands, list) or not operands:
+                raise ValueError(f'"{operator}" needs a non-empty list of expressions')
+            bitmaps = [self.evaluate(operand) for operand in operands]
+            if operator == 'and':
+                # Smallest first keeps every intermediate result small
+                bitmaps.sort(key=len)
+            result = bitmaps[0]
+            for bitmap in bitmaps[1:]:
+                result = result & bitmap if operator == 'and' else result | bitmap
+            return result
+        if 'not' in expression:
+            return self._all - self.evaluate(expression['not'])
+        return self._leaf(expression)
+
+    def _leaf(self, expression: Dict[str, Any]) -> Bitmap:
+        """Villages matching one column condition"""
+        name = expression.get('column')
+        column = self._columns.get(str(name).strip().lower()) if name is not None else None
+        if column is None:
+            raise ValueError(f'Unknown filter column: {name}')
+
+        if 'eq' in expression:
+            wanted = [expression['eq']]
+        elif 'in' in expression:
+            wanted = expression['in']
+            if not isinstance(wanted, list):
+                raise ValueError('"in" needs a list of values')
+        elif 'at_least' in expression:
+            if column not in self._crop_columns:
+                raise ValueError(f'"at_least" only applies to crop columns, not {column}')
+            lowered = [label.lower() for label in SUITABILITY_LABELS]
+            minimum = str(expression['at_least']).strip().lower()
+            if minimum not in lowered:
+                raise ValueError(f"Unknown suitability: {expression['at_least']}")
+            wanted = list(SUITABILITY_LABELS[lowered.index(minimum):])
+        else:
+            raise ValueError('a column condition needs "eq", "in" or "at_least"')
+
+        # Values absent from the data match no villages
+        values = self._values.get(column.strip().lower(), {})
+        bitmaps = [self._bitmaps[column][values[key]] for key in
+                   (str(value).strip().lower() for value in wanted) if key in values]
+        if not bitmaps:
+            return Bitmap()
+        result = bitmaps[0]
+        for bitmap in bitmaps[1:]:
+            result = result | bitmap
+        return result
+
+    def village(self, position: int) -> Dict[str, str]:
+        """JSON-ready village at a position"""
+        state, district, block, village = self.keys[position]
+        return {'state': state, 'district': district, 'block': block, 'village': village}
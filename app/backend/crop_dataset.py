@@ -0,0 +1,503 @@
+"""
+Crop Dataset Module
+Loads the soil/crop workbook through a columnar snapshot so that workers
+do not have to parse the xlsx with openpyxl on every start
+"""
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows: rebuilds there are not serialized across processes
+    fcntl = None
+
+
+LOCATION_COLUMNS = ['STATE', 'DISTRICT NAME', 'BLOCK NAME', 'VILLAGE NAME']
+
+SOIL_COLUMNS = [
+    'NITROGEN', 'PHOSPHORUS', 'POTASSIUM', 'OC', 'EC', 'pH',
+    'COPPER', 'BORON', 'SULPHUR', 'IRON', 'ZINC', 'MANGANESE',
+    'SUMMER TEMPERATURE', 'WINTER TEMPERATURE', 'MONSOON TEMPERATURE',
+    'Rainfall overall'
+]
+
+CROP_COLUMNS = [
+    'Sugarcane', 'Cotton', 'Soyabean', 'Rice', 'Jowar',
+    'Tur (Pigeon Pea)', 'Wheat', 'Groundnut', 'Onion', 'Tomato',
+    'Potato', 'Garlic'
+]
+
+# Repeated strings (names, bands, suitability labels) are held as pandas
+# categoricals: small integer codes plus one dictionary per column. Values
+# are decoded back to strings only when a response is serialized.
+CATEGORICAL_COLUMNS = LOCATION_COLUMNS + SOIL_COLUMNS + CROP_COLUMNS
+
+# Column groups that are also stored as one row-aligned code matrix with a
+# shared label table, so lookups can memory-map them straight from disk
+MATRIX_GROUPS = {
+    'crop': CROP_COLUMNS,
+    'soil': SOIL_COLUMNS
+}
+
+# Bump whenever the on-disk layout or the cleanup rules change so that
+# existing snapshots are rebuilt instead of being read with stale rules
+SNAPSHOT_FORMAT_VERSION = 3
+SNAPSHOT_META_FILE = 'meta.json'
+# Every write goes to a new "v<ns>-<pid>" directory inside the snapshot;
+# this file names the current one and is replaced atomically
+SNAPSHOT_POINTER_FILE = 'CURRENT'
+
+# A partitioned dataset is a directory holding one workbook and/or snapshot
+# per state, named after the state: "<STATE>.xlsx" / "<STATE>.snapshot"
+PARTITION_EXTENSIONS = ('.xlsx', '.snapshot')
+
+
+def clean_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Apply the cleanup every consumer of the workbook expects
+
+    Column names are stripped and the merged-cell location columns are
+    forward/backward filled so that every row carries its full location.
+    Location, soil and crop columns are then dictionary-encoded (see
+    ``CATEGORICAL_COLUMNS``).
+    """
+    df.columns = [str(col).strip() for col in df.columns]
+    location_cols = [col for col in LOCATION_COLUMNS if col in df.columns]
+    if location_cols:
+        df[location_cols] = (
+            df[location_cols]
+            .ffill()
+            .bfill()
+            .astype(str)
+        )
+    categorical_cols = [col for col in CATEGORICAL_COLUMNS if col in df.columns]
+    if categorical_cols:
+        df[categorical_cols] = df[categorical_cols].astype('category')
+    return df
+
+
+def dataset_fingerprint(df: pd.DataFrame) -> str:
+    """
+    Short content hash of a cleaned DataFrame
+
+    Identical data yields the same fingerprint in every process, unlike a
+    per-process reload counter, so it is safe to expose to clients.
+    """
+    digest = hashlib.sha1('\x1f'.join(map(str, df.columns)).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+def snapshot_path_for(excel_path: str) -> str:
+    """Default snapshot directory that sits next to the workbook"""
+    return os.path.splitext(excel_path)[0] + '.snapshot'
+
+
+def snapshot_version_path(snapshot_path: str) -> str:
+    """
+    Directory holding the current version of a snapshot
+
+    Readers resolve this once and read every file from it, so a rebuild
+    that moves the pointer meanwhile is never seen halfway. Snapshots
+    written before versioning hold their files directly.
+    """
+    try:
+        with open(os.path.join(snapshot_path, SNAPSHOT_POINTER_FILE), 'r', encoding='utf-8') as f:
+            name = f.read().strip()
+    except OSError:
+        return snapshot_path
+    return os.path.join(snapshot_path, name) if name else snapshot_path
+
+
+def _version_time(name: str) -> Optional[int]:
+    """Creation time (ns) encoded in a snapshot version name, None for other entries"""
+    if not name.startswith('v'):
+        return None
+    try:
+        return int(name[1:].split('-', 1)[0])
+    except ValueError:
+        return None
+
+
+@contextmanager
+def snapshot_rebuild_lock(snapshot_path: str):
+    """
+    Hold an exclusive lock file next to a snapshot while rebuilding it
+
+    Processes that find the snapshot stale wait here, so the workbook is
+    parsed and written once; without fcntl or a writable directory the
+    rebuild simply runs unlocked.
+    """
+    handle = None
+    if fcntl is not None:
+        try:
+            handle = open(os.path.normpath(snapshot_path) + '.lock', 'a')
+        except OSError:
+            handle = None
+    if handle is None:
+        yield
+        return
+    with handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def snapshot_is_fresh(excel_path: str, snapshot_path: Optional[str] = None) -> bool:
+    """
+    Check whether the snapshot can be used instead of the workbook
+
+    A snapshot is fresh when it was written with the current format version
+    and is at least as new as the workbook. If the workbook is absent the
+    snapshot is the only source and is considered fresh.
+    """
+    snapshot_path = snapshot_path or snapshot_path_for(excel_path)
+    meta_path = os.path.join(snapshot_version_path(snapshot_path), SNAPSHOT_META_FILE)
+    if not os.path.exists(meta_path):
+        return False
+
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+
+    if meta.get('format') != SNAPSHOT_FORMAT_VERSION:
+        return False
+    if not os.path.exists(excel_path):
+        return True
+
+    source = os.stat(excel_path)
+    if meta.get('source', {}).get('size') != source.st_size:
+        return False
+    return os.path.getmtime(meta_path) >= source.st_mtime
+
+
+def _smallest_code_dtype(n_categories: int) -> np.dtype:
+    """Smallest signed integer type that can hold the codes plus -1 for NaN"""
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def _json_scalar(value: Any) -> Any:
+    """Convert numpy scalars to plain Python values for the metadata file"""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def encode_matrix(df: pd.DataFrame, columns: List[str]) -> Tuple[np.ndarray, List[Any]]:
+    """
+    Dictionary-encode several columns against one shared label table
+
+    Args:
+        df: Source DataFrame
+        columns: Columns to encode, in matrix column order
+
+    Returns:
+        (codes, labels): a rows x columns integer matrix where -1 marks a
+        missing value, and the sorted labels the codes index into
+    """
+    labels = sorted(set().union(*(df[col].dropna().unique().tolist() for col in columns)), key=str)
+    codes = np.empty((len(df), len(columns)), dtype=_smallest_code_dtype(len(labels)))
+    for j, col in enumerate(columns):
+        codes[:, j] = pd.Categorical(df[col], categories=labels).codes
+    return codes, labels
+
+
+def write_snapshot(df: pd.DataFrame, snapshot_path: str, excel_path: Optional[str] = None) -> str:
+    """
+    Write a cleaned DataFrame as a dictionary-encoded columnar snapshot
+
+    Every column is one memory-mappable ``.npy`` array of codes with its
+    values in ``meta.json``, plus the row-aligned ``MATRIX_GROUPS``. Each
+    write is a new version directory that the pointer file then names
+    (see ``snapshot_version_path``); versions older than the previous one
+    are removed.
+
+    Returns:
+        The snapshot directory path
+    """
+    version = f"v{time.time_ns()}-{os.getpid()}"
+    version_path = os.path.join(snapshot_path, version)
+    os.makedirs(version_path)
+
+    columns = []
+    for i, col in enumerate(df.columns):
+        categorical = isinstance(df[col].dtype, pd.CategoricalDtype)
+        if categorical:
+            codes, categories = df[col].cat.codes.to_numpy(), df[col].cat.categories
+        else:
+            codes, categories = pd.factorize(df[col], use_na_sentinel=True)
+        file_name = f"col{i:03d}.npy"
+        np.save(os.path.join(version_path, file_name), codes.astype(_smallest_code_dtype(len(categories))))
+        columns.append({
+            'name': col,
+            'file': file_name,
+            'categories': [_json_scalar(v) for v in categories.tolist()],
+            'categorical': categorical
+        })
+
+    matrices = {}
+    for name, group in MATRIX_GROUPS.items():
+        group = [col for col in group if col in df.columns]
+        if not group:
+            continue
+        codes, labels = encode_matrix(df, group)
+        file_name = f"{name}_codes.npy"
+        np.save(os.path.join(version_path, file_name), codes)
+        matrices[name] = {
+            'file': file_name,
+            'columns': group,
+            'labels': [_json_scalar(v) for v in labels]
+        }
+
+    meta = {
+        'format': SNAPSHOT_FORMAT_VERSION,
+        'rows': len(df),
+        'columns': columns,
+        'matrices': matrices,
+        'created': time.time()
+    }
+    if excel_path and os.path.exists(excel_path):
+        source = os.stat(excel_path)
+        meta['source'] = {
+            'file': os.path.basename(excel_path),
+            'size': source.st_size,
+            'mtime': source.st_mtime
+        }
+
+    # Complete before the pointer names it
+    with open(os.path.join(version_path, SNAPSHOT_META_FILE), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    previous = os.path.basename(snapshot_version_path(snapshot_path))
+    pointer_tmp = os.path.join(snapshot_path, f"{SNAPSHOT_POINTER_FILE}.tmp-{os.getpid()}")
+    with open(pointer_tmp, 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(pointer_tmp, os.path.join(snapshot_path, SNAPSHOT_POINTER_FILE))
+
+    # The previous version may still be being opened by a reader that
+    # resolved the pointer just before; anything older (including files of
+    # an unversioned snapshot) is unreferenced
+    cutoff = _version_time(previous)
+    if cutoff is not None:
+        for name in os.listdir(snapshot_path):
+            created = _version_time(name)
+            if created is not None and created < cutoff:
+                shutil.rmtree(os.path.join(snapshot_path, name), ignore_errors=True)
+            elif name == SNAPSHOT_META_FILE or name.endswith('.npy'):
+                os.remove(os.path.join(snapshot_path, name))
+    return snapshot_path
+
+
+def read_snapshot(snapshot_path: str, mmap: bool = True) -> pd.DataFrame:
+    """
+    Read a snapshot written by ``write_snapshot``
+
+    Args:
+        snapshot_path: Snapshot directory
+        mmap: Memory-map the code arrays instead of reading them into memory
+
+    Returns:
+        DataFrame with the same columns, values and dtypes as the cleaned workbook
+    """
+    snapshot_path = snapshot_version_path(snapshot_path)
+    with open(os.path.join(snapshot_path, SNAPSHOT_META_FILE), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+
+    data = {}
+    for column in meta['columns']:
+        codes = np.load(os.path.join(snapshot_path, column['file']), mmap_mode='r' if mmap else None)
+        if column.get('categorical'):
+            # Codes are used as-is; no per-row strings are materialized
+            data[column['name']] = pd.Categorical.from_codes(codes, categories=column['categories'])
+            continue
+        # The trailing NaN turns the -1 "missing" code into a plain lookup
+        categories = np.empty(len(column['categories']) + 1, dtype=object)
+        categories[:-1] = column['categories']
+        categories[-1] = np.nan
+        data[column['name']] = categories.take(codes)
+
+    return pd.DataFrame(data, columns=[column['name'] for column in meta['columns']])
+
+
+def read_snapshot_matrices(snapshot_path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Memory-map the row-aligned code matrices of a snapshot
+
+    The arrays are read-only views of the snapshot files, so every process
+    that maps them shares the same physical pages.
+
+    Returns:
+        Group name -> {'columns': [...], 'labels': [...], 'codes': ndarray}
+    """
+    snapshot_path = snapshot_version_path(snapshot_path)
+    with open(os.path.join(snapshot_path, SNAPSHOT_META_FILE), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+
+    return {
+        name: {
+            'columns': matrix['columns'],
+            'labels': matrix['labels'],
+            'codes': np.load(os.path.join(snapshot_path, matrix['file']), mmap_mode='r')
+        }
+        for name, matrix in meta.get('matrices', {}).items()
+    }
+
+
+def build_snapshot(excel_path: str, snapshot_path: Optional[str] = None) -> pd.DataFrame:
+    """
+    Parse the workbook, clean it and (re)write its snapshot
+
+    Returns:
+        The cleaned DataFrame that was written
+    """
+    snapshot_path = snapshot_path or snapshot_path_for(excel_path)
+    df = clean_dataframe(pd.read_excel(excel_path))
+    write_snapshot(df, snapshot_path, excel_path=excel_path)
+    return df
+
+
+def ensure_snapshot(excel_path: str, snapshot_path: Optional[str] = None) -> bool:
+    """
+    Rebuild the workbook's snapshot if it is stale, once across processes
+
+    Returns:
+        True if this call wrote the snapshot
+    """
+    snapshot_path = snapshot_path or snapshot_path_for(excel_path)
+    if not os.path.exists(excel_path) or snapshot_is_fresh(excel_path, snapshot_path):
+        return False
+    with snapshot_rebuild_lock(snapshot_path):
+        if snapshot_is_fresh(excel_path, snapshot_path):
+            return False
+        build_snapshot(excel_path, snapshot_path)
+    print(f"✓ Wrote crop data snapshot: {snapshot_path}")
+    return True
+
+
+def load_crop_dataframe(excel_path: str, snapshot_path: Optional[str] = None) -> pd.DataFrame:
+    """
+    Load the cleaned crop dataset, preferring a fresh snapshot
+
+    The snapshot is rebuilt automatically when it is missing or older than
+    the workbook, by one process at a time (see ``snapshot_rebuild_lock``);
+    the others wait and then read what it wrote. A failure to write the
+    snapshot (read-only deploys) is not fatal; the parsed workbook is
+    returned instead.
+
+    Args:
+        excel_path: Path to the Excel file with crop data
+        snapshot_path: Snapshot directory, defaults to one next to the workbook
+
+    Returns:
+        Cleaned DataFrame
+    """
+    snapshot_path = snapshot_path or snapshot_path_for(excel_path)
+
+    if snapshot_is_fresh(excel_path, snapshot_path):
+        try:
+            return read_snapshot(snapshot_path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Could not read crop data snapshot, rebuilding: {e}")
+
+    with snapshot_rebuild_lock(snapshot_path):
+        # Another process may have rebuilt it while this one waited
+        if snapshot_is_fresh(excel_path, snapshot_path):
+            try:
+                return read_snapshot(snapshot_path)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"⚠️ Could not read crop data snapshot, rebuilding: {e}")
+
+        df = clean_dataframe(pd.read_excel(excel_path))
+        try:
+            write_snapshot(df, snapshot_path, excel_path=excel_path)
+            print(f"✓ Wrote crop data snapshot: {snapshot_path}")
+        except OSError as e:
+            print(f"⚠️ Could not write crop data snapshot: {e}")
+    return df
+
+
+def load_snapshot_matrices(excel_path: str, snapshot_path: Optional[str] = None) -> Optional[Dict[str, Dict[str, Any]]]:
+    """
+    Memory-mapped code matrices of the workbook's snapshot, if it is fresh
+
+    Call after ``load_crop_dataframe`` so a missing or stale snapshot has
+    already been rebuilt. Returns None when no usable snapshot exists.
+    """
+    snapshot_path = snapshot_path or snapshot_path_for(excel_path)
+    if not snapshot_is_fresh(excel_path, snapshot_path):
+        return None
+    try:
+        return read_snapshot_matrices(snapshot_path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"⚠️ Could not map crop data snapshot: {e}")
+        return None
+
+
+def list_state_partitions(directory: str) -> Dict[str, str]:
+    """
+    Find the per-state partitions of a partitioned dataset directory
+
+    Only file names are read, so this is cheap enough for startup.
+
+    Returns:
+        State name -> workbook path of that partition (the workbook itself may
+        be absent when only its snapshot was shipped)
+    """
+    partitions = {}
+    for name in sorted(os.listdir(directory)):
+        state, ext = os.path.splitext(name)
+        if ext in PARTITION_EXTENSIONS and not name.startswith('.'):
+            partitions[state] = os.path.join(directory, state + '.xlsx')
+    return partitions
+
+
+def write_state_partitions(df: pd.DataFrame, directory: str) -> List[str]:
+    """
+    Split a cleaned DataFrame into one snapshot per state
+
+    Returns:
+        The states that were written
+    """
+    os.makedirs(directory, exist_ok=True)
+    states = []
+    for state, part in df.groupby('STATE', observed=True, sort=True):
+        part = part.reset_index(drop=True)
+        # Keep only the names this state uses in its dictionaries
+        categorical_cols = [col for col in part.columns if isinstance(part[col].dtype, pd.CategoricalDtype)]
+        for col in categorical_cols:
+            part[col] = part[col].cat.remove_unused_categories()
+        write_snapshot(part, os.path.join(directory, f"{state}.snapshot"))
+        states.append(str(state))
+    return states
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--partition':
+        # Partition step: python crop_dataset.py --partition [excel_path] [directory]
+        source = sys.argv[2] if len(sys.argv) > 2 else 'cropresults_with_state (1).xlsx'
+        target = sys.argv[3] if len(sys.argv) > 3 else os.path.splitext(source)[0] + '.partitions'
+        written = write_state_partitions(load_crop_dataframe(source), target)
+        print(f"✓ Wrote {len(written)} state partitions to {target}")
+        sys.exit(0)
+
+    # Snapshot build step: python crop_dataset.py [excel_path] [snapshot_path]
+    source = sys.argv[1] if len(sys.argv) > 1 else 'cropresults_with_state (1).xlsx'
+    target = sys.argv[2] if len(sys.argv) > 2 else snapshot_path_for(source)
+    start = time.perf_counter()
+    built = build_snapshot(source, target)
+    print(f"✓ Snapshot written to {target}: {len(built)} rows in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,168 @@
+"""
+Crop Ranking Module
+Villages ranked per crop by a numeric suitability score, presorted per
+region so a region's top-k for a crop is an array slice
+"""
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from crop_rules import RULE_ENGINE, SUITABILITY_LABELS
+from soil_store import soil_profiles
+
+
+def suitability_scores(labels: np.ndarray, met: np.ndarray, total: np.ndarray) -> np.ndarray:
+    """
+    0-100 village scores for crops
+
+    The suitability label decides the band (Not 0-33, Moderately 33-67,
+    Highly 67-100) and the share of the crop's soil and climate conditions
+    the village meets places it within the band.
+
+    Args:
+        labels: (villages, crops) SUITABILITY_LABELS indices, -1 if missing
+        met: (villages, crops) conditions met
+        total: (crops,) conditions per crop
+    """
+    return (np.maximum(labels, 0) + met / total) * (100 / 3)
+
+
+class CropRanking:
+    """
+    Per-crop village orderings for top-k queries by region
+
+    For each region level (everything, state, district, block) and crop the
+    villages are sorted by region, then by descending score. Every region
+    of a level is one contiguous range of that ordering, so its best k
+    villages for a crop are the first k entries of the range.
+    """
+
+    # Region key length per level: () for everything up to a block's 3 names
+    LEVELS = (0, 1, 2, 3)
+
+    def __init__(self, keys: List[Tuple[str, str, str, str]], crops: List[str],
+                 scores: np.ndarray, labels: np.ndarray, met: np.ndarray,
+                 orders: Dict[int, np.ndarray], bounds: Dict[tuple, Tuple[int, int]],
+                 build_stats: Dict[str, Any]):
+        """
+        Use ``CropRanking.build`` rather than calling this directly
+
+        Args:
+            keys: (state, district, block, village) per village
+            crops: Crop names, in score column order
+            scores, labels, met: (villages, crops) score, label index and
+                conditions met
+            orders: Level -> (crops, villages) int32 village orderings
+            bounds: Stripped region key -> (start, end) in its level's ordering
+            build_stats: Timing figures of the build
+        """
+        self.keys = keys
+        self.crops = crops
+        self._crop_index = {crop: j for j, crop in enumerate(crops)}
+        self.scores = scores
+        self.labels = labels
+        self.met = met
+        self._orders = orders
+        self._bounds = bounds
+        self._totals = [len(RULE_ENGINE.conditions[RULE_ENGINE.crops.index(crop)]) for crop in crops]
+        self.build_stats = build_stats
+
+    @classmethod
+    def build(cls, store) -> 'CropRanking':
+        """
+        Score and sort the villages of a LocationStore
+
+        Crop labels come from the store's crop codes; conditions met are
+        evaluated by the crop rules on the village's bands from the soil store.
+        """
+        start = time.perf_counter()
+        keys, positions = store.village_rows()
+        crops = [crop for crop in store.crop_columns if crop in RULE_ENGINE.crops]
+        engine_columns = [RULE_ENGINE.crops.index(crop) for crop in crops]
+
+        # Store label codes -> SUITABILITY_LABELS indices (-1 stays missing)
+        label_map = np.array(
+            [SUITABILITY_LABELS.index(label) if label in SUITABILITY_LABELS else -1
+             for label in store.crop_labels] + [-1],
+            dtype=np.int8
+        )
+        crop_codes = np.asarray(store.crop_codes)[positions][:, [store.crop_columns.index(crop) for crop in crops]]
+        labels = label_map[crop_codes]
+
+        # Rule engine codes from the soil store's decoded bands
+        soil = soil_profiles(store)
+        codes = np.zeros((len(keys), len(RULE_ENGINE.attributes)), dtype=np.int8)
+        codes[:, [RULE_ENGINE.attributes.index(attribute) for attribute in soil.attributes]] = soil.bands[positions]
+        bits = RULE_ENGINE.condition_bits(codes)[:, engine_columns]
+        met = RULE_ENGINE.conditions_met(bits)
+
+        totals = np.array([len(RULE_ENGINE.conditions[j]) for j in engine_columns], dtype=np.float64)
+        scores = suitability_scores(labels, met, totals)
+
+        # Villages come grouped by block and sorted within it, so sorting on
+        # (region, -score) keeps name order among equal scores
+        orders: Dict[int, np.ndarray] = {}
+        bounds: Dict[tuple, Tuple[int, int]] = {}
+        stripped = [tuple(name.strip() for name in key) for key in keys]
+        for level in cls.LEVELS:
+            region_ids, regions = pd.factorize(pd.Series([key[:level] for key in stripped], dtype=object), sort=True)
+            orders[level] = np.stack([
+                np.lexsort((-scores[:, j], region_ids)).astype(np.int32)
+                for j in range(len(crops))
+            ]) if len(crops) else np.zeros((0, len(keys)), dtype=np.int32)
+            ends = np.cumsum(np.bincount(region_ids, minlength=len(regions)))
+            for region_id, region in enumerate(regions):
+                start_at = int(ends[region_id - 1]) if region_id else 0
+                bounds[tuple(region)] = (start_at, int(ends[region_id]))
+
+        build_stats = {
+            'seconds': time.perf_counter() - start,
+            'villages': len(keys),
+            'crops': len(crops)
+        }
+        return cls(keys, crops, scores, labels, met, orders, bounds, build_stats)
+
+    def top(self, crop: str, region: Tuple[str, ...] = (), k: int = 10) -> Optional[List[Dict[str, Any]]]:
+        """
+        Best villages for a crop within a region
+
+        Args:
+            crop: Crop name
+            region: () for everything, (state,), (state, district) or
+                (state, district, block); names are compared without
+                surrounding whitespace
+            k: Number of villages
+
+        Returns:
+            Up to k villages, best first, or None if the region is unknown
+
+        Raises:
+            ValueError: For an unknown crop
+        """
+        j = self._crop_index.get(crop)
+        if j is None:
+            raise ValueError(f'Unknown crop: {crop}')
+        region = tuple(name.strip() for name in region)
+        bounds = self._bounds.get(region)
+        if bounds is None:
+            return None
+        start, end = bounds
+        rows = self._orders[len(region)][j, start:min(start + k, end)]
+        return [self._result(int(row), j) for row in rows]
+
+    def _result(self, row: int, j: int) -> Dict[str, Any]:
+        """JSON-ready ranked village"""
+        state, district, block, village = self.keys[row]
+        label = int(self.labels[row, j])
+        return {
+            'state': state,
+            'district': district,
+            'block': block,
+            'village': village,
+            'score': round(float(self.scores[row, j]), 1),
+            'suitability': SUITABILITY_LABELS[label] if label >= 0 else None,
+            'conditions_met': int(self.met[row, j]),
+            'conditions_total': self._totals[j]
+        }
@@ -2,54 +2,86 @@
 Crop Recommendation Module
 Handles location-based crop prediction and soil-based recommendations
 """
+import heapq
+import json
 import pandas as pd
-from typing import Dict, List, Any, Optional
+from typing import Dict, Iterator, List, Any, Optional, Tuple
 import os
+from bitmap_index import VillageBitmapIndex
+from crop_dataset import ensure_snapshot, snapshot_path_for
+from crop_ranking import CropRanking
+from crop_rules import RULE_ENGINE, evaluate_profile, load_suitability_table
+from dataset_reload import DatasetReloader
+from json_payload import PreparedJson
+from location_store import (
+    LocationStore, PartitionedLocationStore, decode_cursor, encode_cursor, load_location_store, paginate_sorted
+)
+from soil_scoring import SOIL_SCORER
+from soil_store import soil_profiles
+from suitability_cube import SuitabilityCube
+from village_similarity import VillageSimilarityIndex
+
+
+LOCATION_FIELDS = ('state', 'district', 'block', 'village')
 
 
 class CropRecommendationService:
     """Service for crop recommendations based on location and soil data"""
     
-    def __init__(self, excel_path: str = "cropresults_with_state.xlsx"):
+    def __init__(self, excel_path: str = "cropresults_with_state.xlsx", shared_memory: bool = False,
+                 max_loaded_states: int = 4):
         """
         Initialize the service with Excel data
         
         Args:
-            excel_path: Path to the Excel file with crop data
+            excel_path: Path to the Excel file with crop data, or to a directory
+                of per-state partitions ("<STATE>.xlsx" / "<STATE>.snapshot")
+            shared_memory: Keep only the lookup store (whose crop/soil codes are
+                memory-mapped from the snapshot) and drop the DataFrame, so that
+                preforked workers share the dataset instead of copying it
+            max_loaded_states: With a partition directory, how many states stay
+                loaded before the least recently used one is evicted
         """
         self.excel_path = excel_path
+        self.shared_memory = shared_memory
+        self.max_loaded_states = max_loaded_states
         self.df = None
-        self.dropdown_data = {}
+        self.locations = LocationStore(pd.DataFrame())
         self._load_data()
+        # Soil profile evaluation reads this precomputed table from here on
+        load_suitability_table()
+        # Rebuilds the whole dataset off the request path and swaps it in
+        self.reloader = DatasetReloader(
+            excel_path,
+            load=self._load_generation,
+            publish=self._publish_generation,
+            version=self.locations.version,
+            prepare=self._prepare_generation
+        )
     
     def _load_data(self):
         """Load and prepare Excel data"""
         try:
-            if not os.path.exists(self.excel_path):
+            if not os.path.exists(self.excel_path) and not os.path.exists(snapshot_path_for(self.excel_path)):
                 print(f"⚠️ Excel file not found: {self.excel_path}")
                 print("Using sample data for demonstration")
                 self._create_sample_data()
                 return
             
-            self.df = pd.read_excel(self.excel_path)
-            
-            # Clean column names
-            self.df.columns = [col.strip() for col in self.df.columns]
+            # Cleaned data comes from the columnar snapshot when it is fresh;
+            # crop/soil codes are mapped from the same snapshot
+            self._publish_generation(self._load_generation(1))
             
-            # Forward fill and backward fill location columns
-            location_cols = ['STATE', 'DISTRICT NAME', 'BLOCK NAME', 'VILLAGE NAME']
-            self.df[location_cols] = (
-                self.df[location_cols]
-                .ffill()
-                .bfill()
-                .astype(str)
-            )
+            if self.locations.rows is not None:
+                print(f"✓ Loaded crop data: {self.locations.rows} rows")
+            print(f"✓ States: {len(self.locations.get_states())}")
+            print(f"✓ Location hierarchy: {self.locations.describe_build()}")
+            cube = self.locations.cached('summary-cube')
+            if cube is not None:
+                print(f"✓ Suitability summary: {cube.describe_build()}")
             
-            # Build dropdown hierarchy
-            self._build_dropdown_hierarchy()
-            
-            print(f"✓ Loaded crop data: {len(self.df)} rows")
-            print(f"✓ States: {len(self.dropdown_data)}")
+            if self.shared_memory and self.locations.rows is not None:
+                print("✓ Shared-memory mode: crop DataFrame released")
             
         except Exception as e:
             print(f"✗ Error loading Excel data: {e}")
@@ -73,61 +105,159 @@ class CropRecommendationService:
         self._build_dropdown_hierarchy()
         print("✓ Created sample crop data")
     
-    def _build_dropdown_hierarchy(self):
+    def _build_dropdown_hierarchy(self, matrices: Optional[Dict[str, Any]] = None):
         """Build hierarchical dropdown data structure"""
-        self.dropdown_data = {}
+        # Vectorized dedupe/sort of the location columns; villages are
+        # sorted and distinct at every leaf
+        self.locations = LocationStore(self.df, matrices=matrices, version=1)
+    
+    def _prepare_generation(self):
+        """
+        Rebuild the snapshot once before every worker reloads
         
-        for _, row in self.df.iterrows():
-            state = row['STATE']
-            district = row['DISTRICT NAME']
-            block = row['BLOCK NAME']
-            village = row['VILLAGE NAME']
-            
-            # Initialize nested dictionaries
-            if state not in self.dropdown_data:
-                self.dropdown_data[state] = {}
-            
-            if district not in self.dropdown_data[state]:
-                self.dropdown_data[state][district] = {}
-            
-            if block not in self.dropdown_data[state][district]:
-                self.dropdown_data[state][district][block] = []
-            
-            # Add village if not already present
-            if village not in self.dropdown_data[state][district][block]:
-                self.dropdown_data[state][district][block].append(village)
+        The workers then only open the rebuilt snapshot, its arrays mapped
+        read-only and shared through the page cache.
+        """
+        if not os.path.isdir(self.excel_path):
+            ensure_snapshot(self.excel_path)
+    
+    def _load_generation(self, version: int) -> Tuple[Optional[pd.DataFrame], Any]:
+        """Load the dataset and build every lookup structure for one version"""
+        if os.path.isdir(self.excel_path):
+            # Partitions load lazily, per state, on first use
+            return None, PartitionedLocationStore(self.excel_path, max_states=self.max_loaded_states, version=version)
+        if not os.path.exists(self.excel_path) and not os.path.exists(snapshot_path_for(self.excel_path)):
+            raise FileNotFoundError(f"Excel file not found: {self.excel_path}")
+        df, store = load_location_store(self.excel_path, version=version)
+        # Typed soil readings and bands, read by the rankings and routes
+        soil_profiles(store)
+        # Counted with the load; blocks unchanged since the serving
+        # version reuse its counts
+        self._summary_cube(store, previous=self.locations.cached('summary-cube'))
+        self._ranking(store)
+        self._bitmap_index(store)
+        self._similarity_index(store)
+        return df, store
+    
+    @staticmethod
+    def _summary_cube(store: LocationStore, previous: Optional[SuitabilityCube] = None) -> SuitabilityCube:
+        """Suitability cube of a store, built once per dataset version"""
+        return store.cached('summary-cube', lambda: SuitabilityCube.build(store, previous=previous))
+    
+    @staticmethod
+    def _ranking(store: LocationStore) -> CropRanking:
+        """Per-crop village rankings of a store, built once per dataset version"""
+        return store.cached('crop-ranking', lambda: CropRanking.build(store))
+    
+    @staticmethod
+    def _bitmap_index(store: LocationStore) -> VillageBitmapIndex:
+        """Per-(column, value) village bitmaps of a store, built once per dataset version"""
+        return store.cached('bitmap-index', lambda: VillageBitmapIndex.build(store))
+    
+    @staticmethod
+    def _similarity_index(store: LocationStore) -> VillageSimilarityIndex:
+        """Soil/climate KD-tree over the villages of a store, built once per dataset version"""
+        return store.cached('village-similarity', lambda: VillageSimilarityIndex.build(store))
+    
+    def _publish_generation(self, generation: Tuple[Optional[pd.DataFrame], Any]):
+        """
+        Swap a fully built generation in
+        
+        The store holds the hierarchy and every index, so replacing the one
+        attribute is what readers see; each lookup reads ``self.locations``
+        once and keeps answering from that generation.
+        """
+        df, store = generation
+        # In shared-memory mode every lookup is answered by the store
+        self.df = None if self.shared_memory else df
+        self.locations = store
+    
+    def get_dataset_info(self) -> Dict[str, Any]:
+        """Version and content fingerprint of the dataset being served"""
+        locations = self.locations
+        info = {
+            'version': locations.version,
+            'fingerprint': locations.fingerprint,
+            'rows': locations.rows
+        }
+        reloader = getattr(self, 'reloader', None)
+        if reloader is not None:
+            status = reloader.status()
+            info.update(reloading=status['reloading'], last_reload=status['last_reload'],
+                        last_error=status['last_error'])
+        return info
     
     def get_states(self) -> List[str]:
         """Get list of all states"""
-        return sorted(list(self.dropdown_data.keys()))
+        return self.locations.get_states()
     
     def get_districts(self, state: str) -> List[str]:
         """Get list of districts for a state"""
-        if state not in self.dropdown_data:
-            return []
-        return sorted(list(self.dropdown_data[state].keys()))
+        return self.locations.get_districts(state)
     
     def get_blocks(self, state: str, district: str) -> List[str]:
         """Get list of blocks for a district"""
-        if state not in self.dropdown_data:
-            return []
-        if district not in self.dropdown_data[state]:
-            return []
-        return sorted(list(self.dropdown_data[state][district].keys()))
+        return self.locations.get_blocks(state, district)
     
     def get_villages(self, state: str, district: str, block: str) -> List[str]:
         """Get list of villages for a block"""
-        if state not in self.dropdown_data:
-            return []
-        if district not in self.dropdown_data[state]:
-            return []
-        if block not in self.dropdown_data[state][district]:
-            return []
-        return sorted(self.dropdown_data[state][district][block])
+        return self.locations.get_villages(state, district, block)
+    
+    def get_villages_page(self, state: str, district: str, block: str, limit: Optional[int] = None,
+                          cursor: Optional[str] = None) -> Tuple[List[str], Optional[str], int]:
+        """
+        Get one page of a block's villages
+        
+        Args:
+            limit: Page size; None returns everything after the cursor
+            cursor: next_cursor of the previous page
+        
+        Returns:
+            (villages, next_cursor, total villages in the block)
+        
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        villages = self.locations.get_villages(state, district, block)
+        page, next_cursor = paginate_sorted(villages, limit=limit, cursor=cursor)
+        return page, next_cursor, len(villages)
     
     def get_dropdown_data(self) -> Dict[str, Any]:
         """Get complete dropdown hierarchy"""
-        return self.dropdown_data
+        return self.locations.get_hierarchy()
+    
+    def get_dropdown_payload(self) -> PreparedJson:
+        """
+        The /api/crop/dropdown-data response, serialized and compressed once
+        per dataset version
+        """
+        locations = self.locations
+        
+        def build():
+            data = locations.get_hierarchy()
+            return PreparedJson({
+                'status': 'success',
+                'data': data,
+                'states_count': len(data)
+            })
+        
+        return locations.cached('dropdown-data', build)
+    
+    def search_locations(self, query: str, limit: int = 10, kinds: Optional[List[str]] = None,
+                         state: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Search district, block and village names in one call
+        
+        Args:
+            query: Free text; prefixes and common transliteration variants match
+            limit: Maximum number of results
+            kinds: Restrict to 'district', 'block' and/or 'village'
+            state: Only search this state
+        
+        Returns:
+            Ranked matches with their full state/district/block/village path
+        """
+        return self.locations.search(query, limit=limit, kinds=kinds, state=state)
     
     def get_crop_suitability(self, state: str, district: str, block: str, village: str) -> Optional[Dict[str, str]]:
         """
@@ -136,34 +266,296 @@ class CropRecommendationService:
         Returns:
             Dictionary with crop names as keys and suitability as values
         """
-        if self.df is None:
+        # One generation answers both steps even if a reload swaps meanwhile;
+        # with partitions this also loads (or keeps) the state's partition
+        locations = self.locations.for_state(state)
+        
+        # Constant-time lookup in the composite (state, district, block, village) index
+        position = locations.find_village_row(state, district, block, village)
+        
+        if position is None:
             return None
         
-        # Find the row matching the location
-        row = self.df[
-            (self.df['STATE'] == state) &
-            (self.df['DISTRICT NAME'] == district) &
-            (self.df['BLOCK NAME'] == block) &
-            (self.df['VILLAGE NAME'] == village)
-        ]
+        # Crop columns are pre-extracted into row-aligned arrays
+        return locations.get_crop_suitability(position)
+    
+    def resolve_bulk_locations(self, locations: Optional[List[Any]] = None,
+                               selectors: Optional[List[Dict[str, str]]] = None) -> List[Tuple[str, str, str, str]]:
+        """
+        Turn a bulk request into (state, district, block, village) tuples
+        
+        Args:
+            locations: Items given either as [state, district, block, village]
+                lists or as objects with those four keys
+            selectors: Objects with a state and optionally a district and
+                block; each expands to every village below it
+        
+        Raises:
+            ValueError: If an item or selector is malformed
+        """
+        resolved = []
+        for i, item in enumerate(locations or []):
+            if isinstance(item, dict):
+                item = [item.get(field) for field in LOCATION_FIELDS]
+            if not isinstance(item, (list, tuple)) or len(item) != 4 or not all(isinstance(name, str) for name in item):
+                raise ValueError(f'locations[{i}] must be [state, district, block, village] or an object with those keys')
+            resolved.append(tuple(item))
+        
+        for i, selector in enumerate(selectors or []):
+            if not isinstance(selector, dict) or not isinstance(selector.get('state'), str):
+                raise ValueError(f'selectors[{i}] must be an object with at least a state')
+            state, district, block = selector['state'], selector.get('district'), selector.get('block')
+            if block and not district:
+                raise ValueError(f'selectors[{i}]: a block needs its district')
+            locations_store = self.locations.for_state(state)
+            districts = [district] if district else locations_store.get_districts(state)
+            for district_name in districts:
+                blocks = [block] if block else locations_store.get_blocks(state, district_name)
+                for block_name in blocks:
+                    resolved.extend(
+                        (state, district_name, block_name, village)
+                        for village in locations_store.get_villages(state, district_name, block_name)
+                    )
+        return resolved
+    
+    def get_bulk_suitability(self, locations: List[Tuple[str, str, str, str]]) -> Tuple[List[str], int]:
+        """
+        Crop suitability for many villages, serialized as NDJSON lines
+        
+        Each line is the /api/crop/suitability payload of one location
+        ({"location": ..., "crops": ...}, or an "error" for an unknown one),
+        in request order.
+        
+        Returns:
+            (lines, number of locations not found)
+        """
+        lines: List[Optional[str]] = [None] * len(locations)
+        not_found = 0
+        
+        # One hash join per state partition (a single one without partitions)
+        by_state: Dict[str, List[int]] = {}
+        for i, location in enumerate(locations):
+            by_state.setdefault(location[0], []).append(i)
         
-        if row.empty:
+        for state, indexes in by_state.items():
+            store = self.locations.for_state(state)
+            group = [locations[i] for i in indexes]
+            positions = store.find_village_rows(group)
+            found = positions >= 0
+            crops = iter(store.crop_suitability_json(positions[found]))
+            for i, location, hit in zip(indexes, group, found.tolist()):
+                location_json = json.dumps(dict(zip(LOCATION_FIELDS, location)), ensure_ascii=False, separators=(',', ':'))
+                if hit:
+                    lines[i] = f'{{"location":{location_json},"crops":{next(crops)}}}'
+                else:
+                    not_found += 1
+                    lines[i] = f'{{"location":{location_json},"error":"No crop data found for this location"}}'
+        return lines, not_found
+    
+    def _stores(self) -> Iterator[LocationStore]:
+        """
+        The stores that together hold the dataset, one at a time
+        
+        A single store holds every state. With partitions each state is
+        loaded in turn through the LRU, so callers must not keep a store
+        past its iteration or every partition stays in memory at once.
+        """
+        locations = self.locations
+        if not isinstance(locations, PartitionedLocationStore):
+            yield locations
+            return
+        for state in locations.get_states():
+            yield locations.for_state(state)
+    
+    def get_summary(self, state: Optional[str] = None, district: Optional[str] = None,
+                    block: Optional[str] = None, crop: Optional[str] = None,
+                    suitability: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Village counts per crop and suitability for a region, with drill-down
+        
+        Args:
+            state, district, block: Region; omit trailing levels to go up
+                (nothing at all summarizes every state)
+            crop: Only report this crop
+            suitability: Only report this suitability label
+        
+        Returns:
+            {'villages', 'counts': {crop: {label: n}}, 'children': [...]} where
+            children summarize each sub-region; None for an unknown region
+        
+        Raises:
+            ValueError: For a level given without its parent, or an unknown
+                crop or suitability label
+        """
+        if (block and not district) or (district and not state):
+            raise ValueError('district needs state and block needs district')
+        region = tuple(name for name in (state, district, block) if name)
+        
+        locations = self.locations
+        if state or not isinstance(locations, PartitionedLocationStore):
+            cube = self._summary_cube(locations.for_state(state) if state else locations)
+            self._check_summary_filter(cube, crop, suitability)
+            return cube.summary(region, crop=crop, suitability=suitability)
+        if not locations.get_states():
             return None
         
-        # Extract crop columns
-        crop_columns = [
-            'Sugarcane', 'Cotton', 'Soyabean', 'Rice', 'Jowar',
-            'Tur (Pigeon Pea)', 'Wheat', 'Groundnut', 'Onion', 'Tomato',
-            'Potato', 'Garlic'
-        ]
+        # Partitioned data: each state's own summary from its cube, one
+        # partition at a time, merged at the top level
+        def build():
+            children = []
+            for name, store in zip(locations.get_states(), self._stores()):
+                state_cube = self._summary_cube(store)
+                self._check_summary_filter(state_cube, crop, suitability)
+                state_summary = state_cube.summary((name,), crop=crop, suitability=suitability, children=False)
+                if state_summary is not None:
+                    children.append({'name': name, **state_summary})
+            return self._merge_summaries(children)
         
-        # Get crop suitability data
-        crop_data = {}
-        for col in crop_columns:
-            if col in row.columns:
-                crop_data[col] = row.iloc[0][col]
+        return locations.cached(f'national-summary\x1f{crop or ""}\x1f{suitability or ""}', build)
+    
+    @staticmethod
+    def _check_summary_filter(cube: SuitabilityCube, crop: Optional[str], suitability: Optional[str]):
+        """Reject a crop or suitability label the cube does not count"""
+        if crop and crop not in cube.crops:
+            raise ValueError(f'Unknown crop: {crop}')
+        if suitability and suitability not in cube.labels:
+            raise ValueError(f'Unknown suitability: {suitability}')
+    
+    @staticmethod
+    def _merge_summaries(children: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """National summary from the summaries of its states"""
+        counts: Dict[str, Dict[str, int]] = {}
+        for child in children:
+            for crop_name, labels in child['counts'].items():
+                for label, count in labels.items():
+                    counts.setdefault(crop_name, {}).setdefault(label, 0)
+                    counts[crop_name][label] += count
+        return {
+            'villages': sum(child['villages'] for child in children),
+            'counts': counts,
+            'children': children
+        }
+    
+    def get_top_locations(self, crop: str, state: Optional[str] = None, district: Optional[str] = None,
+                          block: Optional[str] = None, k: int = 10) -> Optional[List[Dict[str, Any]]]:
+        """
+        Best villages for a crop within a region, by suitability score
+        
+        Args:
+            crop: Crop name
+            state, district, block: Region; omit trailing levels to go up
+                (nothing at all ranks every state)
+            k: Number of villages
+        
+        Returns:
+            Up to k villages with their score (0-100), suitability label and
+            conditions met, best first; None for an unknown region
+        
+        Raises:
+            ValueError: For a level given without its parent, or an unknown crop
+        """
+        if (block and not district) or (district and not state):
+            raise ValueError('district needs state and block needs district')
+        region = tuple(name for name in (state, district, block) if name)
+        
+        if state:
+            return self._ranking(self.locations.for_state(state)).top(crop, region, k)
+        
+        # Every state: merge each state's own top k, one partition at a time
+        return heapq.nlargest(k, (
+            village for store in self._stores() for village in self._ranking(store).top(crop, (), k) or []
+        ), key=lambda village: village['score'])
+    
+    def filter_villages(self, expression: Dict[str, Any], limit: int = 100,
+                        cursor: Optional[str] = None) -> Tuple[int, List[Dict[str, str]], Optional[str]]:
+        """
+        Villages matching a compound crop/soil/region filter
+        
+        Args:
+            expression: Filter expression tree (see VillageBitmapIndex)
+            limit: Page size
+            cursor: next_cursor of the previous page
+        
+        Returns:
+            (villages matching in total, one page of villages, next_cursor);
+            next_cursor is None on the last page
+        
+        Raises:
+            ValueError: For a malformed expression or cursor, or an unknown column
+        """
+        # The cursor names the store and village position the previous page ended at
+        store_at, after = 0, -1
+        if cursor:
+            try:
+                store_at, after = (int(part) for part in decode_cursor(cursor).split(':'))
+            except ValueError:
+                raise ValueError(f"Invalid cursor: {cursor}")
         
-        return crop_data
+        # Each state of a partitioned dataset has its own index, visited one
+        # at a time; a single store answers for every state. Every store is
+        # counted, but only those from the cursor on fill the page.
+        total = 0
+        villages: List[Dict[str, str]] = []
+        next_cursor = None
+        page_end = None
+        for i, store in enumerate(self._stores()):
+            index = self._bitmap_index(store)
+            match = index.evaluate(expression)
+            total += len(match)
+            if i < store_at:
+                continue
+            if len(villages) == limit:
+                # Page already full: any later match means another page
+                if next_cursor is None and len(match):
+                    next_cursor = encode_cursor(page_end)
+                continue
+            # One position past the page tells whether another page follows
+            positions = match.positions(after if i == store_at else -1, limit - len(villages) + 1).tolist()
+            page = positions[:limit - len(villages)]
+            villages.extend(index.village(position) for position in page)
+            if page:
+                page_end = f'{i}:{page[-1]}'
+            if len(villages) == limit and len(positions) > len(page):
+                next_cursor = encode_cursor(page_end)
+        return total, villages, next_cursor
+    
+    def similar_villages(self, location: Optional[Tuple[str, str, str, str]] = None,
+                         profile: Optional[Dict[str, Any]] = None, k: int = 10) -> Optional[List[Dict[str, Any]]]:
+        """
+        Villages whose soil and climate are nearest a village's or a profile
+        
+        Args:
+            location: (state, district, block, village) to compare with; the
+                village itself is left out of the result
+            profile: Normalized attribute -> level (or numeric reading) to
+                compare with instead
+            k: Number of villages
+        
+        Returns:
+            Up to k villages, nearest first, with their distance and crop
+            suitability; None for an unknown village
+        
+        Raises:
+            ValueError: Unless exactly one of location and profile is given,
+                or for a profile value that is neither a level nor a number
+        """
+        if (location is None) == (profile is None):
+            raise ValueError('Either a village or a soil profile is required')
+        vector = None
+        if location is not None:
+            vector = self._similarity_index(self.locations.for_state(location[0])).village_vector(location)
+            if vector is None:
+                return None
+        
+        # Each state of a partitioned dataset has its own tree; merge their k
+        # nearest, one partition at a time
+        def nearest(store):
+            index = self._similarity_index(store)
+            return index.nearest(vector if vector is not None else index.encode_profile(profile), k, exclude=location)
+        
+        return heapq.nsmallest(k, (
+            village for store in self._stores() for village in nearest(store)
+        ), key=lambda village: village['distance'])
     
     @staticmethod
     def normalize_input(input_data: Dict[str, str]) -> Dict[str, str]:
@@ -171,10 +563,12 @@ class CropRecommendationService:
         Normalize input data by extracting category from full text
         
         Args:
-            input_data: Dictionary with attribute names and full values
+            input_data: Dictionary with attribute names and full values; a
+                value may also be a {value: probability} distribution
             
         Returns:
-            Dictionary with normalized values (High/Medium/Low etc.)
+            Dictionary with normalized values (High/Medium/Low etc.), and
+            distributions keyed by normalized values
         """
         value_map = {
             "High (81–100%)": "High",
@@ -213,6 +607,13 @@ class CropRecommendationService:
         normalized = {}
         for key, value in input_data.items():
             key = key.strip()
+            if isinstance(value, dict):
+                distribution = {}
+                for band, probability in value.items():
+                    band = value_map.get(band.strip(), band.strip())
+                    distribution[band] = distribution.get(band, 0) + probability
+                normalized[key] = distribution
+                continue
             value = value.strip()
             normalized[key] = value_map.get(value, value)
         
@@ -229,157 +630,101 @@ class CropRecommendationService:
         Returns:
             Dictionary with crop names and suitability levels
         """
-        # Handle Rainfall field name variations
+        return evaluate_profile(data)
+    
+    @staticmethod
+    def rank_crops(data: Dict[str, str]) -> List[Dict[str, Any]]:
+        """
+        Score every crop 0-100 against soil and climate data, best first
+        
+        Args:
+            data: Normalized input data
+            
+        Returns:
+            [{'crop', 'score', 'suitability'}] sorted by descending score
+        """
+        return SOIL_SCORER.rank(data)
+    
+    @staticmethod
+    def crop_probabilities(data: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+        """
+        Probability of each suitability label per crop for uncertain soil data
+        
+        Args:
+            data: Normalized input data; uncertain parameters are
+                {band: probability} distributions (scaled to sum to 1)
+            
+        Returns:
+            crop -> {label: probability}, computed exactly over every band
+            combination
+        
+        Raises:
+            ValueError: For an unknown band or invalid probabilities
+        """
         if "Rainfall overall" in data:
             data["Rainfall"] = data.pop("Rainfall overall")
+        return RULE_ENGINE.probabilities(data)
+    
+    @staticmethod
+    def explain_crops(data: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Evaluate all crops and say which criteria each one failed
         
-        results = {}
-        
-        # Sugarcane
-        cnt = sum([
-            data.get('Nitrogen') in ["High", "Medium"],
-            data.get('Potassium') in ["High", "Medium"],
-            data.get('OC') in ["High", "Medium"],
-            data.get('EC') == "Non-Saline",
-            data.get('pH') in ["Neutral", "Alkaline"],
-            data.get('Temperature_Winter') == "High",
-            data.get('Rainfall') in ["High", "Medium"]
-        ])
-        results["Sugarcane"] = "Highly Suitable" if cnt >= 6 else ("Moderately Suitable" if cnt == 5 else "Not Suitable")
-        
-        # Cotton
-        cnt = sum([
-            data.get('Phosphorus') in ["High", "Medium"],
-            data.get('Potassium') in ["High", "Medium"],
-            data.get('Zinc') == "Sufficient",
-            data.get('pH') in ["Neutral", "Alkaline"],
-            data.get('Temperature_Winter') == "High",
-            data.get('Rainfall') in ["High", "Medium"]
-        ])
-        results["Cotton"] = "Highly Suitable" if cnt >= 5 else ("Moderately Suitable" if cnt == 4 else "Not Suitable")
-        
-        # Soyabean
-        cnt = sum([
-            data.get('Phosphorus') in ["High", "Medium"],
-            data.get('Boron') == "Sufficient",
-            data.get('Sulphur') == "Sufficient",
-            data.get('OC') in ["High", "Medium"],
-            data.get('pH') in ["Neutral", "Acidic"],
-            data.get('Rainfall') in ["High", "Medium"]
-        ])
-        results["Soyabean"] = "Highly Suitable" if cnt >= 5 else ("Moderately Suitable" if cnt == 4 else "Not Suitable")
-        
-        # Rice
-        cnt = sum([
-            data.get('Nitrogen') in ["High", "Medium"],
-            data.get('Phosphorus') in ["High", "Medium"],
-            data.get('pH') in ["Neutral", "Acidic", "Alkaline"],
-            data.get('EC') == "Non-Saline",
-            data.get('Temperature_Winter') == "High",
-            data.get('Rainfall') == "High",
-            data.get('Boron') == "Sufficient" or data.get('Copper') == "Sufficient"
-        ])
-        results["Rice"] = "Highly Suitable" if cnt >= 5 else ("Moderately Suitable" if cnt == 4 else "Not Suitable")
-        
-        # Jowar
-        cnt = sum([
-            data.get('Potassium') in ["High", "Medium"],
-            data.get('Zinc') == "Sufficient",
-            data.get('EC') == "Non-Saline",
-            data.get('pH') in ["Neutral", "Alkaline"],
-            data.get('Temperature_Winter') == "High",
-            data.get('Rainfall') == "Medium"
-        ])
-        results["Jowar"] = "Highly Suitable" if cnt >= 5 else ("Moderately Suitable" if cnt == 4 else "Not Suitable")
-        
-        # Tur (Pigeon Pea)
-        cnt = sum([
-            data.get('Phosphorus') in ["High", "Medium", "Low"],
-            data.get('OC') in ["High", "Medium"],
-            data.get('Iron') == "Sufficient",
-            data.get('pH') in ["Neutral", "Alkaline", "Acidic"],
-            data.get('Temperature_Winter') == "High",
-            data.get('Rainfall') in ["High", "Medium"]
-        ])
-        results["Tur (Pigeon Pea)"] = "Highly Suitable" if cnt >= 5 else ("Moderately Suitable" if cnt == 4 else "Not Suitable")
-        
-        # Wheat
-        cnt = sum([
-            data.get('Nitrogen') in ["High", "Medium"],
-            data.get('Phosphorus') in ["High", "Medium"],
-            data.get('Potassium') in ["High", "Medium"],
-            data.get('Zinc') == "Sufficient",
-            data.get('Iron') == "Sufficient",
-            data.get('Manganese') == "Sufficient",
-            data.get('pH') == "Neutral",
-            data.get('Temperature_Monsoon') == "Medium",
-            data.get('Rainfall') in ["High", "Medium"]
-        ])
-        results["Wheat"] = "Highly Suitable" if cnt >= 6 else ("Moderately Suitable" if cnt == 5 else "Not Suitable")
-        
-        # Groundnut
-        cnt = sum([
-            data.get('Phosphorus') in ["High", "Medium"],
-            data.get('Potassium') in ["High", "Medium"],
-            data.get('Boron') == "Sufficient",
-            data.get('EC') == "Non-Saline",
-            data.get('pH') == "Neutral",
-            data.get('Temperature_Winter') == "High",
-            data.get('Rainfall') == "Medium"
-        ])
-        results["Groundnut"] = "Highly Suitable" if cnt >= 6 else ("Moderately Suitable" if cnt == 5 else "Not Suitable")
-        
-        # Onion
-        cnt = sum([
-            data.get('Potassium') in ["High", "Medium"],
-            data.get('Sulphur') == "Sufficient",
-            data.get('Zinc') == "Sufficient",
-            data.get('OC') in ["High", "Medium"],
-            any(t in ["High", "Medium"] for t in [
-                data.get('Temperature_Summer', ''),
-                data.get('Temperature_Winter', ''),
-                data.get('Temperature_Monsoon', '')
-            ])
-        ])
-        results["Onion"] = "Highly Suitable" if cnt >= 5 else ("Moderately Suitable" if cnt >= 3 else "Not Suitable")
-        
-        # Tomato
-        cnt = sum([
-            data.get('Nitrogen') in ["High", "Medium"],
-            data.get('Phosphorus') in ["High", "Medium"],
-            data.get('Potassium') in ["High", "Medium"],
-            data.get('Zinc') == "Sufficient",
-            data.get('Boron') == "Sufficient",
-            any(t in ["High", "Medium"] for t in [
-                data.get('Temperature_Summer', ''),
-                data.get('Temperature_Winter', ''),
-                data.get('Temperature_Monsoon', '')
-            ])
-        ])
-        results["Tomato"] = "Highly Suitable" if cnt >= 5 else ("Moderately Suitable" if cnt == 4 else "Not Suitable")
-        
-        # Potato
-        cnt = sum([
-            data.get('Nitrogen') in ["High", "Medium"],
-            data.get('Phosphorus') in ["High", "Medium"],
-            data.get('Potassium') in ["High", "Medium"],
-            data.get('EC') == "Non-Saline",
-            data.get('pH') in ["Neutral", "Alkaline"],
-            data.get('Temperature_Summer', '') in ["High", "Medium"],
-            data.get('Temperature_Monsoon', '') in ["High", "Medium"]
-        ])
-        results["Potato"] = "Highly Suitable" if cnt >= 6 else ("Moderately Suitable" if cnt == 5 else "Not Suitable")
-        
-        # Garlic
-        cnt = sum([
-            data.get('Nitrogen') in ["High", "Medium"],
-            data.get('Potassium') in ["High", "Medium"],
-            data.get('OC') in ["High", "Medium"],
-            data.get('pH') in ["Neutral", "Alkaline"],
-            data.get('Zinc') == "Sufficient",
-            data.get('Temperature_Winter', '') in ["High", "Medium"],
-            data.get('Rainfall') in ["High", "Medium"]
-        ])
-        results["Garlic"] = "Highly Suitable" if cnt >= 5 else ("Moderately Suitable" if cnt == 4 else "Not Suitable")
-        
-        return results
+        Args:
+            data: Normalized input data
+            
+        Returns:
+            crop -> suitability, condition bitmask and counts, and the failed
+            soil or climate factors with their accepted and actual values
+        """
+        if "Rainfall overall" in data:
+            data["Rainfall"] = data.pop("Rainfall overall")
+        return RULE_ENGINE.explain_one(data)
+    
+    @classmethod
+    def what_if(cls, profile: Dict[str, str], crop: str, target: str = 'Highly Suitable',
+                attributes: Optional[List[str]] = None, limit: int = 5) -> Dict[str, Any]:
+        """
+        Find the fewest soil changes that bring a crop to a target suitability
+        
+        Args:
+            profile: Raw input data, normalized here
+            crop: Crop to improve
+            target: Suitability to reach
+            attributes: Parameters that may change (default: the soil ones;
+                temperature and rainfall stay as given)
+            limit: Alternatives to return
+            
+        Returns:
+            Current and best reachable suitability plus up to `limit` change
+            sets, fewest changes first; no change sets (and 'already' True)
+            when the crop already meets the target
+            
+        Raises:
+            ValueError: Unknown crop, suitability or attribute
+        """
+        profile = cls.normalize_input(profile)
+        if "Rainfall overall" in profile:
+            profile["Rainfall"] = profile.pop("Rainfall overall")
+        return RULE_ENGINE.what_if(profile, crop, target=target, attributes=attributes, limit=limit)
+    
+    @classmethod
+    def evaluate_batch(cls, profiles: List[Dict[str, str]], explain: bool = False):
+        """
+        Evaluate suitability for all crops for many soil profiles at once
+        
+        Args:
+            profiles: Raw input data per profile, normalized here
+            explain: Also return an explain_crops style result per profile
+            
+        Returns:
+            One crop -> suitability dict per profile, in input order, or
+            (results, explanations) with explain
+        """
+        normalized = []
+        for profile in profiles:
+            profile = cls.normalize_input(profile)
+            if "Rainfall overall" in profile:
+                profile["Rainfall"] = profile.pop("Rainfall overall")
+            normalized.append(profile)
+        return RULE_ENGINE.evaluate(normalized, explain=explain)
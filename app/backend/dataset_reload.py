@@ -0,0 +1,221 @@
+"""
+Dataset Reload Module
+Rebuilds the crop dataset in a background thread and publishes it with a
+single reference swap, so requests never see a half-built generation
+"""
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+# Seconds between checks of the reload trigger file; every process serving
+# the dataset (each preforked worker) polls it
+TRIGGER_POLL_INTERVAL = 1.0
+
+
+class DatasetReloader:
+    """
+    Reload a dataset when its source file changes or on demand
+
+    ``load(version)`` builds a complete new generation (DataFrame, hierarchy,
+    indexes) without touching the one being served; ``publish(generation)``
+    then swaps it in. Readers keep using whichever generation they already
+    hold, so in-flight requests are never interrupted.
+
+    Each process holds its own generation, so an on-demand reload
+    (``request_reload``) also touches a trigger file next to the source;
+    the watcher of every other process sees it move and reloads as well.
+    ``prepare`` runs once before the trigger moves, so shared work (such
+    as rebuilding the snapshot) is done by the requesting process and the
+    others only open its result.
+    """
+
+    def __init__(self, source_path: str, load: Callable[[int], Any],
+                 publish: Callable[[Any], None], version: int = 1,
+                 trigger_path: Optional[str] = None, trigger_interval: float = TRIGGER_POLL_INTERVAL,
+                 prepare: Optional[Callable[[], Any]] = None):
+        """
+        Args:
+            source_path: File whose modification time triggers a reload
+            load: Builds the generation for a version number
+            publish: Makes a built generation visible to readers
+            version: Version number of the generation loaded at startup
+            trigger_path: File touched to make every process reload
+                (default: the source path plus ".reload")
+            trigger_interval: Seconds between checks of the trigger file
+                (0 disables them)
+            prepare: Work done once for every process before an on-demand
+                reload signals them
+        """
+        self.source_path = source_path
+        self._load = load
+        self._publish = publish
+        self._prepare = prepare
+        self.version = version
+        self.last_reload: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+        self._reload_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._reloading = False
+
+        self.trigger_path = trigger_path or os.path.normpath(source_path) + '.reload'
+        self._trigger_interval = trigger_interval
+        self._trigger_mtime = self._mtime(self.trigger_path)
+
+        self._source_mtime = self._mtime(self.source_path)
+        self._watch_interval = 0.0
+        self._watcher: Optional[threading.Thread] = None
+        self._watcher_pid: Optional[int] = None
+
+    @staticmethod
+    def _mtime(path: str) -> Optional[int]:
+        """Modification time of a file in nanoseconds, None while it is missing"""
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def reload(self) -> bool:
+        """
+        Build and publish the next generation in the calling thread
+
+        Returns:
+            True if a new generation was published; on failure the current
+            generation stays in place and the error is kept in ``last_error``
+        """
+        with self._reload_lock:
+            version = self.version + 1
+            start = time.perf_counter()
+            try:
+                generation = self._load(version)
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"✗ Dataset reload failed, keeping version {self.version}: {e}")
+                return False
+
+            self._publish(generation)
+            self.version = version
+            self.last_reload = time.time()
+            self.last_error = None
+            print(f"✓ Dataset version {version} published in {time.perf_counter() - start:.2f}s")
+            return True
+
+    def reload_async(self, before: Optional[Callable[[], None]] = None) -> bool:
+        """
+        Start a reload in a background thread
+
+        Args:
+            before: Run in that thread ahead of the reload
+
+        Returns:
+            False if a reload is already running (no second one is queued)
+        """
+        with self._state_lock:
+            if self._reloading:
+                return False
+            self._reloading = True
+
+        def run():
+            try:
+                if before is not None:
+                    before()
+                self.reload()
+            finally:
+                with self._state_lock:
+                    self._reloading = False
+
+        threading.Thread(target=run, name='dataset-reload', daemon=True).start()
+        return True
+
+    def request_reload(self) -> bool:
+        """
+        Reload in this process and signal every other process to reload
+
+        In a background thread, ``prepare`` runs first, then the trigger
+        file's modification time is moved forward; this process records
+        the new time so its own watcher does not reload a second time.
+
+        Returns:
+            False if a reload is already running in this process
+        """
+        return self.reload_async(before=self._signal)
+
+    def _signal(self):
+        """Prepare the next generation once, then move the trigger file"""
+        if self._prepare is not None:
+            try:
+                self._prepare()
+            except Exception as e:
+                # Each process's load still rebuilds what it needs
+                print(f"⚠️ Reload preparation failed: {e}")
+        try:
+            previous = self._mtime(self.trigger_path) or 0
+            now = max(time.time_ns(), previous + 1)
+            with open(self.trigger_path, 'a', encoding='utf-8'):
+                pass
+            os.utime(self.trigger_path, ns=(now, now))
+            self._trigger_mtime = self._mtime(self.trigger_path)
+        except OSError as e:
+            print(f"⚠️ Could not touch {self.trigger_path}, reloading this process only: {e}")
+
+    def watch(self, interval: float):
+        """
+        Poll the source file every `interval` seconds and reload when it changes
+
+        With interval 0 no thread starts here; ensure_watching still starts
+        the trigger file watcher in the processes that serve requests.
+        """
+        self._watch_interval = interval
+        if interval > 0:
+            self.ensure_watching()
+
+    def ensure_watching(self):
+        """
+        Make sure the watcher thread runs in this process
+
+        Threads do not survive fork(), so preforked workers call this (e.g.
+        before each request) to start their own watcher.
+        """
+        if self._watch_interval <= 0 and self._trigger_interval <= 0:
+            return
+        if self._watcher_pid == os.getpid() and self._watcher is not None and self._watcher.is_alive():
+            return
+        self._watcher_pid = os.getpid()
+        self._watcher = threading.Thread(target=self._watch_loop, name='dataset-watch', daemon=True)
+        self._watcher.start()
+
+    def _watch_loop(self):
+        """Reload whenever the trigger file or the source modification time moves"""
+        interval = min(i for i in (self._watch_interval, self._trigger_interval) if i > 0)
+        next_source_check = time.monotonic() + self._watch_interval
+        while True:
+            time.sleep(interval)
+            if self._trigger_interval > 0:
+                trigger = self._mtime(self.trigger_path)
+                if trigger is not None and trigger != self._trigger_mtime:
+                    self._trigger_mtime = trigger
+                    mtime = self._mtime(self.source_path)
+                    if self.reload():
+                        self._source_mtime = mtime
+                    continue
+
+            if self._watch_interval <= 0 or time.monotonic() < next_source_check:
+                continue
+            next_source_check = time.monotonic() + self._watch_interval
+            mtime = self._mtime(self.source_path)
+            if mtime is None or mtime == self._source_mtime:
+                continue
+            # Only remember the new mtime once it loaded, so a file caught
+            # half-written is retried on the next poll
+            if self.reload():
+                self._source_mtime = mtime
+
+    def status(self) -> Dict[str, Any]:
+        """Version and reload state for health/admin responses"""
+        return {
+            'version': self.version,
+            'reloading': self._reloading or self._reload_lock.locked(),
+            'last_reload': self.last_reload,
+            'last_error': self.last_error
+        }
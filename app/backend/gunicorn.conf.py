@@ -0,0 +1,41 @@
+"""
+Gunicorn configuration for the FarmOps backend
+Run with: gunicorn -c gunicorn.conf.py main:app
+
+The app (and with it the crop dataset) is loaded once in the master and the
+workers are forked from it. In shared-memory mode the crop/soil code
+matrices are memory-mapped from the snapshot and the lookup tables are
+inherited copy-on-write, so each extra worker adds almost no memory.
+
+Every worker holds its own dataset generation; an admin reload touches
+the workbook's ".reload" trigger file, which each worker polls, so all of
+them swap to the new version within a second or so. The snapshot is
+rebuilt once beforehand (by the worker taking the request, or under the
+snapshot's lock file when the workbook changed) and every worker opens it
+read-only: the code matrices stay shared through the page cache, but each
+worker builds its own lookup tables instead of inheriting them, so worker
+memory grows by their size until the next restart. gc.freeze below only
+covers the generation preloaded in the master.
+"""
+import gc
+import os
+
+os.environ.setdefault('CROP_DATA_SHARED', 'True')
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', '4'))
+preload_app = True
+
+# A collection in the master would leave freed holes in shared pages, and
+# one in a worker would write to the gc headers of every inherited object
+gc.disable()
+
+
+def pre_fork(server, worker):
+    """Move the preloaded objects out of the collector's reach before forking"""
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """Workers collect their own (request-scoped) garbage as usual"""
+    gc.enable()
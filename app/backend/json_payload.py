@@ -0,0 +1,103 @@
+"""
+JSON Payload Module
+Serialize large, rarely changing JSON responses once, keep them compressed,
+and answer conditional requests from a strong ETag
+"""
+import gzip
+import hashlib
+import json
+from typing import Any, Dict, Iterable, Optional
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:
+    # Optional: without it clients are served gzip
+    brotli = None
+
+# Records per chunk written to a streamed NDJSON response
+NDJSON_CHUNK_RECORDS = 256
+
+
+class PreparedJson:
+    """
+    A JSON document serialized once, with gzip and brotli encodings
+
+    The ETag is derived from the uncompressed body, so every worker that
+    serializes the same data hands out the same tag. Each content coding
+    gets its own strong tag (``"<hash>"``, ``"<hash>-gzip"``, ``"<hash>-br"``)
+    and any of them revalidates the document.
+    """
+
+    def __init__(self, data: Any):
+        """
+        Args:
+            data: JSON-serializable document; it is not referenced afterwards
+        """
+        self.body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.digest = hashlib.sha1(self.body).hexdigest()[:20]
+        self.gzip_body = gzip.compress(self.body, compresslevel=9, mtime=0)
+        self.brotli_body: Optional[bytes] = brotli.compress(self.body, quality=9) if brotli else None
+
+    def etag(self, encoding: Optional[str] = None) -> str:
+        """Strong ETag of one encoding of the document"""
+        return f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+
+    def matches(self, if_none_match) -> bool:
+        """
+        True if an If-None-Match header names any encoding of this document
+
+        If-None-Match compares weakly, so a tag a proxy marked weak (W/"...")
+        still revalidates.
+        """
+        return any(if_none_match.contains_weak(self.etag(encoding)[1:-1]) for encoding in (None, 'gzip', 'br'))
+
+    def response(self, max_age: int = 0) -> Response:
+        """
+        Response for the current request
+
+        Sends 304 without a body when If-None-Match matches, otherwise the
+        best encoding the client accepts (brotli, gzip, then identity).
+        """
+        accept = request.accept_encodings
+        if self.brotli_body is not None and accept['br']:
+            encoding, body = 'br', self.brotli_body
+        elif accept['gzip']:
+            encoding, body = 'gzip', self.gzip_body
+        else:
+            encoding, body = None, self.body
+
+        headers = {
+            'ETag': self.etag(encoding),
+            'Vary': 'Accept-Encoding',
+            'Cache-Control': f'public, max-age={max_age}, must-revalidate'
+        }
+        if self.matches(request.if_none_match):
+            return Response(status=304, headers=headers)
+
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        return Response(body, status=200, mimetype='application/json', headers=headers)
+
+
+def ndjson_response(records: Iterable[Dict[str, Any]]) -> Response:
+    """Stream records as newline-delimited JSON, one object per line"""
+    return ndjson_lines_response(
+        json.dumps(record, ensure_ascii=False, separators=(',', ':')) for record in records
+    )
+
+
+def ndjson_lines_response(lines: Iterable[str], headers: Optional[Dict[str, str]] = None) -> Response:
+    """Stream already serialized JSON objects, one per line, in chunks"""
+    def generate():
+        chunk = []
+        for line in lines:
+            chunk.append(line)
+            if len(chunk) >= NDJSON_CHUNK_RECORDS:
+                yield '\n'.join(chunk) + '\n'
+                chunk = []
+        if chunk:
+            yield '\n'.join(chunk) + '\n'
+
+    return Response(generate(), status=200, mimetype='application/x-ndjson', headers=headers)
@@ -0,0 +1,590 @@
+"""
+Location Store Module
+Process-wide lookup structures for the state -> district -> block -> village
+dropdowns, built once from the already-loaded crop DataFrame
+"""
+import base64
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from crop_dataset import (
+    CROP_COLUMNS, LOCATION_COLUMNS, SOIL_COLUMNS, dataset_fingerprint, encode_matrix,
+    list_state_partitions, load_crop_dataframe, load_snapshot_matrices
+)
+from location_search import LocationSearchIndex
+
+
+class LocationStore:
+    """
+    Precomputed answers for every location query the routes make
+
+    All lists are sorted once at build time and shared between requests,
+    so callers must treat them as read-only.
+    """
+
+    def __init__(self, df: pd.DataFrame, matrices: Optional[Dict[str, Dict[str, Any]]] = None,
+                 version: int = 0):
+        """
+        Build the store from a cleaned crop DataFrame
+
+        Args:
+            df: DataFrame with ffilled STATE/DISTRICT NAME/BLOCK NAME/VILLAGE NAME
+            matrices: Pre-encoded crop/soil code matrices for the same rows,
+                normally memory-mapped from the snapshot (see
+                ``crop_dataset.load_snapshot_matrices``); encoded from df if omitted
+            version: Dataset generation this store belongs to
+        """
+        self.version = version
+        self.rows = len(df)
+        self.fingerprint = dataset_fingerprint(df) if len(df.columns) else ''
+        self._states: List[str] = []
+        self._districts: Dict[str, List[str]] = {}
+        self._blocks: Dict[Tuple[str, str], List[str]] = {}
+        self._villages: Dict[Tuple[str, str, str], List[str]] = {}
+        # Hashed index: location prefix (1 to 4 names) -> position of its
+        # first row, so every lookup is a single dict probe
+        self._first_row: Dict[tuple, int] = {}
+
+        # Row-aligned crop and soil codes, one label table per group; a hit
+        # on the index is decoded from these without touching the DataFrame.
+        # Matrices mapped from a snapshot share their pages across processes.
+        matrices = matrices or {}
+        self.crop_columns, self.crop_labels, self.crop_codes = self._matrix(df, 'crop', CROP_COLUMNS, matrices)
+        self.soil_columns, self.soil_labels, self.soil_codes = self._matrix(df, 'soil', SOIL_COLUMNS, matrices)
+        # Trailing NaN so that the -1 "missing" code decodes by plain indexing
+        self._crop_decode = self.crop_labels + [np.nan]
+        self._soil_decode = self.soil_labels + [np.nan]
+
+        # Same queries on whitespace-stripped names, ignoring the state
+        self._stripped_districts: List[str] = []
+        self._stripped_blocks: Dict[str, List[str]] = {}
+        self._stripped_villages: Dict[Tuple[str, str], List[str]] = {}
+        self._stripped_first_row: Dict[Tuple[str, str, str], int] = {}
+
+        # Nested state -> district -> block -> [villages] tree for the dropdowns
+        self._hierarchy: Dict[str, Dict[str, Dict[str, List[str]]]] = {}
+        # Name search index, built on the first search
+        self._search_index: Optional[LocationSearchIndex] = None
+        self._search_lock = threading.Lock()
+        # Derived values (serialized payloads, ...) that live as long as this
+        # dataset version, see cached()
+        self._cache: Dict[str, Any] = {}
+        self._cache_lock = threading.Lock()
+        self._cache_locks: Dict[str, threading.Lock] = {}
+        self.build_stats: Dict[str, Any] = {'seconds': 0.0, 'hierarchy_bytes': 0, 'total_bytes': 0}
+
+        if not df.empty and all(col in df.columns for col in LOCATION_COLUMNS):
+            start = time.perf_counter()
+            self._build(df)
+            self.build_stats = {
+                'seconds': time.perf_counter() - start,
+                'villages': sum(len(v) for v in self._villages.values()),
+                'hierarchy_bytes': _deep_sizeof(self._hierarchy),
+                'total_bytes': _deep_sizeof([
+                    self._states, self._districts, self._blocks, self._villages,
+                    self._first_row, self._stripped_districts, self._stripped_blocks,
+                    self._stripped_villages, self._stripped_first_row, self._hierarchy
+                ])
+            }
+
+    def _build(self, df: pd.DataFrame):
+        """Fill every lookup table from the location columns"""
+        positions = np.arange(len(df))
+        # Categoricals decode to their shared category strings, so every
+        # table key refers to one str object per distinct name
+        locations = pd.DataFrame(
+            {col: np.asarray(df[col], dtype=object) for col in LOCATION_COLUMNS}
+        ).assign(_row=positions)
+        self._build_tables(locations, LOCATION_COLUMNS, self._first_row)
+
+        self._states = sorted(locations['STATE'].unique().tolist())
+        self._districts = self._children(locations, LOCATION_COLUMNS[:2])
+        self._blocks = self._children(locations, LOCATION_COLUMNS[:3])
+        self._villages = self._children(locations, LOCATION_COLUMNS)
+
+        self._hierarchy = self._tree(self._villages)
+
+        stripped_cols = LOCATION_COLUMNS[1:]
+        stripped = locations[stripped_cols].apply(lambda col: col.str.strip())
+        stripped['_row'] = positions
+        stripped = stripped[(stripped[stripped_cols] != '').all(axis=1)]
+        stripped_first_row = {}
+        self._build_tables(stripped, stripped_cols, stripped_first_row)
+        self._stripped_first_row = {k: v for k, v in stripped_first_row.items() if len(k) == 3}
+
+        self._stripped_districts = sorted(stripped['DISTRICT NAME'].unique().tolist())
+        self._stripped_blocks = self._children(stripped, stripped_cols[:2])
+        self._stripped_villages = self._children(stripped, stripped_cols)
+
+    @staticmethod
+    def _matrix(df: pd.DataFrame, name: str, columns: List[str],
+                matrices: Dict[str, Dict[str, Any]]) -> Tuple[List[str], List[Any], np.ndarray]:
+        """Use the pre-encoded matrix for a column group if it fits df, else encode it"""
+        present = [col for col in columns if col in df.columns]
+        matrix = matrices.get(name)
+        if matrix and matrix['columns'] == present and len(matrix['codes']) == len(df):
+            return matrix['columns'], list(matrix['labels']), matrix['codes']
+        codes, labels = encode_matrix(df, present)
+        return present, labels, codes
+
+    @staticmethod
+    def _build_tables(locations: pd.DataFrame, columns: List[str], first_row: Dict[tuple, int]):
+        """Record the first row position of every location prefix"""
+        for depth in range(1, len(columns) + 1):
+            level = locations.drop_duplicates(columns[:depth])
+            keys = zip(*(level[col].tolist() for col in columns[:depth]))
+            first_row.update(zip(keys, level['_row'].tolist()))
+
+    @staticmethod
+    def _children(locations: pd.DataFrame, columns: List[str]) -> Dict:
+        """Map each parent key to the sorted, distinct values of its last column"""
+        parent_cols, child_col = columns[:-1], columns[-1]
+        pairs = locations[columns].drop_duplicates().sort_values(columns)
+        children = {}
+        for key, group in pairs.groupby(parent_cols, sort=False)[child_col]:
+            # Single-level parents are keyed by the bare name, not a 1-tuple
+            children[key[0] if len(parent_cols) == 1 else key] = group.tolist()
+        return children
+
+    @staticmethod
+    def _tree(villages: Dict[Tuple[str, str, str], List[str]]) -> Dict[str, Dict[str, Dict[str, List[str]]]]:
+        """Nest a (state, district, block) -> villages table into the dropdown tree"""
+        # Blocks arrive in sorted order, so the tree is sorted at every level
+        # and shares its village lists with the lookup table
+        tree = {}
+        for (state, district, block), names in villages.items():
+            tree.setdefault(state, {}).setdefault(district, {})[block] = names
+        return tree
+
+    def cached(self, name: str, build: Optional[Callable[[], Any]] = None) -> Any:
+        """
+        Value derived from this dataset version, computed on first use
+
+        A reload publishes a new store, so cached values never outlive the
+        data they were computed from. Concurrent first requests build the
+        value once; the others wait for it. Without ``build`` this only
+        peeks and returns None if the value was never computed.
+        """
+        return _cached_value(self._cache, self._cache_lock, self._cache_locks, name, build)
+
+    def for_state(self, state: str) -> 'LocationStore':
+        """Store that answers lookups under a state (this one holds every state)"""
+        return self
+
+    def get_hierarchy(self) -> Dict[str, Dict[str, Dict[str, List[str]]]]:
+        """Get complete state -> district -> block -> villages tree"""
+        return self._hierarchy
+
+    def describe_build(self) -> str:
+        """One-line summary of the build time and memory footprint"""
+        stats = self.build_stats
+        return (
+            f"{stats.get('villages', 0)} villages in {stats['seconds'] * 1000:.0f} ms, "
+            f"hierarchy {stats['hierarchy_bytes'] / 1024:.0f} KiB, "
+            f"all lookups {stats['total_bytes'] / 1024:.0f} KiB"
+        )
+
+    def get_states(self) -> List[str]:
+        """Get list of all states"""
+        return self._states
+
+    def get_districts(self, state: str) -> List[str]:
+        """Get list of districts for a state"""
+        return self._districts.get(state, [])
+
+    def get_blocks(self, state: str, district: str) -> List[str]:
+        """Get list of blocks for a district"""
+        return self._blocks.get((state, district), [])
+
+    def get_villages(self, state: str, district: str, block: str) -> List[str]:
+        """Get list of villages for a block"""
+        return self._villages.get((state, district, block), [])
+
+    def search(self, query: str, limit: int = 10, kinds: Optional[List[str]] = None,
+               state: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Ranked district/block/village matches for a free-text query
+
+        See ``LocationSearchIndex.search``; the index is built once, on the
+        first call, from the lookup tables.
+        """
+        index = self._search_index
+        if index is None:
+            with self._search_lock:
+                if self._search_index is None:
+                    entries = [(state, district) for state, districts in self._districts.items() for district in districts]
+                    entries += [key + (block,) for key, blocks in self._blocks.items() for block in blocks]
+                    entries += [key + (village,) for key, villages in self._villages.items() for village in villages]
+                    self._search_index = LocationSearchIndex(entries)
+                index = self._search_index
+        return index.search(query, limit=limit, kinds=kinds, state=state)
+
+    def find_row(self, state: str, district: Optional[str] = None,
+                 block: Optional[str] = None, village: Optional[str] = None) -> Optional[int]:
+        """
+        Position of the first row matching a location
+
+        Omitted (None or blank) levels match anything, e.g. only a state
+        and district returns the first row of that district. Without gaps
+        this is a single probe; a gap (a block without its district) looks
+        up each given name in the per-level index of the deepest given
+        level and intersects the matches, rarest name first.
+        """
+        names = [state, district, block, village]
+        given = [bool(name and name.strip()) for name in names]
+        depth = max(i + 1 for i, has in enumerate(given) if has) if any(given) else 0
+        if all(given[:depth]):
+            return self._first_row.get(tuple(names[:depth])) if depth else None
+
+        positions, levels = self._level_index(depth)
+        found = []
+        for level in range(depth):
+            if given[level]:
+                posting = levels[level][1].get(names[level])
+                if posting is None:
+                    return None
+                found.append((level, *posting))
+        # Rarest name first; the other names only filter its prefixes
+        found.sort(key=lambda item: len(item[2]))
+        matches = found[0][2]
+        for level, code, _ in found[1:]:
+            matches = matches[levels[level][0][matches] == code]
+        return int(positions[matches].min()) if len(matches) else None
+
+    def _level_index(self, depth: int) -> Tuple[np.ndarray, List[Tuple[np.ndarray, Dict[str, Tuple[int, np.ndarray]]]]]:
+        """
+        Per-level postings over the location prefixes of one depth
+
+        Returns the prefixes' first-row positions and, per level, each
+        prefix's name code plus name -> (code, prefixes with that name).
+        """
+        def build():
+            keys = [key for key in self._first_row if len(key) == depth]
+            positions = np.fromiter((self._first_row[key] for key in keys), dtype=np.int64, count=len(keys))
+            levels = []
+            for level in range(depth):
+                codes, names = pd.factorize(pd.Series([key[level] for key in keys], dtype=object))
+                order = np.argsort(codes, kind='stable')
+                runs = np.split(order, np.flatnonzero(np.diff(codes[order])) + 1) if len(order) else []
+                levels.append((codes, {names[int(codes[run[0]])]: (int(codes[run[0]]), run) for run in runs}))
+            return positions, levels
+
+        return self.cached(f'level-index\x1f{depth}', build)
+
+    def find_village_row(self, state: str, district: str, block: str, village: str) -> Optional[int]:
+        """Position of the first row of an exact state/district/block/village"""
+        return self._first_row.get((state, district, block, village))
+
+    def get_crop_suitability(self, position: int) -> Dict[str, Any]:
+        """Crop name -> suitability label for the row at a position"""
+        labels = self._crop_decode
+        return {col: labels[code] for col, code in zip(self.crop_columns, self.crop_codes[position].tolist())}
+
+    def village_rows(self) -> Tuple[List[Tuple[str, str, str, str]], np.ndarray]:
+        """Every distinct village with the position of its first row, grouped by block"""
+        keys = [block + (village,) for block, villages in self._villages.items() for village in villages]
+        positions = np.fromiter((self._first_row[key] for key in keys), dtype=np.int64, count=len(keys))
+        return keys, positions
+
+    def find_village_rows(self, locations: List[Tuple[str, str, str, str]]) -> np.ndarray:
+        """
+        Positions of many exact (state, district, block, village) tuples
+
+        One probe of the hashed index per tuple, no scans; -1 marks a tuple
+        that is not in the dataset.
+        """
+        first_row = self._first_row
+        return np.fromiter((first_row.get(location, -1) for location in locations),
+                           dtype=np.int64, count=len(locations))
+
+    def crop_suitability_json(self, positions: np.ndarray) -> np.ndarray:
+        """
+        Crop suitability of many rows as serialized JSON objects
+
+        Rows share a handful of distinct suitability combinations, so each
+        combination is serialized once per dataset version and rows only
+        pick theirs; missing labels become null.
+        """
+        def build():
+            combinations, row_combination = np.unique(self.crop_codes, axis=0, return_inverse=True)
+            labels = [label if isinstance(label, str) else None for label in self._crop_decode]
+            fragments = np.array([
+                json.dumps(dict(zip(self.crop_columns, (labels[code] for code in row))),
+                           ensure_ascii=False, separators=(',', ':'))
+                for row in combinations.tolist()
+            ], dtype=object)
+            return fragments, row_combination.reshape(-1)
+
+        fragments, row_combination = self.cached('crop-suitability-json', build)
+        return fragments[row_combination[positions]]
+
+    def get_soil_values(self, position: int) -> Dict[str, Any]:
+        """Soil/climate column -> value for the row at a position"""
+        labels = self._soil_decode
+        return {col: labels[code] for col, code in zip(self.soil_columns, self.soil_codes[position].tolist())}
+
+    def stripped_districts(self) -> List[str]:
+        """Whitespace-stripped district names across all states"""
+        return self._stripped_districts
+
+    def stripped_blocks(self, district: str) -> List[str]:
+        """Whitespace-stripped block names of a stripped district name"""
+        return self._stripped_blocks.get(district, [])
+
+    def stripped_villages(self, district: str, block: str) -> List[str]:
+        """Whitespace-stripped village names of a stripped district/block"""
+        return self._stripped_villages.get((district, block), [])
+
+    def find_stripped_row(self, district: str, block: str, village: str) -> Optional[int]:
+        """Position of the first row matching stripped district/block/village names"""
+        return self._stripped_first_row.get((district, block, village))
+
+
+def load_location_store(excel_path: str, version: int = 0) -> Tuple[pd.DataFrame, LocationStore]:
+    """
+    Load the cleaned dataset and build its store as one complete generation
+
+    Returns:
+        (df, store); the store's crop/soil codes are memory-mapped from the
+        snapshot when one is available
+    """
+    df = load_crop_dataframe(excel_path)
+    return df, LocationStore(df, matrices=load_snapshot_matrices(excel_path), version=version)
+
+
+class PartitionedLocationStore:
+    """
+    Location lookups over a directory of per-state partitions
+
+    Only the state list is known up front. A state's partition is loaded
+    into its own ``LocationStore`` the first time anything below the state
+    level is asked for, and the least recently used states are evicted once
+    more than ``max_states`` are loaded. Each state's dropdown tree is kept
+    apart from the LRU, so it outlives the partition's row data.
+    """
+
+    def __init__(self, directory: str, max_states: int = 4, version: int = 0):
+        """
+        Args:
+            directory: Partition directory (see ``crop_dataset.list_state_partitions``)
+            max_states: Number of state partitions kept loaded at once
+            version: Dataset generation this store belongs to
+        """
+        self.directory = directory
+        self.max_states = max(1, max_states)
+        self.version = version
+        self.rows = None
+        self._partitions = list_state_partitions(directory)
+        self._states = sorted(self._partitions)
+        self.fingerprint = _partition_fingerprint(directory, self._states)
+        self.build_stats: Dict[str, Any] = {'loads': 0, 'evictions': 0}
+
+        self._loaded: 'OrderedDict[str, LocationStore]' = OrderedDict()
+        self._lock = threading.Lock()
+        # One lock per state so concurrent first requests load it only once
+        self._state_locks: Dict[str, threading.Lock] = {state: threading.Lock() for state in self._states}
+        self._empty = LocationStore(pd.DataFrame(), version=version)
+        # State -> district -> block -> villages tree of every state seen so far
+        self._hierarchies: Dict[str, Dict[str, Dict[str, List[str]]]] = {}
+        self._cache: Dict[str, Any] = {}
+        self._cache_lock = threading.Lock()
+        self._cache_locks: Dict[str, threading.Lock] = {}
+
+    def cached(self, name: str, build: Optional[Callable[[], Any]] = None) -> Any:
+        """Value derived from this dataset version, computed once on first use"""
+        return _cached_value(self._cache, self._cache_lock, self._cache_locks, name, build)
+
+    def for_state(self, state: str) -> LocationStore:
+        """Store holding a state's partition, loading it on first use"""
+        if state not in self._partitions:
+            return self._empty
+
+        with self._lock:
+            store = self._loaded.get(state)
+            if store is not None:
+                self._loaded.move_to_end(state)
+                return store
+
+        with self._state_locks[state]:
+            with self._lock:
+                store = self._loaded.get(state)
+            if store is None:
+                _, store = load_location_store(self._partitions[state], version=self.version)
+                print(f"✓ Loaded state partition {state}: {store.describe_build()}")
+
+            with self._lock:
+                if state not in self._loaded:
+                    self.build_stats['loads'] += 1
+                self._hierarchies.setdefault(state, store.get_hierarchy().get(state, {}))
+                self._loaded[state] = store
+                self._loaded.move_to_end(state)
+                while len(self._loaded) > self.max_states:
+                    evicted, _ = self._loaded.popitem(last=False)
+                    self.build_stats['evictions'] += 1
+                    print(f"ℹ️ Evicted state partition {evicted}")
+            return store
+
+    def loaded_states(self) -> List[str]:
+        """States currently held in memory, least recently used first"""
+        with self._lock:
+            return list(self._loaded)
+
+    def get_hierarchy(self) -> Dict[str, Dict[str, Dict[str, List[str]]]]:
+        """
+        Get complete state -> district -> block -> villages tree
+
+        States that were never loaded have their tree built from the
+        partition's location columns alone, without building their store
+        or touching the LRU of loaded partitions.
+        """
+        return {state: self._state_hierarchy(state) for state in self._states}
+
+    def _state_hierarchy(self, state: str) -> Dict[str, Dict[str, List[str]]]:
+        """District -> block -> villages tree of one state, built once"""
+        with self._lock:
+            tree = self._hierarchies.get(state)
+        if tree is not None:
+            return tree
+
+        with self._state_locks[state]:
+            with self._lock:
+                tree = self._hierarchies.get(state)
+            if tree is None:
+                df = load_crop_dataframe(self._partitions[state])
+                locations = pd.DataFrame({col: np.asarray(df[col], dtype=object) for col in LOCATION_COLUMNS})
+                tree = LocationStore._tree(LocationStore._children(locations, LOCATION_COLUMNS)).get(state, {})
+                with self._lock:
+                    tree = self._hierarchies.setdefault(state, tree)
+            return tree
+
+    def describe_build(self) -> str:
+        """One-line summary of the partitions and the LRU"""
+        return (
+            f"{len(self._states)} state partitions in {self.directory}, "
+            f"{len(self._loaded)}/{self.max_states} loaded, "
+            f"{self.build_stats['loads']} loads, {self.build_stats['evictions']} evictions"
+        )
+
+    def get_states(self) -> List[str]:
+        """Get list of all states"""
+        return self._states
+
+    def search(self, query: str, limit: int = 10, kinds: Optional[List[str]] = None,
+               state: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Ranked location matches, within one state or across all of them
+
+        Without a state every partition is visited (and loaded if needed),
+        so callers that know the state should pass it.
+        """
+        states = [state] if state else self._states
+        matches = []
+        for name in states:
+            matches.extend(self.for_state(name).search(query, limit=limit, kinds=kinds, state=name))
+        matches.sort(key=lambda match: -match['score'])
+        return matches[:limit]
+
+    def get_districts(self, state: str) -> List[str]:
+        """Get list of districts for a state"""
+        return self.for_state(state).get_districts(state)
+
+    def get_blocks(self, state: str, district: str) -> List[str]:
+        """Get list of blocks for a district"""
+        return self.for_state(state).get_blocks(state, district)
+
+    def get_villages(self, state: str, district: str, block: str) -> List[str]:
+        """Get list of villages for a block"""
+        return self.for_state(state).get_villages(state, district, block)
+
+
+def encode_cursor(name: str) -> str:
+    """Opaque pagination cursor pointing just past a name"""
+    return base64.urlsafe_b64encode(name.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> str:
+    """
+    Name a cursor points past
+
+    Raises:
+        ValueError: If the cursor was not produced by ``encode_cursor``
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return base64.b64decode(padded, altchars=b'-_', validate=True).decode('utf-8')
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def paginate_sorted(items: List[str], limit: Optional[int] = None,
+                    cursor: Optional[str] = None) -> Tuple[List[str], Optional[str]]:
+    """
+    One page of an already sorted list
+
+    The cursor carries the last name of the previous page rather than an
+    offset, so it stays valid across workers and dataset reloads; the page
+    is found by bisection and returned as a slice, never re-sorted.
+
+    Returns:
+        (page, next_cursor); next_cursor is None on the last page
+    """
+    start = bisect_right(items, decode_cursor(cursor)) if cursor else 0
+    if limit is None:
+        return items[start:], None
+    page = items[start:start + limit]
+    next_cursor = encode_cursor(page[-1]) if page and start + limit < len(items) else None
+    return page, next_cursor
+
+
+def _cached_value(cache: Dict[str, Any], lock: threading.Lock, locks: Dict[str, threading.Lock],
+                  name: str, build: Optional[Callable[[], Any]]) -> Any:
+    """
+    Look up a cached value, building it under its own lock if missing
+
+    One lock per name, so a slow build (a cube, a ranking) never holds up
+    requests for other values; ``lock`` only guards the lock table.
+    """
+    value = cache.get(name)
+    if value is not None or build is None:
+        return value
+    with lock:
+        name_lock = locks.setdefault(name, threading.Lock())
+    with name_lock:
+        value = cache.get(name)
+        if value is None:
+            value = cache[name] = build()
+    return value
+
+
+def _partition_fingerprint(directory: str, states: List[str]) -> str:
+    """Short hash of the partition files' names, sizes and modification times"""
+    digest = hashlib.sha1()
+    for name in sorted(os.listdir(directory)):
+        if os.path.splitext(name)[0] in states:
+            stat = os.stat(os.path.join(directory, name))
+            digest.update(f"{name}\x1f{stat.st_size}\x1f{stat.st_mtime_ns}\n".encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def _deep_sizeof(obj: Any, seen: Optional[set] = None) -> int:
+    """Approximate memory held by nested dicts/lists/tuples, counting shared objects once"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_sizeof(k, seen) + _deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(_deep_sizeof(item, seen) for item in obj)
+    return size
@@ -2,12 +2,15 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 from pymongo import MongoClient
 from datetime import datetime, timedelta
+import hmac
 import os
 from dotenv import load_dotenv
 import random
 import requests
 from crop_recommendation import CropRecommendationService
 from crop_growth_service import CropGrowthService
+from json_payload import ndjson_lines_response, ndjson_response
+from village_similarity import parse_k, split_profile
 import re
 import google.generativeai as genai
 
@@ -47,7 +50,51 @@ except Exception as e:
 
 # Initialize Crop Recommendation Service
 excel_path = os.getenv('CROP_DATA_PATH', 'cropresults_with_state (1).xlsx')
-crop_service = CropRecommendationService(excel_path=excel_path)
+shared_crop_data = os.getenv('CROP_DATA_SHARED', 'False') == 'True'
+# Only used when CROP_DATA_PATH is a directory of per-state partitions
+crop_data_max_states = int(os.getenv('CROP_DATA_MAX_STATES', '4'))
+crop_service = CropRecommendationService(
+    excel_path=excel_path,
+    shared_memory=shared_crop_data,
+    max_loaded_states=crop_data_max_states
+)
+
+# Largest page the paginated listing endpoints hand out
+MAX_PAGE_SIZE = 1000
+# Most locations one bulk suitability request may resolve
+MAX_BULK_LOCATIONS = 100000
+# Most soil profiles one batch evaluation request may score
+MAX_BATCH_PROFILES = 100000
+# Soil and climate parameters every evaluated profile must carry
+EVALUATE_PARAMETERS = [
+    'Nitrogen', 'Phosphorus', 'Potassium', 'OC', 'EC', 'pH',
+    'Copper', 'Boron', 'Sulphur', 'Iron', 'Zinc', 'Manganese',
+    'Temperature_Summer', 'Temperature_Winter', 'Temperature_Monsoon', 'Rainfall'
+]
+
+def parse_page_limit(value):
+    """Page size from a query string value, None when absent"""
+    if not value:
+        return None
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+    return limit
+
+# Hot reload: poll the workbook every N seconds (0 disables the watcher);
+# POST /api/admin/reload-dataset with X-Admin-Token triggers one on demand
+# in every worker (see DatasetReloader.request_reload)
+crop_data_watch_interval = float(os.getenv('CROP_DATA_WATCH_INTERVAL', '0'))
+ADMIN_RELOAD_TOKEN = os.getenv('ADMIN_RELOAD_TOKEN', '')
+crop_service.reloader.watch(crop_data_watch_interval)
+
+@app.before_request
+def ensure_dataset_watcher():
+    """Start the workbook watcher in preforked workers (threads do not survive fork)"""
+    crop_service.reloader.ensure_watching()
 
 # ==================== AGRICULTURAL CHATBOT ====================
 class AgriculturalChatbot:
@@ -1207,17 +1254,43 @@ def get_blocks(state, district):
 
 @app.route('/api/crop/villages/<state>/<district>/<block>', methods=['GET'])
 def get_villages(state, district, block):
-    """Get list of villages for a block"""
+    """
+    Get list of villages for a block
+    Optional query params: limit (1-1000) and cursor (next_cursor of the
+    previous page); format=ndjson streams one village object per line
+    """
     try:
-        villages = crop_service.get_villages(state, district, block)
-        return jsonify({
+        try:
+            limit = parse_page_limit(request.args.get('limit'))
+            villages, next_cursor, total = crop_service.get_villages_page(
+                state, district, block,
+                limit=limit,
+                cursor=request.args.get('cursor') or None
+            )
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+        
+        if request.args.get('format') == 'ndjson':
+            return ndjson_response(
+                {'state': state, 'district': district, 'block': block, 'village': village}
+                for village in villages
+            )
+        
+        response = {
             'status': 'success',
             'state': state,
             'district': district,
             'block': block,
             'villages': villages,
             'count': len(villages)
-        }), 200
+        }
+        if limit is not None or request.args.get('cursor'):
+            response['total'] = total
+            response['next_cursor'] = next_cursor
+        return jsonify(response), 200
     except Exception as e:
         print(f"Error getting villages: {e}")
         return jsonify({
@@ -1227,19 +1300,257 @@ def get_villages(state, district, block):
 
 @app.route('/api/crop/dropdown-data', methods=['GET'])
 def get_dropdown_data():
-    """Get complete dropdown hierarchy"""
+    """
+    Get complete dropdown hierarchy
+    Serialized once per dataset version; answers If-None-Match with 304
+    """
+    try:
+        return crop_service.get_dropdown_payload().response()
+    except Exception as e:
+        print(f"Error getting dropdown data: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to fetch dropdown data: {str(e)}'
+        }), 500
+
+@app.route('/api/crop/search', methods=['GET'])
+def search_locations():
+    """
+    Type-ahead search over district, block and village names
+    Query params: q (required), limit (default 10, max 50),
+    type (comma-separated district/block/village), state
+    """
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({
+                'status': 'error',
+                'message': 'Missing required parameter: q'
+            }), 400
+        
+        try:
+            limit = min(max(int(request.args.get('limit', 10)), 1), 50)
+        except ValueError:
+            limit = 10
+        kinds = [kind.strip() for kind in request.args.get('type', '').split(',') if kind.strip()]
+        
+        results = crop_service.search_locations(
+            query,
+            limit=limit,
+            kinds=kinds or None,
+            state=request.args.get('state') or None
+        )
+        return jsonify({
+            'status': 'success',
+            'query': query,
+            'results': results,
+            'count': len(results)
+        }), 200
+    except Exception as e:
+        print(f"Error searching locations: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to search locations: {str(e)}'
+        }), 500
+
+@app.route('/api/crop/summary', methods=['GET'])
+def get_crop_summary():
+    """
+    Count villages per crop and suitability for a region
+    Query params: state, district, block (omit trailing levels to go up a
+    level), crop and suitability to narrow the counts. The response lists
+    the same counts for each sub-region under "children" for drill-down.
+    """
     try:
-        data = crop_service.get_dropdown_data()
+        region = {level: request.args.get(level) or None for level in ('state', 'district', 'block')}
+        try:
+            summary = crop_service.get_summary(
+                crop=request.args.get('crop') or None,
+                suitability=request.args.get('suitability') or None,
+                **region
+            )
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+        
+        if summary is None:
+            return jsonify({
+                'status': 'error',
+                'message': 'No crop data found for this region'
+            }), 404
+        
         return jsonify({
             'status': 'success',
-            'data': data,
-            'states_count': len(data)
+            'region': {level: name for level, name in region.items() if name},
+            **summary
         }), 200
     except Exception as e:
-        print(f"Error getting dropdown data: {e}")
+        print(f"Error getting crop summary: {e}")
         return jsonify({
             'status': 'error',
-            'message': f'Failed to fetch dropdown data: {str(e)}'
+            'message': f'Failed to fetch crop summary: {str(e)}'
+        }), 500
+
+@app.route('/api/crop/top-locations', methods=['GET'])
+def get_top_crop_locations():
+    """
+    Rank the villages of a region for a crop
+    Query params: crop (required), region as "State/District/Block" (or
+    state, district, block; omit trailing levels to go up a level), k
+    villages (default 10, at most MAX_PAGE_SIZE). Villages are ordered by a
+    0-100 score: the suitability label sets the band and the share of the
+    crop's soil/climate conditions met places the village within it.
+    """
+    try:
+        crop = request.args.get('crop', '').strip()
+        if not crop:
+            return jsonify({
+                'status': 'error',
+                'message': 'crop is required'
+            }), 400
+        
+        if request.args.get('region'):
+            names = [name for name in request.args['region'].split('/') if name.strip()]
+            region = dict(zip(('state', 'district', 'block'), names))
+        else:
+            region = {level: request.args.get(level) for level in ('state', 'district', 'block') if request.args.get(level)}
+        
+        try:
+            k = parse_page_limit(request.args.get('k')) or 10
+            villages = crop_service.get_top_locations(crop, k=k, **region)
+        except (TypeError, ValueError) as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e).replace('limit', 'k')
+            }), 400
+        
+        if villages is None:
+            return jsonify({
+                'status': 'error',
+                'message': 'No crop data found for this region'
+            }), 404
+        
+        return jsonify({
+            'status': 'success',
+            'crop': crop,
+            'region': region,
+            'count': len(villages),
+            'villages': villages
+        }), 200
+    except Exception as e:
+        print(f"Error ranking crop locations: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to rank crop locations: {str(e)}'
+        }), 500
+
+@app.route('/api/crop/filter', methods=['POST'])
+def filter_crop_villages():
+    """
+    Villages matching a compound crop, soil and region filter
+    Expected JSON body: {
+        "where": {"and": [
+            {"column": "Cotton", "eq": "Highly Suitable"},
+            {"column": "Soyabean", "at_least": "Moderately Suitable"},
+            {"column": "EC", "eq": "Non-Saline"},
+            {"not": {"column": "DISTRICT NAME", "in": ["Pune"]}}
+        ]},
+        "limit": 100,
+        "cursor": "<next_cursor of the previous page>"
+    }
+    Conditions ("eq", "in", or "at_least" for crop columns) combine with
+    "and", "or" and "not"; each is one precomputed village bitmap, so the
+    count and page come from bitmap operations, not row scans.
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or not isinstance(data.get('where'), dict):
+            return jsonify({
+                'status': 'error',
+                'message': 'where must be a filter expression object'
+            }), 400
+        
+        try:
+            limit = parse_page_limit(str(data.get('limit', '')).strip()) or 100
+            total, villages, next_cursor = crop_service.filter_villages(
+                data['where'], limit=limit, cursor=data.get('cursor')
+            )
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+        
+        response = {
+            'status': 'success',
+            'count': total,
+            'villages': villages
+        }
+        if next_cursor:
+            response['next_cursor'] = next_cursor
+        return jsonify(response), 200
+    except Exception as e:
+        print(f"Error filtering villages: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to filter villages: {str(e)}'
+        }), 500
+
+@app.route('/api/crop/similar-villages', methods=['POST'])
+def get_similar_villages():
+    """
+    Villages with the most similar soil and climate
+    Expected JSON body: {"state", "district", "block", "village"} of a
+    village, or {"profile": {...}} with the soil/climate parameters of
+    /api/crop/evaluate (levels or numeric readings); "k" villages (default
+    10, at most MAX_SIMILAR_VILLAGES). Answered from a KD-tree over every
+    village's soil and climate vector, nearest first, each with its crop
+    suitability.
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({
+                'status': 'error',
+                'message': 'A JSON object with a village or a soil profile is required'
+            }), 400
+        
+        location = None
+        if any(data.get(level) for level in ('state', 'district', 'block', 'village')):
+            location = tuple(data.get(level) or '' for level in ('state', 'district', 'block', 'village'))
+        profile = data.get('profile')
+        
+        try:
+            k = parse_k(data.get('k'))
+            if profile is not None:
+                # Numeric readings pass through; level texts are normalized
+                levels, readings = split_profile(profile)
+                profile = {**crop_service.normalize_input(levels), **readings}
+            villages = crop_service.similar_villages(location=location, profile=profile, k=k)
+        except (AttributeError, TypeError, ValueError) as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+        
+        if villages is None:
+            return jsonify({
+                'status': 'error',
+                'message': 'Location not found'
+            }), 404
+        
+        return jsonify({
+            'status': 'success',
+            'count': len(villages),
+            'villages': villages
+        }), 200
+    except Exception as e:
+        print(f"Error finding similar villages: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to find similar villages: {str(e)}'
         }), 500
 
 @app.route('/api/crop/suitability', methods=['POST'])
@@ -1296,6 +1607,52 @@ def get_crop_suitability():
             'message': f'Failed to fetch crop suitability: {str(e)}'
         }), 500
 
+@app.route('/api/crop/suitability/bulk', methods=['POST'])
+def get_bulk_crop_suitability():
+    """
+    Get crop suitability for many locations in one request
+    Expected JSON body (either or both keys): {
+        "locations": [["Maharashtra", "Pune", "Haveli", "Katraj"], ...],
+        "selectors": [{"state": "Maharashtra", "district": "Pune", "block": "Haveli"}]
+    }
+    Streams NDJSON, one /api/crop/suitability style object per location
+    in request order; X-Total-Count and X-Not-Found-Count carry the totals
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({
+                'status': 'error',
+                'message': 'Expected a JSON object with locations and/or selectors'
+            }), 400
+        
+        selectors = data.get('selectors') or ([data['selector']] if data.get('selector') else [])
+        try:
+            locations = crop_service.resolve_bulk_locations(data.get('locations'), selectors)
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+        
+        if len(locations) > MAX_BULK_LOCATIONS:
+            return jsonify({
+                'status': 'error',
+                'message': f'Too many locations: {len(locations)} (maximum {MAX_BULK_LOCATIONS})'
+            }), 413
+        
+        lines, not_found = crop_service.get_bulk_suitability(locations)
+        return ndjson_lines_response(lines, headers={
+            'X-Total-Count': str(len(lines)),
+            'X-Not-Found-Count': str(not_found)
+        })
+    except Exception as e:
+        print(f"Error getting bulk crop suitability: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to fetch bulk crop suitability: {str(e)}'
+        }), 500
+
 @app.route('/api/crop/evaluate', methods=['POST'])
 def evaluate_crops():
     """
@@ -1305,27 +1662,44 @@ def evaluate_crops():
         "Phosphorus": "Medium (41–80%)",
         ... (16 parameters total)
     }
+    A parameter whose band is uncertain may instead be a distribution,
+    e.g. "OC": {"High (> 0.75%)": 0.4, "Medium (0.5–0.75%)": 0.6}; the
+    response then adds 'probabilities' (crop -> label -> probability, exact
+    over every band combination) and 'crops' holds each crop's most
+    likely label.
+    Query: explain=true adds, per crop, the criteria that failed (for the
+    most likely band of each uncertain parameter)
     """
     try:
         data = request.get_json()
         
-        # Required parameters
-        required_params = [
-            'Nitrogen', 'Phosphorus', 'Potassium', 'OC', 'EC', 'pH',
-            'Copper', 'Boron', 'Sulphur', 'Iron', 'Zinc', 'Manganese',
-            'Temperature_Summer', 'Temperature_Winter', 'Temperature_Monsoon', 'Rainfall'
-        ]
-        
         # Validate all parameters are present
-        missing_params = [p for p in required_params if p not in data]
+        missing_params = [p for p in EVALUATE_PARAMETERS if p not in data]
         if missing_params:
             return jsonify({
                 'status': 'error',
                 'message': f'Missing required parameters: {", ".join(missing_params)}'
             }), 400
         
-        # Evaluate crops
-        results = crop_service.evaluate_all_crops(data)
+        probabilities = None
+        if any(isinstance(value, dict) for value in data.values()):
+            try:
+                normalized = crop_service.normalize_input(data)
+                probabilities = crop_service.crop_probabilities(dict(normalized))
+            except (AttributeError, TypeError, ValueError) as e:
+                return jsonify({
+                    'status': 'error',
+                    'message': f'Invalid band distribution: {str(e)}'
+                }), 400
+            results = {crop: max(labels, key=labels.get) for crop, labels in probabilities.items()}
+            normalized = {
+                key: max(value, key=value.get) if isinstance(value, dict) else value
+                for key, value in normalized.items()
+            }
+        else:
+            # Evaluate crops (one table lookup once values are normalized)
+            normalized = crop_service.normalize_input(data)
+            results = crop_service.evaluate_all_crops(normalized)
         
         # Group by suitability
         grouped = {
@@ -1337,7 +1711,7 @@ def evaluate_crops():
         for crop, suitability in results.items():
             grouped[suitability].append(crop)
         
-        return jsonify({
+        response = {
             'status': 'success',
             'crops': results,
             'grouped': grouped,
@@ -1347,7 +1721,16 @@ def evaluate_crops():
                 'not_suitable': len(grouped['Not Suitable']),
                 'total': len(results)
             }
-        }), 200
+        }
+        if probabilities is not None:
+            response['probabilities'] = {
+                crop: {label: round(p, 6) for label, p in labels.items()}
+                for crop, labels in probabilities.items()
+            }
+        if request.args.get('explain') == 'true':
+            response['explanation'] = crop_service.explain_crops(normalized)
+        
+        return jsonify(response), 200
         
     except Exception as e:
         print(f"Error evaluating crops: {e}")
@@ -1356,6 +1739,151 @@ def evaluate_crops():
             'message': f'Failed to evaluate crops: {str(e)}'
         }), 500
 
+@app.route('/api/crop/rank', methods=['POST'])
+def rank_crops():
+    """
+    Score every crop 0-100 against soil and climate data, best first
+    Expected JSON body: the soil/climate parameters of /api/crop/evaluate;
+    any that are missing are left out of the scores
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or not data:
+            return jsonify({
+                'status': 'error',
+                'message': 'A JSON object of soil and climate parameters is required'
+            }), 400
+        
+        try:
+            crops = crop_service.rank_crops(crop_service.normalize_input(data))
+        except (AttributeError, TypeError) as e:
+            return jsonify({
+                'status': 'error',
+                'message': f'Invalid soil parameters: {str(e)}'
+            }), 400
+        
+        return jsonify({
+            'status': 'success',
+            'crops': crops
+        }), 200
+    except Exception as e:
+        print(f"Error ranking crops: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to rank crops: {str(e)}'
+        }), 500
+
+@app.route('/api/crop/evaluate/batch', methods=['POST'])
+def evaluate_crops_batch():
+    """
+    Evaluate crops for many soil profiles in one request
+    Expected JSON body: {
+        "profiles": [
+            {"Nitrogen": "High (81–100%)", "Phosphorus": "Medium (41–80%)", ...},
+            ...
+        ]
+    }
+    Each profile takes the same 16 parameters as /api/crop/evaluate;
+    results come back in request order. Query: explain=true adds one
+    /api/crop/evaluate style explanation per profile
+    """
+    try:
+        data = request.get_json(silent=True)
+        profiles = data.get('profiles') if isinstance(data, dict) else None
+        if not isinstance(profiles, list):
+            return jsonify({
+                'status': 'error',
+                'message': 'Expected a JSON object with a profiles list'
+            }), 400
+        
+        if len(profiles) > MAX_BATCH_PROFILES:
+            return jsonify({
+                'status': 'error',
+                'message': f'Too many profiles: {len(profiles)} (maximum {MAX_BATCH_PROFILES})'
+            }), 413
+        
+        for i, profile in enumerate(profiles):
+            if not isinstance(profile, dict) or not all(isinstance(v, str) for v in profile.values()):
+                return jsonify({
+                    'status': 'error',
+                    'message': f'Profile {i} must be an object of string values'
+                }), 400
+            missing_params = [p for p in EVALUATE_PARAMETERS if p not in profile]
+            if missing_params:
+                return jsonify({
+                    'status': 'error',
+                    'message': f'Profile {i} is missing required parameters: {", ".join(missing_params)}'
+                }), 400
+        
+        if request.args.get('explain') == 'true':
+            results, explanations = crop_service.evaluate_batch(profiles, explain=True)
+            response = {'status': 'success', 'count': len(results), 'results': results, 'explanations': explanations}
+        else:
+            results = crop_service.evaluate_batch(profiles)
+            response = {'status': 'success', 'count': len(results), 'results': results}
+        
+        return jsonify(response), 200
+        
+    except Exception as e:
+        print(f"Error evaluating crop batch: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to evaluate crops: {str(e)}'
+        }), 500
+
+@app.route('/api/crop/what-if', methods=['POST'])
+def crop_what_if():
+    """
+    Find the smallest soil changes that make a crop Highly Suitable
+    Expected JSON body: {
+        "crop": "Wheat",
+        "profile": {"Nitrogen": "Low (0–50%)", ... (16 parameters)},
+        "target": "Highly Suitable",             (optional)
+        "attributes": ["Zinc", "pH", ...],       (optional, soil parameters that may change)
+        "limit": 5                               (optional)
+    }
+    A crop already at the target comes back with "already": true and no options.
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or not data.get('crop') or not isinstance(data.get('profile'), dict):
+            return jsonify({
+                'status': 'error',
+                'message': 'Expected a JSON object with crop and profile'
+            }), 400
+        
+        profile = data['profile']
+        missing_params = [p for p in EVALUATE_PARAMETERS if p not in profile]
+        if missing_params:
+            return jsonify({
+                'status': 'error',
+                'message': f'Missing required parameters: {", ".join(missing_params)}'
+            }), 400
+        
+        try:
+            limit = min(max(int(data.get('limit', 5)), 1), 20)
+            result = crop_service.what_if(
+                profile,
+                data['crop'],
+                target=data.get('target') or 'Highly Suitable',
+                attributes=data.get('attributes') or None,
+                limit=limit
+            )
+        except (TypeError, ValueError) as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+        
+        return jsonify({'status': 'success', **result}), 200
+        
+    except Exception as e:
+        print(f"Error in what-if search: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to search soil changes: {str(e)}'
+        }), 500
+
 @app.route('/api/crop/attributes', methods=['GET'])
 def get_crop_attributes():
     """Get list of all attribute options for the soil recommendation form"""
@@ -1545,13 +2073,38 @@ def chat():
             'response': 'Sorry, I encountered an error. Please try again.'
         }), 500
 
+@app.route('/api/admin/reload-dataset', methods=['POST'])
+def reload_dataset():
+    """
+    Rebuild the crop dataset in the background and swap it in when complete
+    Requires the X-Admin-Token header to match ADMIN_RELOAD_TOKEN; every
+    worker process picks the reload up within TRIGGER_POLL_INTERVAL seconds
+    """
+    token = request.headers.get('X-Admin-Token', '')
+    if not ADMIN_RELOAD_TOKEN or not hmac.compare_digest(token.encode(), ADMIN_RELOAD_TOKEN.encode()):
+        return jsonify({
+            'status': 'error',
+            'message': 'Forbidden'
+        }), 403
+    
+    # Every worker process reloads, through the shared trigger file
+    started = crop_service.reloader.request_reload()
+    return jsonify({
+        'status': 'success',
+        'message': 'Dataset reload started' if started else 'Dataset reload already in progress',
+        'dataset': crop_service.get_dataset_info()
+    }), 202
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint for chatbot service"""
+    dataset = crop_service.get_dataset_info()
     return jsonify({
         'status': 'healthy',
         'service': 'FarmOps Chatbot',
-        'version': '1.0.0'
+        'version': '1.0.0',
+        'dataset_version': dataset['version'],
+        'dataset': dataset
     }), 200
 
 if __name__ == '__main__':
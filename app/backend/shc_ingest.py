@@ -0,0 +1,251 @@
+"""
+Soil Health Card Ingestion Module
+Band the numeric lab results of Soil Health Card CSV exports and evaluate
+every crop for every card, streaming the files in chunks
+
+Usage:
+    python shc_ingest.py CSV [CSV ...] --output PATH [--chunk-rows N]
+
+Reading columns are recognised by name (N, P, K, OC, EC, pH, Zn, B, S, Cu,
+Fe, Mn, the crop rule attribute names, and climate columns such as
+Rainfall); case and a unit in brackets, e.g. "N (kg/ha)", are ignored.
+Every other column (card number, village, ...) is copied through. The
+output CSV adds one "<attribute> band" column per reading and one
+suitability column per crop.
+"""
+import argparse
+import os
+import re
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from crop_rules import RULE_ENGINE, SUITABILITY_LABELS
+from soil_bands import BAND_BOUNDARIES, band_codes
+
+# Cards read, banded, evaluated and written per step; bounds memory for
+# exports of millions of cards
+CHUNK_ROWS = 200_000
+
+# Lowercased column name, without a bracketed unit -> rule attribute
+READING_ALIASES = {
+    'n': 'Nitrogen', 'available n': 'Nitrogen',
+    'p': 'Phosphorus', 'available p': 'Phosphorus',
+    'k': 'Potassium', 'available k': 'Potassium',
+    'organic carbon': 'OC',
+    'electrical conductivity': 'EC',
+    'zn': 'Zinc', 'b': 'Boron', 's': 'Sulphur', 'sulfur': 'Sulphur',
+    'cu': 'Copper', 'fe': 'Iron', 'mn': 'Manganese',
+    'summer temperature': 'Temperature_Summer',
+    'winter temperature': 'Temperature_Winter',
+    'monsoon temperature': 'Temperature_Monsoon',
+    'rainfall overall': 'Rainfall',
+    **{name.lower(): name for name in BAND_BOUNDARIES}
+}
+
+
+def reading_columns(columns: Iterable[str]) -> Dict[str, str]:
+    """
+    CSV column -> rule attribute for the columns holding lab readings
+
+    Raises:
+        ValueError: If two columns hold the same attribute
+    """
+    readings: Dict[str, str] = {}
+    for column in columns:
+        key = re.sub(r'\s*[\(\[].*?[\)\]]', '', str(column)).strip().lower()
+        attribute = READING_ALIASES.get(key)
+        if attribute is None:
+            continue
+        if attribute in readings.values():
+            raise ValueError(f"Columns {[c for c, a in readings.items() if a == attribute][0]!r} "
+                             f"and {column!r} both hold {attribute}")
+        readings[column] = attribute
+    return readings
+
+
+def _numbers(text: pd.Series) -> np.ndarray:
+    """float32 readings of a text column, NaN where a cell is empty or not a number"""
+    try:
+        # Clean columns parse in one cast; anything else goes cell by cell
+        return text.to_numpy().astype(np.float32)
+    except ValueError:
+        return pd.to_numeric(text, errors='coerce').to_numpy(dtype=np.float32)
+
+
+def band_chunk(chunk: pd.DataFrame, readings: Dict[str, str]) -> Tuple[np.ndarray, Dict[str, int]]:
+    """
+    Rule engine codes of a chunk of cards
+
+    Args:
+        chunk: Cards as read by _read_chunks (every cell text, '' if empty)
+        readings: Column -> attribute, from reading_columns
+
+    Returns:
+        ((cards, attributes) int8 codes, attribute -> readings that were
+        given but not numeric, left unbanded)
+    """
+    codes = np.zeros((len(chunk), len(RULE_ENGINE.attributes)), dtype=np.int8)
+    unreadable = {}
+    for column, attribute in readings.items():
+        values = _numbers(chunk[column])
+        codes[:, RULE_ENGINE.attributes.index(attribute)] = band_codes(attribute, values)
+        unreadable[attribute] = int(np.isnan(values).sum() - (chunk[column] == '').sum())
+    return codes, unreadable
+
+
+def ingest_chunk(chunk: pd.DataFrame, readings: Dict[str, str]) -> Tuple[pd.DataFrame, np.ndarray, Dict[str, int]]:
+    """
+    Band and evaluate one chunk of cards
+
+    Returns:
+        (output frame, (cards, crops) label codes, unreadable readings per
+        attribute)
+    """
+    codes, unreadable = band_chunk(chunk, readings)
+    labels = RULE_ENGINE.evaluate_codes(codes)
+
+    # Decoded through categoricals: one small label table per column
+    out = {column: chunk[column] for column in chunk.columns if column not in readings}
+    for column, attribute in readings.items():
+        out[column] = chunk[column]
+        i = RULE_ENGINE.attributes.index(attribute)
+        out[f'{attribute} band'] = pd.Categorical.from_codes(
+            codes[:, i].astype(np.int16) - 1, categories=RULE_ENGINE.levels[attribute]
+        )
+    for j, crop in enumerate(RULE_ENGINE.crops):
+        out[crop] = pd.Categorical.from_codes(labels[:, j], categories=list(SUITABILITY_LABELS))
+    return pd.DataFrame(out, index=chunk.index), labels, unreadable
+
+
+def _read_chunks(path: str, chunk_rows: int) -> Tuple[Dict[str, str], Iterable[pd.DataFrame]]:
+    """Reading columns of a CSV and a chunked reader over it"""
+    header = pd.read_csv(path, nrows=0).columns
+    readings = reading_columns(header)
+    if not readings:
+        raise ValueError(f"No soil reading columns found in {path}")
+    # Every cell stays text: card numbers keep their leading zeros and
+    # readings are written back exactly as they were given
+    return readings, pd.read_csv(path, chunksize=chunk_rows, dtype=str, keep_default_na=False)
+
+
+def _csv_field(values: np.ndarray) -> np.ndarray:
+    """Text cells quoted where they hold a comma, quote or line break"""
+    # One scan of the joined column settles the usual case of no quoting
+    joined = '\x00'.join(values)
+    if not any(char in joined for char in ',"\r\n'):
+        return values
+    text = pd.Series(values, dtype=object)
+    special = text.str.contains('[",\r\n]', regex=True).to_numpy(dtype=bool)
+    values = values.copy()
+    values[special] = '"' + text[special].str.replace('"', '""', regex=False) + '"'
+    return values
+
+
+def write_chunk(handle, frame: pd.DataFrame, header: bool = False):
+    """
+    Append a chunk from ingest_chunk to an open CSV file
+
+    Band and suitability columns are decoded straight from their category
+    codes and rows are joined as text, several times faster than
+    DataFrame.to_csv on categoricals.
+    """
+    columns = []
+    for column in frame.columns:
+        series = frame[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            labels = np.array(list(series.cat.categories) + [''], dtype=object)
+            columns.append(labels[series.cat.codes.to_numpy()])
+        else:
+            columns.append(_csv_field(series.to_numpy(dtype=object)))
+    if header:
+        handle.write(','.join(_csv_field(np.array(list(frame.columns), dtype=object))) + '\n')
+    if len(frame):
+        handle.write('\n'.join([','.join(row) for row in zip(*columns)]) + '\n')
+
+
+def ingest_csv(sources: List[str], output: str, chunk_rows: int = CHUNK_ROWS) -> Dict[str, Any]:
+    """
+    Band and evaluate every card of one or more CSV exports
+
+    Chunks are appended to a temporary file that replaces ``output`` only
+    once every card is written, so readers never see a partial result.
+
+    Args:
+        sources: CSV files, written out in order; the output keeps the
+            columns of the first file
+        output: CSV file to write
+        chunk_rows: Cards per chunk
+
+    Returns:
+        {'rows', 'seconds', 'output', 'readings': {attribute: column},
+        'unreadable': {attribute: n}, 'crops': {crop: {label: n}}}
+
+    Raises:
+        ValueError: If a source has no reading columns, or two columns
+            holding the same attribute
+    """
+    start = time.perf_counter()
+    counts = np.zeros((len(RULE_ENGINE.crops), len(SUITABILITY_LABELS)), dtype=np.int64)
+    unreadable: Dict[str, int] = {}
+    reading_map: Dict[str, str] = {}
+    columns: Optional[List[str]] = None
+    rows = 0
+
+    tmp = f'{output}.tmp'
+    try:
+        with open(tmp, 'w', encoding='utf-8', newline='') as handle:
+            for path in sources:
+                readings, chunks = _read_chunks(path, chunk_rows)
+                for column, attribute in readings.items():
+                    reading_map.setdefault(attribute, column)
+                for chunk in chunks:
+                    out, labels, chunk_unreadable = ingest_chunk(chunk, readings)
+                    if columns is None:
+                        columns = list(out.columns)
+                    write_chunk(handle, out.reindex(columns=columns, fill_value=''), header=rows == 0)
+                    rows += len(out)
+                    for j in range(len(RULE_ENGINE.crops)):
+                        counts[j] += np.bincount(labels[:, j], minlength=len(SUITABILITY_LABELS))
+                    for attribute, n in chunk_unreadable.items():
+                        unreadable[attribute] = unreadable.get(attribute, 0) + n
+        os.replace(tmp, output)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    return {
+        'rows': rows,
+        'seconds': time.perf_counter() - start,
+        'output': output,
+        'readings': reading_map,
+        'unreadable': unreadable,
+        'crops': {
+            crop: dict(zip(SUITABILITY_LABELS, counts[j].tolist()))
+            for j, crop in enumerate(RULE_ENGINE.crops)
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('sources', nargs='+', help='Soil Health Card CSV exports')
+    parser.add_argument('--output', required=True, help='CSV of bands and crop suitability to write')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help='Cards per chunk')
+    args = parser.parse_args()
+
+    summary = ingest_csv(args.sources, args.output, args.chunk_rows)
+    print(f"✓ Evaluated {summary['rows']} cards in {summary['seconds']:.2f}s")
+    print("ℹ️ Readings: " + ', '.join(f"{attribute} <- {column!r}" for attribute, column in summary['readings'].items()))
+    for attribute, n in summary['unreadable'].items():
+        if n:
+            print(f"⚠️ {attribute}: {n} non-numeric readings left unbanded")
+    for crop, labels in summary['crops'].items():
+        print(f"   {crop}: " + ', '.join(f"{label}: {n}" for label, n in labels.items()))
+    print(f"✓ Results written: {summary['output']}")
+
+
+if __name__ == '__main__':
+    main()
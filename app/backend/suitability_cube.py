@@ -0,0 +1,202 @@
+"""
+Suitability Cube Module
+Village counts per (region, crop, suitability) at state, district and block
+level, precomputed so planner questions are dictionary lookups
+"""
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# Counted under this name when a village has no suitability for a crop
+UNKNOWN_LABEL = 'Unknown'
+
+
+class SuitabilityCube:
+    """
+    Counts of distinct villages per region, crop and suitability label
+
+    Block counts are computed from the crop code matrix; district and state
+    counts are sums of their blocks. Every region holds a crops x labels
+    count array, so any (level, region, crop, suitability) answer is a dict
+    probe plus an array index.
+    """
+
+    def __init__(self, crops: List[str], labels: List[Any],
+                 blocks: Dict[Tuple[str, str, str], np.ndarray],
+                 block_digests: Dict[Tuple[str, str, str], int],
+                 build_stats: Dict[str, Any]):
+        """
+        Use ``SuitabilityCube.build`` rather than calling this directly
+
+        Args:
+            crops: Crop names, in count array column order
+            labels: Suitability labels, in count array order; a final
+                column counts villages without a label
+            blocks: (state, district, block) -> crops x (labels + 1) counts
+            block_digests: Content hash of each block's villages, used to
+                reuse unchanged blocks on the next build
+            build_stats: Timing and reuse figures of the build
+        """
+        self.crops = crops
+        self.labels = list(labels) + [UNKNOWN_LABEL]
+        self._crop_index = {crop: j for j, crop in enumerate(crops)}
+        self._label_index = {label: k for k, label in enumerate(self.labels)}
+        self._block_digests = block_digests
+        self.build_stats = build_stats
+
+        # Region key (a 1-, 2- or 3-tuple of names) -> counts; children are
+        # kept sorted for drill-down
+        self._counts: Dict[tuple, np.ndarray] = dict(blocks)
+        self._children: Dict[tuple, List[str]] = {}
+        for state, district, block in sorted(blocks):
+            counts = blocks[(state, district, block)]
+            for key in ((state,), (state, district), ()):
+                if key in self._counts:
+                    self._counts[key] = self._counts[key] + counts
+                else:
+                    self._counts[key] = counts.copy()
+            self._children.setdefault((state, district), []).append(block)
+        for state, district in sorted({block[:2] for block in blocks}):
+            self._children.setdefault((state,), []).append(district)
+        self._children[()] = sorted({block[0] for block in blocks})
+
+    @classmethod
+    def build(cls, store, previous: Optional['SuitabilityCube'] = None) -> 'SuitabilityCube':
+        """
+        Count the villages of a LocationStore
+
+        Args:
+            store: LocationStore whose crop codes are counted
+            previous: Cube of the dataset version being replaced; blocks whose
+                villages and suitability did not change are taken from it
+                instead of being recounted
+
+        Returns:
+            The new cube
+        """
+        start = time.perf_counter()
+        keys, positions = store.village_rows()
+        crops, labels = list(store.crop_columns), list(store.crop_labels)
+        n_crops, n_labels = len(crops), len(labels) + 1
+
+        block_keys = [key[:3] for key in keys]
+        block_ids, block_index = pd.factorize(pd.Series(block_keys, dtype=object), sort=False)
+        blocks = [tuple(key) for key in block_index]
+
+        codes = np.asarray(store.crop_codes)[positions].astype(np.int64)
+        # -1 (no label) goes to the last column
+        codes[codes < 0] = n_labels - 1
+
+        # Order-independent content hash per block: village names and codes
+        row_hashes = pd.util.hash_pandas_object(
+            pd.DataFrame(codes).assign(village=[key[3] for key in keys]), index=False
+        ).to_numpy()
+        block_hashes = np.zeros(len(blocks), dtype=np.uint64)
+        np.add.at(block_hashes, block_ids, row_hashes)
+        digests = dict(zip(blocks, block_hashes.tolist()))
+
+        reusable = previous is not None and previous.crops == crops and previous.labels[:-1] == labels
+        block_counts: Dict[Tuple[str, str, str], np.ndarray] = {}
+        changed = np.ones(len(blocks), dtype=bool)
+        if reusable:
+            for i, block in enumerate(blocks):
+                if previous._block_digests.get(block) == digests[block]:
+                    block_counts[block] = previous._counts[block]
+                    changed[i] = False
+
+        # One bincount over the villages of every changed block
+        rows = changed[block_ids]
+        changed_ids = np.flatnonzero(changed)
+        if len(changed_ids):
+            local = np.full(len(blocks), -1, dtype=np.int64)
+            local[changed_ids] = np.arange(len(changed_ids))
+            flat = (local[block_ids[rows]][:, None] * n_crops + np.arange(n_crops)) * n_labels + codes[rows]
+            counts = np.bincount(flat.ravel(), minlength=len(changed_ids) * n_crops * n_labels)
+            counts = counts.reshape(len(changed_ids), n_crops, n_labels).astype(np.int32)
+            for i, block_id in enumerate(changed_ids):
+                block_counts[blocks[block_id]] = counts[i]
+
+        build_stats = {
+            'seconds': time.perf_counter() - start,
+            'villages': len(keys),
+            'blocks': len(blocks),
+            'blocks_recounted': int(len(changed_ids)),
+            'blocks_reused': int(len(blocks) - len(changed_ids))
+        }
+        return cls(crops, labels, block_counts, digests, build_stats)
+
+    def describe_build(self) -> str:
+        """One-line summary of the last build"""
+        stats = self.build_stats
+        return (
+            f"{stats['villages']} villages in {stats['blocks']} blocks, "
+            f"{stats['blocks_recounted']} recounted, {stats['blocks_reused']} reused, "
+            f"{stats['seconds'] * 1000:.0f} ms"
+        )
+
+    def count(self, region: Tuple[str, ...], crop: str, suitability: str) -> int:
+        """
+        Villages in a region with a given suitability for a crop
+
+        Args:
+            region: () for everything, (state,), (state, district) or
+                (state, district, block)
+        """
+        counts = self._counts.get(tuple(region))
+        j, k = self._crop_index.get(crop), self._label_index.get(suitability)
+        if counts is None or j is None or k is None:
+            return 0
+        return int(counts[j, k])
+
+    def summary(self, region: Tuple[str, ...], crop: Optional[str] = None,
+                suitability: Optional[str] = None, children: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Counts for a region and, for drill-down, for each of its sub-regions
+
+        Args:
+            region: () for everything, (state,), (state, district) or
+                (state, district, block)
+            crop: Only report this crop
+            suitability: Only report this label
+            children: Include one entry per sub-region
+
+        Returns:
+            {'villages', 'counts': {crop: {label: n}}, 'children': [...]},
+            or None if the region is unknown
+        """
+        region = tuple(region)
+        counts = self._counts.get(region)
+        if counts is None:
+            return None
+
+        result = {
+            'villages': int(counts[0].sum()) if len(self.crops) else 0,
+            'counts': self._count_dict(counts, crop, suitability)
+        }
+        if children and len(region) < 3:
+            result['children'] = [
+                {'name': name, **self.summary(region + (name,), crop, suitability, children=False)}
+                for name in self._children.get(region, [])
+            ]
+        return result
+
+    def _count_dict(self, counts: np.ndarray, crop: Optional[str], suitability: Optional[str]) -> Dict[str, Dict[str, int]]:
+        """Nested crop -> label -> count, dropping an all-zero Unknown column"""
+        crops = [crop] if crop else self.crops
+        if suitability:
+            labels = [suitability]
+        else:
+            labels = self.labels[:-1]
+            if counts[:, -1].any():
+                labels = self.labels
+        return {
+            name: {
+                label: int(counts[self._crop_index[name], self._label_index[label]])
+                if name in self._crop_index and label in self._label_index else 0
+                for label in labels
+            }
+            for name in crops
+        }
@@ -0,0 +1,318 @@
+"""
+Suitability Recompute Module
+Recompute every row's crop suitability from its soil columns with the
+compiled crop rules, write the result as a new snapshot and report which
+cells changed
+
+Usage:
+    python suitability_recompute.py [SOURCE] [--output PATH] [--report PATH] [--workers N] [--in-place]
+
+SOURCE is a workbook (its snapshot is used when fresh) or a directory of
+per-state partitions. Results go to "<workbook>.recomputed.snapshot" (or
+a "<directory>.recomputed" directory) for review; the servers keep
+serving the workbook's own labels. Only --in-place replaces the source's
+live snapshot(s), so the next dataset reload serves the recomputed labels
+until the workbook changes or the snapshot is deleted.
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from crop_dataset import (
+    LOCATION_COLUMNS, list_state_partitions, load_crop_dataframe,
+    snapshot_path_for, snapshot_rebuild_lock, write_snapshot
+)
+from crop_rules import RULE_ENGINE, SUITABILITY_LABELS
+from soil_store import SOIL_ATTRIBUTES, label_band_codes
+
+
+# Label code for a crop cell holding something other than a suitability label
+UNKNOWN_CODE = -1
+
+DEFAULT_EXCEL = 'cropresults_with_state (1).xlsx'
+
+
+def encode_soil(df: pd.DataFrame) -> np.ndarray:
+    """
+    Rule engine codes of a dataset's soil columns
+
+    Cells are decoded by soil_store.label_band_codes (band names matched
+    case-insensitively, numeric readings banded); only the distinct values
+    of each column are looked at, so this costs one gather per column.
+
+    Returns:
+        (rows, engine attributes) int8 codes, 0 for missing or unknown bands
+    """
+    codes = np.zeros((len(df), len(RULE_ENGINE.attributes)), dtype=np.int8)
+    for col, attribute in SOIL_ATTRIBUTES.items():
+        if col not in df.columns:
+            continue
+        column = df[col] if isinstance(df[col].dtype, pd.CategoricalDtype) else df[col].astype('category')
+        lookup = np.append(label_band_codes(attribute, column.cat.categories), np.int8(0))
+        # Code -1 (missing) picks the trailing 0
+        codes[:, RULE_ENGINE.attributes.index(attribute)] = lookup[column.cat.codes.to_numpy()]
+    return codes
+
+
+def crop_label_codes(df: pd.DataFrame) -> np.ndarray:
+    """
+    Current crop columns as SUITABILITY_LABELS indices
+
+    Returns:
+        (rows, engine crops) int8, UNKNOWN_CODE where a cell is missing or
+        not a suitability label
+    """
+    labels = {label: i for i, label in enumerate(SUITABILITY_LABELS)}
+    codes = np.full((len(df), len(RULE_ENGINE.crops)), UNKNOWN_CODE, dtype=np.int8)
+    for j, crop in enumerate(RULE_ENGINE.crops):
+        if crop not in df.columns:
+            continue
+        column = df[crop] if isinstance(df[crop].dtype, pd.CategoricalDtype) else df[crop].astype('category')
+        lookup = np.array(
+            [labels.get(str(value).strip(), UNKNOWN_CODE) for value in column.cat.categories] + [UNKNOWN_CODE],
+            dtype=np.int8
+        )
+        codes[:, j] = lookup[column.cat.codes.to_numpy()]
+    return codes
+
+
+def _evaluate_part(codes: np.ndarray) -> np.ndarray:
+    """Pool task: label codes for one state's encoded soil rows"""
+    return RULE_ENGINE.evaluate_codes(codes)
+
+
+def _state_parts(df: pd.DataFrame) -> List[np.ndarray]:
+    """Row positions of each state, in dataset order within a state"""
+    if 'STATE' not in df.columns or df.empty:
+        return [np.arange(len(df))]
+    return [np.asarray(rows) for rows in df.groupby('STATE', observed=True, sort=True).indices.values()]
+
+
+def recompute_labels(df: pd.DataFrame, workers: Optional[int] = None) -> np.ndarray:
+    """
+    Evaluate the crop rules for every row of a dataset
+
+    Soil columns are encoded once here; each state's rows are then scored
+    in a worker process. With one state or one worker everything runs in
+    this process, which for the vectorized engine is usually fastest.
+
+    Args:
+        df: Cleaned dataset (see crop_dataset.clean_dataframe)
+        workers: Pool size (default: one per CPU, at most one per state)
+
+    Returns:
+        (rows, engine crops) int8 SUITABILITY_LABELS indices
+    """
+    codes = encode_soil(df)
+    parts = _state_parts(df)
+    workers = min(workers or os.cpu_count() or 1, len(parts))
+    if workers <= 1:
+        return RULE_ENGINE.evaluate_codes(codes)
+
+    labels = np.empty((len(df), len(RULE_ENGINE.crops)), dtype=np.int8)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for rows, part in zip(parts, pool.map(_evaluate_part, [codes[rows] for rows in parts])):
+            labels[rows] = part
+    return labels
+
+
+def apply_labels(df: pd.DataFrame, labels: np.ndarray) -> pd.DataFrame:
+    """Copy of a dataset whose crop columns hold the given label codes"""
+    result = df.copy()
+    for j, crop in enumerate(RULE_ENGINE.crops):
+        result[crop] = pd.Categorical.from_codes(labels[:, j], categories=list(SUITABILITY_LABELS))
+    return result
+
+
+def diff_cells(df: pd.DataFrame, old: np.ndarray, new: np.ndarray) -> pd.DataFrame:
+    """
+    Crop cells whose label changed
+
+    Returns:
+        One row per changed cell: the location columns, crop, old and new
+        label (old is empty where the cell held no suitability label)
+    """
+    rows, crops = np.nonzero(old != new)
+    labels = np.array(list(SUITABILITY_LABELS) + [''], dtype=object)
+    report = pd.DataFrame({
+        col: np.asarray(df[col], dtype=object)[rows]
+        for col in LOCATION_COLUMNS if col in df.columns
+    })
+    report['crop'] = np.array(RULE_ENGINE.crops, dtype=object)[crops]
+    # UNKNOWN_CODE (-1) indexes the trailing ''
+    report['old'] = labels[old[rows, crops]]
+    report['new'] = labels[new[rows, crops]]
+    return report
+
+
+def summarize_changes(old: np.ndarray, new: np.ndarray) -> Dict[str, Any]:
+    """Changed cell counts overall and per crop, with old -> new transitions"""
+    changed = old != new
+    per_crop = {}
+    for j, crop in enumerate(RULE_ENGINE.crops):
+        pairs = old[changed[:, j], j].astype(np.int64) * 4 + new[changed[:, j], j]
+        transitions = {}
+        for pair, count in zip(*np.unique(pairs, return_counts=True)):
+            before, after = divmod(int(pair), 4)
+            before = SUITABILITY_LABELS[before] if before != UNKNOWN_CODE else ''
+            transitions[f"{before} -> {SUITABILITY_LABELS[after]}"] = int(count)
+        per_crop[crop] = {'changed': int(changed[:, j].sum()), 'transitions': transitions}
+    return {
+        'rows': int(len(old)),
+        'rows_changed': int(changed.any(axis=1).sum()),
+        'cells_changed': int(changed.sum()),
+        'crops': per_crop
+    }
+
+
+def recompute_dataframe(df: pd.DataFrame, workers: Optional[int] = None) -> Tuple[pd.DataFrame, pd.DataFrame, Dict[str, Any]]:
+    """
+    Recompute a dataset's crop columns from its soil columns
+
+    Args:
+        df: Cleaned dataset
+        workers: Process pool size, see recompute_labels
+
+    Returns:
+        (recomputed dataset, changed cells, summary)
+    """
+    old = crop_label_codes(df)
+    new = recompute_labels(df, workers)
+    return apply_labels(df, new), diff_cells(df, old, new), summarize_changes(old, new)
+
+
+def _recompute_partition(task: Tuple[str, str, Optional[str]]) -> Tuple[str, pd.DataFrame, Dict[str, Any]]:
+    """Pool task: recompute one state partition and write its snapshot"""
+    excel_path, output_path, excel_for_meta = task
+    df = load_crop_dataframe(excel_path)
+    result, report, summary = recompute_dataframe(df, workers=1)
+    with snapshot_rebuild_lock(output_path):
+        write_snapshot(result, output_path, excel_path=excel_for_meta)
+    return output_path, report, summary
+
+
+def _merge_summaries(summaries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Add up per-partition summaries"""
+    merged = {'rows': 0, 'rows_changed': 0, 'cells_changed': 0, 'crops': {}}
+    for summary in summaries:
+        for key in ('rows', 'rows_changed', 'cells_changed'):
+            merged[key] += summary[key]
+        for crop, stats in summary['crops'].items():
+            total = merged['crops'].setdefault(crop, {'changed': 0, 'transitions': {}})
+            total['changed'] += stats['changed']
+            for transition, count in stats['transitions'].items():
+                total['transitions'][transition] = total['transitions'].get(transition, 0) + count
+    return merged
+
+
+def recomputed_path_for(source: str) -> str:
+    """Default output of a recompute: beside the source, never the live snapshot"""
+    if os.path.isdir(source):
+        return os.path.normpath(source) + '.recomputed'
+    return os.path.splitext(source)[0] + '.recomputed.snapshot'
+
+
+def recompute_dataset(source: str, output: Optional[str] = None, report_path: Optional[str] = None,
+                      workers: Optional[int] = None, in_place: bool = False) -> Dict[str, Any]:
+    """
+    Recompute suitability for a whole dataset and write it as snapshot(s)
+
+    Args:
+        source: Workbook path, or a directory of per-state partitions
+        output: Snapshot path for a workbook, or a directory for partitions
+            (default: recomputed_path_for(source))
+        report_path: CSV of changed cells (default: next to the output,
+            "<output>.diff.csv")
+        workers: Process pool size (default: one per CPU)
+        in_place: Replace the source's live snapshot(s), stamped as fresh
+            for the workbook, so the servers serve the recomputed labels
+
+    Returns:
+        Summary: row and changed cell counts, per-crop transitions, the
+        written snapshot paths and timing
+
+    Raises:
+        ValueError: If output is the live snapshot location without
+            in_place, or differs from it with in_place
+    """
+    start = time.perf_counter()
+    live = os.path.normpath(source if os.path.isdir(source) else snapshot_path_for(source))
+    if in_place:
+        if output and os.path.normpath(output) != live:
+            raise ValueError('--in-place writes the live snapshot; it cannot be combined with another --output')
+        output = live
+    elif output and os.path.normpath(output) == live:
+        raise ValueError(f'{output} is the live snapshot; pass --in-place to replace it')
+    output = output or recomputed_path_for(source)
+
+    if os.path.isdir(source):
+        os.makedirs(output, exist_ok=True)
+        tasks = []
+        for state, excel_path in list_state_partitions(source).items():
+            target = os.path.join(output, f"{state}.snapshot")
+            tasks.append((excel_path, target, excel_path if in_place else None))
+        workers = min(workers or os.cpu_count() or 1, max(len(tasks), 1))
+        if workers <= 1:
+            results = [_recompute_partition(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_recompute_partition, tasks))
+        written = [path for path, _, _ in results]
+        report = pd.concat([frame for _, frame, _ in results], ignore_index=True) if results else pd.DataFrame()
+        summary = _merge_summaries([stats for _, _, stats in results])
+        report_path = report_path or os.path.join(output, 'suitability.diff.csv')
+    else:
+        df = load_crop_dataframe(source)
+        result, report, summary = recompute_dataframe(df, workers)
+        # Keep the workbook's size/mtime only when replacing its own snapshot,
+        # so load_crop_dataframe treats the result as fresh
+        with snapshot_rebuild_lock(output):
+            write_snapshot(result, output, excel_path=source if in_place else None)
+        written = [output]
+        report_path = report_path or os.path.splitext(output)[0] + '.diff.csv'
+
+    report.to_csv(report_path, index=False)
+    summary.update({
+        'snapshots': written,
+        'report': report_path,
+        'rules_checksum': RULE_ENGINE.checksum,
+        'seconds': time.perf_counter() - start
+    })
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('source', nargs='?', default=DEFAULT_EXCEL, help='Workbook or partition directory')
+    parser.add_argument('--output', help='Snapshot path (or directory for partitions) to write')
+    parser.add_argument('--report', help='CSV of changed cells')
+    parser.add_argument('--workers', type=int, help='Process pool size (default: one per CPU)')
+    parser.add_argument('--in-place', action='store_true',
+                        help="Replace the source's live snapshot(s); the servers then serve the recomputed labels")
+    args = parser.parse_args()
+
+    try:
+        summary = recompute_dataset(args.source, args.output, args.report, args.workers, in_place=args.in_place)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"✓ Recomputed {summary['rows']} rows in {summary['seconds']:.2f}s "
+          f"(rules {summary['rules_checksum']})")
+    print(f"ℹ️ {summary['cells_changed']} cells changed in {summary['rows_changed']} rows; "
+          f"report: {summary['report']}")
+    for crop, stats in summary['crops'].items():
+        if stats['changed']:
+            transitions = ', '.join(f"{name}: {count}" for name, count in sorted(stats['transitions'].items()))
+            print(f"   {crop}: {stats['changed']} ({transitions})")
+    for path in summary['snapshots']:
+        print(f"✓ Snapshot written: {path}")
+    if not args.in_place:
+        print("ℹ️ The servers keep the workbook's labels; rerun with --in-place to serve these")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Backend modules are imported flat, as the app runs them from app/backend"""
+import os
+import random
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crop_dataset import CROP_COLUMNS, SOIL_COLUMNS, clean_dataframe  # noqa: E402
+
+# Workbook spellings of each soil column's bands
+SOIL_VALUES = {
+    col: ('Low', 'Medium', 'High') for col in SOIL_COLUMNS
+}
+SOIL_VALUES.update({
+    'EC': ('Non-saline', 'Saline'), 'pH': ('Neutral', 'Acidic', 'Alkaline'),
+    **{col: ('Sufficient', 'Deficient') for col in ('COPPER', 'BORON', 'SULPHUR', 'IRON', 'ZINC', 'MANGANESE')}
+})
+CROP_VALUES = ('Highly Suitable', 'Moderately Suitable', 'Not Suitable')
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    """Small crop workbook with every location, soil and crop column"""
+    rows = []
+    for i, (district, block) in enumerate([('Pune', 'Haveli'), ('Pune', 'Mulshi'), ('Nashik', 'Sinnar')]):
+        for village in ('A', 'B'):
+            row = {
+                'STATE': 'Maharashtra', 'DISTRICT NAME': district,
+                'BLOCK NAME': block, 'VILLAGE NAME': f'{block} {village}'
+            }
+            row.update({col: ('Low', 'Medium', 'High')[i] for col in SOIL_COLUMNS})
+            row.update({'EC': 'Non-saline', 'pH': 'Neutral'})
+            row.update({col: 'Moderately Suitable' for col in CROP_COLUMNS})
+            rows.append(row)
+    path = tmp_path / 'crops.xlsx'
+    pd.DataFrame(rows).to_excel(path, index=False)
+    return str(path)
+
+
+
+@pytest.fixture
+def village_frame():
+    """Cleaned DataFrame of 400 villages with random bands and labels, a few missing"""
+    rng = random.Random(0)
+    rows = []
+    for state in ('Goa', 'Maharashtra'):
+        for district in ('Alpha', 'Beta', 'Gamma'):
+            for block in ('North', 'South'):
+                for village in range(rng.randint(20, 45)):
+                    row = {'STATE': state, 'DISTRICT NAME': district, 'BLOCK NAME': f'{district} {block}',
+                           'VILLAGE NAME': f'{block} Wadi {village}'}
+                    row.update({col: rng.choice(values) for col, values in SOIL_VALUES.items()})
+                    row.update({col: rng.choice(CROP_VALUES) if rng.random() < 0.95 else None for col in CROP_COLUMNS})
+                    rows.append(row)
+    return clean_dataframe(pd.DataFrame(rows))
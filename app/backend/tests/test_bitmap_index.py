@@ -0,0 +1,98 @@
+"""
+Bitmap index: set operations agree with Python sets across array and
+bitset containers, and filter expressions select the same villages as a
+DataFrame filter
+"""
+import numpy as np
+import pytest
+
+from bitmap_index import ARRAY_MAX, CHUNK_SIZE, Bitmap, VillageBitmapIndex
+from crop_rules import SUITABILITY_LABELS
+from location_store import LocationStore
+
+
+def random_positions(rng, size, density):
+    return np.flatnonzero(rng.random(size) < density)
+
+
+@pytest.mark.parametrize('densities', [(0.01, 0.02), (0.01, 0.5), (0.3, 0.6)])
+def test_set_operations_match_python_sets(densities):
+    rng = np.random.default_rng(0)
+    size = 3 * CHUNK_SIZE + 1000
+    a, b = (random_positions(rng, size, density) for density in densities)
+    bitmap_a, bitmap_b = Bitmap.from_positions(a), Bitmap.from_positions(b)
+    set_a, set_b = set(a.tolist()), set(b.tolist())
+
+    for bitmap, expected in (
+        (bitmap_a & bitmap_b, set_a & set_b),
+        (bitmap_a | bitmap_b, set_a | set_b),
+        (bitmap_a - bitmap_b, set_a - set_b),
+        (Bitmap.full(size) - bitmap_a, set(range(size)) - set_a),
+    ):
+        assert len(bitmap) == len(expected)
+        assert bitmap.positions().tolist() == sorted(expected)
+
+
+def test_positions_page_through_chunks():
+    rng = np.random.default_rng(1)
+    # A dense chunk (bitset container), an empty one and a sparse one
+    positions = np.concatenate([
+        random_positions(rng, CHUNK_SIZE, 0.5),
+        2 * CHUNK_SIZE + random_positions(rng, CHUNK_SIZE, 0.01)
+    ])
+    assert len(positions[positions < CHUNK_SIZE]) > ARRAY_MAX
+    bitmap = Bitmap.from_positions(positions)
+
+    pages, after = [], -1
+    while True:
+        page = bitmap.positions(after=after, limit=1000)
+        if not len(page):
+            break
+        pages.append(page)
+        after = int(page[-1])
+    assert np.array_equal(np.concatenate(pages), positions)
+    assert bitmap.positions(after=CHUNK_SIZE + 5, limit=3).tolist() == positions[positions > CHUNK_SIZE + 5][:3].tolist()
+
+
+def test_filters_match_dataframe(village_frame):
+    store = LocationStore(village_frame)
+    index = VillageBitmapIndex.build(store)
+    keys, positions = store.village_rows()
+    villages = village_frame.iloc[positions].reset_index(drop=True).astype(object)
+
+    def matching(expression):
+        return [index.keys[position] for position in index.evaluate(expression).positions()]
+
+    def expected(mask):
+        return [keys[i] for i in np.flatnonzero(mask.to_numpy())]
+
+    at_least = SUITABILITY_LABELS[SUITABILITY_LABELS.index('Moderately Suitable'):]
+    assert matching({'column': 'Cotton', 'at_least': 'moderately suitable'}) == \
+        expected(villages['Cotton'].isin(at_least))
+    assert matching({'and': [
+        {'column': 'state', 'eq': 'Maharashtra'},
+        {'column': 'EC', 'in': ['NON-SALINE']},
+        {'not': {'column': 'Rice', 'eq': 'Not Suitable'}},
+    ]}) == expected(
+        (villages['STATE'] == 'Maharashtra') & (villages['EC'] == 'Non-saline') & (villages['Rice'] != 'Not Suitable')
+    )
+    assert matching({'or': [
+        {'column': 'DISTRICT NAME', 'eq': 'Beta'},
+        {'column': 'pH', 'in': ['Acidic', 'Unknown band']},
+    ]}) == expected((villages['DISTRICT NAME'] == 'Beta') | (villages['pH'] == 'Acidic'))
+    # A missing label is not "Not Suitable"
+    assert len(matching({'not': {'column': 'Wheat', 'in': list(SUITABILITY_LABELS)}})) == villages['Wheat'].isna().sum()
+
+
+@pytest.mark.parametrize('expression', [
+    {'column': 'Mango', 'eq': 'Highly Suitable'},
+    {'column': 'EC', 'at_least': 'Saline'},
+    {'column': 'Cotton', 'at_least': 'Very'},
+    {'column': 'Cotton', 'in': 'Highly Suitable'},
+    {'and': []},
+    ['not', 'an', 'object'],
+])
+def test_malformed_filters_are_rejected(village_frame, expression):
+    index = VillageBitmapIndex.build(LocationStore(village_frame))
+    with pytest.raises(ValueError):
+        index.evaluate(expression)
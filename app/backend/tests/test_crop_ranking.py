@@ -0,0 +1,53 @@
+"""
+Crop ranking: every region's top-k is the same as sorting that region's
+villages by a score computed one village at a time with the crop rules
+"""
+import pytest
+
+from crop_ranking import CropRanking
+from crop_rules import RULE_ENGINE, SUITABILITY_LABELS
+from location_store import LocationStore
+from soil_store import SOIL_ATTRIBUTES
+
+
+def village_scores(frame, keys, positions, crop):
+    """Score of each village from its workbook row, in village_rows order"""
+    total = len(RULE_ENGINE.conditions[RULE_ENGINE.crops.index(crop)])
+    scores = []
+    for position in positions:
+        row = frame.iloc[int(position)]
+        profile = {}
+        for column, attribute in SOIL_ATTRIBUTES.items():
+            levels = {level.lower(): level for level in RULE_ENGINE.levels[attribute]}
+            profile[attribute] = levels.get(str(row[column]).lower())
+        met = RULE_ENGINE.explain_one(profile)[crop]['conditions_met']
+        label = SUITABILITY_LABELS.index(row[crop]) if row[crop] in SUITABILITY_LABELS else 0
+        scores.append((label + met / total) * (100 / 3))
+    return scores
+
+
+@pytest.mark.parametrize('crop', ['Cotton', 'Rice', 'Onion'])
+def test_top_matches_full_sort(village_frame, crop):
+    store = LocationStore(village_frame)
+    ranking = CropRanking.build(store)
+    keys, positions = store.village_rows()
+    scores = village_scores(village_frame, keys, positions, crop)
+
+    regions = {()} | {key[:level] for key in keys for level in (1, 2, 3)}
+    for region in regions:
+        members = [i for i, key in enumerate(keys) if key[:len(region)] == region]
+        # Stable: equal scores keep the villages' name order
+        expected = sorted(members, key=lambda i: -scores[i])[:7]
+        top = ranking.top(crop, region, k=7)
+        assert [(entry['block'], entry['village']) for entry in top] == [keys[i][2:] for i in expected]
+        assert [entry['score'] for entry in top] == [round(scores[i], 1) for i in expected]
+
+    assert len(ranking.top(crop, (), k=len(keys) + 10)) == len(keys)
+
+
+def test_unknown_region_and_crop(village_frame):
+    ranking = CropRanking.build(LocationStore(village_frame))
+    assert ranking.top('Cotton', (' Goa ', 'Alpha'), k=1)[0]['district'] == 'Alpha'
+    assert ranking.top('Cotton', ('Kerala',)) is None
+    with pytest.raises(ValueError):
+        ranking.top('Mango')
@@ -0,0 +1,246 @@
+"""
+Crop rule engine: the compiled rules, the precomputed table, explanations
+and label probabilities all agree with the original per-crop if/else rules
+"""
+import itertools
+import os
+import random
+
+import numpy as np
+import pytest
+
+from crop_rules import (
+    AMENDABLE_ATTRIBUTES, ATTRIBUTE_LEVELS, CROP_RULES, RULE_ENGINE, SUITABILITY_LABELS, TABLE_DATA_FILE, CropRuleEngine,
+    SuitabilityTable, evaluate_profile, load_suitability_table
+)
+
+HM = ["High", "Medium"]
+TEMPERATURES = ('Temperature_Summer', 'Temperature_Winter', 'Temperature_Monsoon')
+
+
+def legacy_evaluate_all_crops(data):
+    """CropRecommendationService.evaluate_all_crops as it was before the rule table"""
+    def label(cnt, highly, moderately):
+        return "Highly Suitable" if cnt >= highly else ("Moderately Suitable" if cnt >= moderately else "Not Suitable")
+
+    warm = any(data.get(t, '') in HM for t in TEMPERATURES)
+    return {
+        "Sugarcane": label(sum([
+            data.get('Nitrogen') in HM, data.get('Potassium') in HM, data.get('OC') in HM,
+            data.get('EC') == "Non-Saline", data.get('pH') in ["Neutral", "Alkaline"],
+            data.get('Temperature_Winter') == "High", data.get('Rainfall') in HM
+        ]), 6, 5),
+        "Cotton": label(sum([
+            data.get('Phosphorus') in HM, data.get('Potassium') in HM, data.get('Zinc') == "Sufficient",
+            data.get('pH') in ["Neutral", "Alkaline"], data.get('Temperature_Winter') == "High",
+            data.get('Rainfall') in HM
+        ]), 5, 4),
+        "Soyabean": label(sum([
+            data.get('Phosphorus') in HM, data.get('Boron') == "Sufficient", data.get('Sulphur') == "Sufficient",
+            data.get('OC') in HM, data.get('pH') in ["Neutral", "Acidic"], data.get('Rainfall') in HM
+        ]), 5, 4),
+        "Rice": label(sum([
+            data.get('Nitrogen') in HM, data.get('Phosphorus') in HM,
+            data.get('pH') in ["Neutral", "Acidic", "Alkaline"], data.get('EC') == "Non-Saline",
+            data.get('Temperature_Winter') == "High", data.get('Rainfall') == "High",
+            data.get('Boron') == "Sufficient" or data.get('Copper') == "Sufficient"
+        ]), 5, 4),
+        "Jowar": label(sum([
+            data.get('Potassium') in HM, data.get('Zinc') == "Sufficient", data.get('EC') == "Non-Saline",
+            data.get('pH') in ["Neutral", "Alkaline"], data.get('Temperature_Winter') == "High",
+            data.get('Rainfall') == "Medium"
+        ]), 5, 4),
+        "Tur (Pigeon Pea)": label(sum([
+            data.get('Phosphorus') in ["High", "Medium", "Low"], data.get('OC') in HM,
+            data.get('Iron') == "Sufficient", data.get('pH') in ["Neutral", "Alkaline", "Acidic"],
+            data.get('Temperature_Winter') == "High", data.get('Rainfall') in HM
+        ]), 5, 4),
+        "Wheat": label(sum([
+            data.get('Nitrogen') in HM, data.get('Phosphorus') in HM, data.get('Potassium') in HM,
+            data.get('Zinc') == "Sufficient", data.get('Iron') == "Sufficient",
+            data.get('Manganese') == "Sufficient", data.get('pH') == "Neutral",
+            data.get('Temperature_Monsoon') == "Medium", data.get('Rainfall') in HM
+        ]), 6, 5),
+        "Groundnut": label(sum([
+            data.get('Phosphorus') in HM, data.get('Potassium') in HM, data.get('Boron') == "Sufficient",
+            data.get('EC') == "Non-Saline", data.get('pH') == "Neutral",
+            data.get('Temperature_Winter') == "High", data.get('Rainfall') == "Medium"
+        ]), 6, 5),
+        "Onion": label(sum([
+            data.get('Potassium') in HM, data.get('Sulphur') == "Sufficient", data.get('Zinc') == "Sufficient",
+            data.get('OC') in HM, warm
+        ]), 5, 3),
+        "Tomato": label(sum([
+            data.get('Nitrogen') in HM, data.get('Phosphorus') in HM, data.get('Potassium') in HM,
+            data.get('Zinc') == "Sufficient", data.get('Boron') == "Sufficient", warm
+        ]), 5, 4),
+        "Potato": label(sum([
+            data.get('Nitrogen') in HM, data.get('Phosphorus') in HM, data.get('Potassium') in HM,
+            data.get('EC') == "Non-Saline", data.get('pH') in ["Neutral", "Alkaline"],
+            data.get('Temperature_Summer', '') in HM, data.get('Temperature_Monsoon', '') in HM
+        ]), 6, 5),
+        "Garlic": label(sum([
+            data.get('Nitrogen') in HM, data.get('Potassium') in HM, data.get('OC') in HM,
+            data.get('pH') in ["Neutral", "Alkaline"], data.get('Zinc') == "Sufficient",
+            data.get('Temperature_Winter', '') in HM, data.get('Rainfall') in HM
+        ]), 5, 4),
+    }
+
+
+def sample_profiles(seed, n=500):
+    """Random profiles, mostly banded, some with missing or unrecognized values"""
+    rng = random.Random(seed)
+    profiles = []
+    for _ in range(n):
+        profile = {}
+        for name, levels in ATTRIBUTE_LEVELS.items():
+            roll = rng.random()
+            if roll < 0.85:
+                profile[name] = rng.choice(levels)
+            elif roll < 0.95:
+                profile[name] = rng.choice(['', 'Very High', 'non-saline', None])
+        profiles.append(profile)
+    return profiles
+
+
+@pytest.fixture(scope='module')
+def table_path(tmp_path_factory):
+    """Suitability table built for RULE_ENGINE in a scratch directory"""
+    path = str(tmp_path_factory.mktemp('rules') / 'crop_rules.table')
+    load_suitability_table(path)
+    return path
+
+
+@pytest.mark.parametrize('seed', range(6))
+def test_engine_matches_legacy_rules(seed, table_path):
+    profiles = sample_profiles(seed)
+    expected = [legacy_evaluate_all_crops(profile) for profile in profiles]
+
+    assert RULE_ENGINE.evaluate(profiles) == expected
+    assert [RULE_ENGINE.evaluate_one(profile) for profile in profiles] == expected
+    # Table path for fully banded profiles, engine fallback for the rest
+    assert [evaluate_profile(dict(profile)) for profile in profiles] == expected
+
+    labels = RULE_ENGINE.evaluate_codes(RULE_ENGINE.encode(profiles))
+    assert [dict(zip(RULE_ENGINE.crops, (SUITABILITY_LABELS[code] for code in row))) for row in labels.tolist()] \
+        == expected
+
+
+def test_table_covers_every_banded_profile(table_path):
+    table = SuitabilityTable.read(table_path, RULE_ENGINE)
+    assert table is not None
+    assert len(table.packed) == int(np.prod(SuitabilityTable.radices(RULE_ENGINE)))
+
+    for profile in sample_profiles(99, 200):
+        banded = {name: value for name, value in profile.items() if value in ATTRIBUTE_LEVELS[name]}
+        if len(banded) == len(ATTRIBUTE_LEVELS):
+            assert table.index(banded) is not None
+        assert table.evaluate_one(banded) == legacy_evaluate_all_crops(banded)
+
+
+def test_corrupted_table_is_rejected_and_rebuilt(table_path, tmp_path):
+    other_rules = {**CROP_RULES, 'Onion': {**CROP_RULES['Onion'], 'moderately': 4}}
+    path = str(tmp_path / 'crop_rules.table')
+    SuitabilityTable.read(table_path, RULE_ENGINE).write(path)
+    data_file = os.path.join(path, TABLE_DATA_FILE)
+    with open(data_file, 'r+b') as f:
+        f.seek(-1, os.SEEK_END)
+        last = f.read(1)
+        f.seek(-1, os.SEEK_END)
+        f.write(bytes([last[0] ^ 0xFF]))
+
+    assert SuitabilityTable.read(path, RULE_ENGINE) is None
+    # Nor is a table built from other rules
+    SuitabilityTable.read(table_path, RULE_ENGINE).write(str(tmp_path / 'other.table'))
+    assert SuitabilityTable.read(str(tmp_path / 'other.table'), CropRuleEngine(rules=other_rules)) is None
+
+    rebuilt = load_suitability_table(path)
+    assert SuitabilityTable.read(path, RULE_ENGINE).checksum == rebuilt.checksum
+
+
+def test_explain_bitmasks_name_the_failed_conditions():
+    for profile in sample_profiles(7, 200):
+        explanation = RULE_ENGINE.explain_one(profile)
+        expected = legacy_evaluate_all_crops(profile)
+        for crop in RULE_ENGINE.crops:
+            entry = explanation[crop]
+            assert entry['suitability'] == expected[crop]
+            assert entry['conditions_met'] == bin(entry['mask']).count('1')
+            assert len(entry['failed']) == entry['conditions_total'] - entry['conditions_met']
+            for failed in entry['failed']:
+                assert not any(profile.get(name) in failed['accepted'] for name in failed['attributes'])
+
+    # Rice's "Boron or Copper" condition holds through either attribute
+    rice = RULE_ENGINE.explain_one({'Boron': 'Deficient', 'Copper': 'Sufficient'})['Rice']
+    assert rice['mask'] >> 6 & 1
+    assert 'Boron or Copper' not in [failed['factor'] for failed in rice['failed']]
+
+
+def test_probabilities_are_exact():
+    fixed = {
+        'Phosphorus': 'High', 'Potassium': 'Medium', 'OC': 'High', 'EC': 'Non-Saline',
+        'Boron': 'Sufficient', 'Sulphur': 'Deficient', 'Iron': 'Sufficient', 'Manganese': 'Sufficient',
+        'Copper': 'Deficient', 'Temperature_Summer': 'High', 'Temperature_Monsoon': 'Medium'
+    }
+    uncertain = {
+        'Nitrogen': {'High': 0.2, 'Low': 0.8},
+        'pH': {'Neutral': 0.5, 'Acidic': 0.25, 'Alkaline': 0.25},
+        'Zinc': {'Sufficient': 3, 'Deficient': 2},
+        'Temperature_Winter': {'High': 0.7, 'Low': 0.3},
+        'Rainfall': {'High': 0.1, 'Medium': 0.6, 'Low': 0.3},
+    }
+
+    # Brute force over every combination of the uncertain bands
+    expected = {crop: dict.fromkeys(SUITABILITY_LABELS, 0.0)
+                for crop in RULE_ENGINE.crops}
+    names = list(uncertain)
+    for combination in itertools.product(*(uncertain[name].items() for name in names)):
+        weight = 1.0
+        for name, (_, p) in zip(names, combination):
+            weight *= p / sum(uncertain[name].values())
+        profile = {**fixed, **{name: level for name, (level, _) in zip(names, combination)}}
+        for crop, label in legacy_evaluate_all_crops(profile).items():
+            expected[crop][label] += weight
+
+    probabilities = RULE_ENGINE.probabilities({**fixed, **uncertain})
+    for crop in RULE_ENGINE.crops:
+        assert probabilities[crop] == pytest.approx(expected[crop], abs=1e-12)
+
+
+@pytest.mark.parametrize('distribution', [{'High': -1}, {'High': 0}, {'Huge': 1}, {'High': 'x'}])
+def test_probabilities_reject_malformed_distributions(distribution):
+    with pytest.raises(ValueError):
+        RULE_ENGINE.probabilities({'Nitrogen': distribution})
+
+
+def test_what_if_stops_when_the_target_is_met():
+    profile = {'Nitrogen': 'High', 'Phosphorus': 'High', 'pH': 'Neutral', 'EC': 'Non-Saline',
+               'Temperature_Winter': 'High', 'Rainfall': 'High', 'Boron': 'Sufficient'}
+    assert legacy_evaluate_all_crops(profile)['Rice'] == 'Highly Suitable'
+
+    for target in ('Highly Suitable', 'Moderately Suitable'):
+        assert RULE_ENGINE.what_if(profile, 'Rice', target=target) == {
+            'crop': 'Rice', 'target': target, 'current': 'Highly Suitable',
+            'already': True, 'achievable': True, 'options': []
+        }
+
+
+def test_what_if_options_reach_the_target_with_fewest_changes():
+    profile = {name: levels[-1] for name, levels in ATTRIBUTE_LEVELS.items()}
+    profile.update({'Temperature_Winter': 'High', 'Rainfall': 'High'})
+    result = RULE_ENGINE.what_if(profile, 'Wheat', target='Moderately Suitable', limit=4)
+    assert not result['already'] and result['achievable'] and len(result['options']) == 4
+
+    counts = [len(option['changes']) for option in result['options']]
+    assert counts == sorted(counts)
+    for option in result['options']:
+        changed = {**profile, **{change['attribute']: change['to'] for change in option['changes']}}
+        assert all(change['from'] == profile[change['attribute']] for change in option['changes'])
+        assert legacy_evaluate_all_crops(changed) == option['suitability']
+        assert option['suitability']['Wheat'] != 'Not Suitable'
+
+    # No set of one fewer change gets there
+    fewest = counts[0]
+    for names in itertools.combinations(AMENDABLE_ATTRIBUTES, fewest - 1):
+        for levels in itertools.product(*(ATTRIBUTE_LEVELS[name] for name in names)):
+            assert legacy_evaluate_all_crops({**profile, **dict(zip(names, levels))})['Wheat'] == 'Not Suitable'
@@ -0,0 +1,56 @@
+"""
+On-demand reloads: the shared preparation runs once, before the trigger
+file tells the other processes to reload
+"""
+import os
+import time
+
+import pandas as pd
+
+from crop_dataset import SNAPSHOT_META_FILE, snapshot_is_fresh, snapshot_path_for, snapshot_version_path
+from crop_recommendation import CropRecommendationService
+from dataset_reload import DatasetReloader
+
+
+def _wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'reload did not finish'
+        time.sleep(0.02)
+
+
+def test_request_reload_prepares_before_signalling(tmp_path):
+    source = tmp_path / 'crops.xlsx'
+    source.write_text('')
+    events = []
+    reloader = DatasetReloader(
+        str(source),
+        load=lambda version: events.append(('load', os.path.exists(reloader.trigger_path))),
+        publish=lambda generation: None,
+        trigger_interval=0,
+        prepare=lambda: events.append(('prepare', os.path.exists(reloader.trigger_path)))
+    )
+
+    assert reloader.request_reload()
+    _wait_for(lambda: reloader.version == 2)
+    assert events == [('prepare', False), ('load', True)]
+
+
+def test_reload_opens_snapshot_rebuilt_once(workbook, monkeypatch):
+    service = CropRecommendationService(excel_path=workbook, shared_memory=True)
+    # A workbook newer than the snapshot makes it stale
+    meta = os.path.join(snapshot_version_path(snapshot_path_for(workbook)), SNAPSHOT_META_FILE)
+    earlier = os.path.getmtime(workbook) - 5
+    os.utime(meta, (earlier, earlier))
+    assert not snapshot_is_fresh(workbook)
+
+    parses = []
+    read_excel = pd.read_excel
+    monkeypatch.setattr(pd, 'read_excel', lambda *args, **kwargs: parses.append(args) or read_excel(*args, **kwargs))
+
+    service.reloader.request_reload()
+    _wait_for(lambda: service.reloader.version == 2)
+    assert len(parses) == 1 and snapshot_is_fresh(workbook)
+    # Another worker reloading now only opens the snapshot
+    assert service.reloader.reload() and len(parses) == 1
+    assert service.df is None
@@ -0,0 +1,60 @@
+"""
+Prepared JSON: one serialization answers every encoding, and any of its
+ETags revalidates the document with a bodyless 304
+"""
+import gzip
+import json
+
+import pytest
+from flask import Flask
+
+import json_payload
+from json_payload import PreparedJson
+
+DOCUMENT = {'Maharashtra': {'Pune': {'Haveli': ['Wagholi', 'Lohegaon']}}, 'note': 'पुणे'}
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    prepared = PreparedJson(DOCUMENT)
+    app.add_url_rule('/data', 'data', lambda: prepared.response(max_age=60))
+    return app.test_client(), prepared
+
+
+def test_encodings_decode_to_the_document(client):
+    client, prepared = client
+
+    plain = client.get('/data', headers={'Accept-Encoding': 'identity'})
+    assert plain.status_code == 200 and 'Content-Encoding' not in plain.headers
+    assert plain.get_json() == DOCUMENT
+    assert plain.headers['ETag'] == prepared.etag()
+    assert plain.headers['Vary'] == 'Accept-Encoding'
+
+    gzipped = client.get('/data', headers={'Accept-Encoding': 'gzip'})
+    assert gzipped.headers['Content-Encoding'] == 'gzip'
+    assert gzipped.headers['ETag'] == prepared.etag('gzip')
+    assert json.loads(gzip.decompress(gzipped.data)) == DOCUMENT
+
+    if json_payload.brotli is not None:
+        compressed = client.get('/data', headers={'Accept-Encoding': 'gzip, br'})
+        assert compressed.headers['Content-Encoding'] == 'br'
+        assert json.loads(json_payload.brotli.decompress(compressed.data)) == DOCUMENT
+
+
+def test_any_etag_revalidates(client):
+    client, prepared = client
+    for tag in (prepared.etag(), prepared.etag('gzip'), prepared.etag('br'), f'W/{prepared.etag()}'):
+        response = client.get('/data', headers={'Accept-Encoding': 'gzip', 'If-None-Match': tag})
+        assert response.status_code == 304 and response.data == b''
+        assert response.headers['ETag'] == prepared.etag('gzip')
+
+    changed = PreparedJson({**DOCUMENT, 'note': 'changed'})
+    response = client.get('/data', headers={'If-None-Match': changed.etag()})
+    assert response.status_code == 200
+
+
+def test_etag_is_stable_across_serializations():
+    # Every worker serializing the same data hands out the same tag
+    assert PreparedJson(DOCUMENT).etag('gzip') == PreparedJson(json.loads(json.dumps(DOCUMENT))).etag('gzip')
+    assert PreparedJson(DOCUMENT).gzip_body == PreparedJson(DOCUMENT).gzip_body
@@ -0,0 +1,63 @@
+"""
+Location search: transliteration variants fold together, matches rank
+exact > prefix > later word > misspelling, and filters narrow the results
+"""
+import pytest
+
+from location_search import LocationSearchIndex, fold_name
+from location_store import LocationStore
+
+ENTRIES = [
+    ('Maharashtra', 'Pune'),
+    ('Maharashtra', 'Pune', 'Haveli'),
+    ('Maharashtra', 'Pune', 'Haveli', 'Pune Cantonment'),
+    ('Maharashtra', 'Pune', 'Haveli', 'Punawale'),
+    ('Maharashtra', 'Pune', 'Haveli', 'Kalas Bk'),
+    ('Maharashtra', 'Nashik', 'Sinnar', 'Pimpalgaon'),
+    ('Maharashtra', 'Kolhapur', 'Karvir', 'Kolhapur'),
+    ('Goa', 'North Goa', 'Bardez', 'Pune '),
+]
+
+
+@pytest.mark.parametrize('variant, name', [
+    ('Pimpalgaaon', 'Pimpalgaon'),
+    ('Kolhapoor', 'Kolapur'),
+    ('Kolapur', 'Kolhapur'),
+    ('Khed', 'Ked'),
+    ('Wadgaon', 'vadgaon'),
+    ('Pune (Rural)', 'pune rural'),
+])
+def test_fold_name_merges_spelling_variants(variant, name):
+    assert fold_name(variant) == fold_name(name)
+
+
+def test_ranking_and_filters():
+    index = LocationSearchIndex(ENTRIES)
+    results = index.search('pune', limit=10)
+
+    # Exact names first (district before the villages), then name prefixes
+    assert [(r['type'], r.get('village')) for r in results[:3]] == \
+        [('district', None), ('village', 'Pune '), ('village', 'Pune Cantonment')]
+    assert results[0]['score'] > results[2]['score']
+    assert results[0]['label'] == 'Pune, Maharashtra'
+
+    assert [r['village'] for r in index.search('bk')] == ['Kalas Bk']
+    assert index.search('kolapur', kinds=['village'])[0]['village'] == 'Kolhapur'
+    assert [r['state'] for r in index.search('pune', kinds=['village'], state='Goa')] == ['Goa']
+    assert len(index.search('p', limit=2)) == 2
+    assert index.search('  ', limit=5) == [] and index.search('pune', limit=0) == []
+
+    # A misspelling is found by trigrams, below every prefix match
+    fuzzy = index.search('pimplgaon')
+    assert fuzzy[0]['village'] == 'Pimpalgaon' and fuzzy[0]['score'] < 1
+
+
+def test_store_search_covers_every_level(village_frame):
+    store = LocationStore(village_frame)
+    results = store.search('beta', limit=50, state='Goa')
+
+    assert results[0] == {'type': 'district', 'state': 'Goa', 'district': 'Beta',
+                          'label': 'Beta, Goa', 'score': 3.0}
+    assert {r['type'] for r in results} == {'district', 'block'}
+    village = store.search('south wadi 3', kinds=['village'])[0]
+    assert store.find_village_row(village['state'], village['district'], village['block'], village['village']) is not None
@@ -0,0 +1,76 @@
+"""
+Location store lookups: partial locations, with or without gaps, find the
+same first row as a scan of the DataFrame, and cached values are built once
+however many requests ask for them at the same time
+"""
+import itertools
+import threading
+import time
+
+import numpy as np
+
+from crop_dataset import LOCATION_COLUMNS
+from location_store import LocationStore, PartitionedLocationStore
+
+
+def first_row(frame, names):
+    mask = np.ones(len(frame), dtype=bool)
+    for col, name in zip(LOCATION_COLUMNS, names):
+        if name and name.strip():
+            mask &= (frame[col] == name).to_numpy()
+    rows = np.flatnonzero(mask)
+    return int(rows[0]) if len(rows) else None
+
+
+def test_find_row_matches_scan(village_frame):
+    store = LocationStore(village_frame)
+    villages = village_frame.astype(object)
+    samples = [tuple(villages.iloc[i][LOCATION_COLUMNS]) for i in (0, 57, 211, len(villages) - 1)]
+
+    checked = 0
+    for location in samples:
+        # Every combination of given and blank levels, including gaps
+        for given in itertools.product((True, False), repeat=4):
+            if not any(given):
+                continue
+            names = [name if has else blank for name, has, blank in zip(location, given, (None, '', ' ', None))]
+            assert store.find_row(*names) == first_row(villages, names), names
+            checked += 1
+    assert checked == 60
+
+    assert store.find_row('Goa', None, 'Nowhere') is None
+    assert store.find_row('Kerala', None, 'Alpha North') is None
+    # A block of another district matches nothing under this one
+    assert store.find_row('Goa', 'Beta', 'Alpha North') is None
+    assert store.find_row(None, '', None, None) is None
+
+
+def test_concurrent_cached_builds_run_once(village_frame, tmp_path):
+    stores = [LocationStore(village_frame), PartitionedLocationStore(str(tmp_path))]
+    for store in stores:
+        builds = []
+        release = threading.Event()
+
+        def slow_build(name):
+            builds.append(name)
+            # Holds the build open until every thread has asked for it
+            release.wait(5)
+            return f'{name} value'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda name=name: results.append(store.cached(name, lambda: slow_build(name))))
+            for name in ('cube', 'ranking') * 8
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.2)
+        # A slow build does not block the other key's
+        assert sorted(builds) == ['cube', 'ranking']
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert sorted(builds) == ['cube', 'ranking']
+        assert sorted(results) == ['cube value'] * 8 + ['ranking value'] * 8
+        assert store.cached('cube') == 'cube value' and store.cached('search') is None
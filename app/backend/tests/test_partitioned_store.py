@@ -0,0 +1,104 @@
+"""
+Partitioned store: the dropdown tree covers every state without loading
+their partitions into the LRU, and national queries visit the partitions
+one at a time
+"""
+import gc
+import weakref
+
+import pandas as pd
+import pytest
+
+from crop_dataset import CROP_COLUMNS, SOIL_COLUMNS, load_crop_dataframe, write_state_partitions
+from crop_recommendation import CropRecommendationService
+from location_store import LocationStore, PartitionedLocationStore
+
+STATES = {
+    'Goa': [('North Goa', 'Bardez'), ('South Goa', 'Salcete')],
+    'Kerala': [('Idukki', 'Adimali')],
+    'Maharashtra': [('Pune', 'Haveli'), ('Pune', 'Mulshi')],
+}
+
+
+@pytest.fixture
+def partitions(tmp_path):
+    """Per-state partitions of a small three-state workbook, and its DataFrame"""
+    rows = []
+    for state, blocks in STATES.items():
+        for district, block in blocks:
+            for village in ('B', 'A'):
+                row = {'STATE': state, 'DISTRICT NAME': district, 'BLOCK NAME': block, 'VILLAGE NAME': f'{block} {village}'}
+                row.update({col: 'Medium' for col in SOIL_COLUMNS})
+                row.update({col: 'Highly Suitable' for col in CROP_COLUMNS})
+                rows.append(row)
+    path = tmp_path / 'crops.xlsx'
+    pd.DataFrame(rows).to_excel(path, index=False)
+    df = load_crop_dataframe(str(path))
+    write_state_partitions(df, str(tmp_path / 'crops.partitions'))
+    return str(tmp_path / 'crops.partitions'), df
+
+
+def test_hierarchy_leaves_partitions_unloaded(partitions):
+    directory, df = partitions
+    store = PartitionedLocationStore(directory, max_states=1)
+
+    assert store.get_hierarchy() == LocationStore(df).get_hierarchy()
+    assert store.loaded_states() == []
+    assert store.build_stats['loads'] == 0
+
+
+def test_hierarchy_survives_eviction(partitions):
+    directory, df = partitions
+    store = PartitionedLocationStore(directory, max_states=1)
+
+    assert store.get_villages('Goa', 'North Goa', 'Bardez') == ['Bardez A', 'Bardez B']
+    store.get_districts('Kerala')
+    assert store.loaded_states() == ['Kerala']
+
+    assert store.get_hierarchy() == LocationStore(df).get_hierarchy()
+    assert store.loaded_states() == ['Kerala']
+    assert store.build_stats['loads'] == 2
+
+
+@pytest.fixture
+def live_stores(monkeypatch):
+    """Most partition stores alive at once, counted as each new one is loaded"""
+    import location_store
+
+    stores = weakref.WeakSet()
+    peak = []
+    load = location_store.load_location_store
+
+    def counting_load(*args, **kwargs):
+        gc.collect()
+        peak.append(len(stores))
+        df, store = load(*args, **kwargs)
+        stores.add(store)
+        return df, store
+
+    monkeypatch.setattr(location_store, 'load_location_store', counting_load)
+    return peak
+
+
+def test_national_queries_stay_within_lru(partitions, live_stores):
+    directory, df = partitions
+    service = CropRecommendationService(excel_path=directory, max_loaded_states=1)
+    single = CropRecommendationService(excel_path=directory, max_loaded_states=len(STATES))
+
+    summary = service.get_summary()
+    assert summary['villages'] == len(df)
+    assert [child['name'] for child in summary['children']] == list(STATES)
+    assert len(service.get_top_locations('Rice', k=3)) == 3
+    pages, cursor = [], None
+    while True:
+        total, villages, cursor = service.filter_villages({'column': 'Rice', 'eq': 'Highly Suitable'}, limit=3, cursor=cursor)
+        pages.extend(villages)
+        if cursor is None:
+            break
+    assert total == len(pages) == len(df)
+    assert len({tuple(village.values()) for village in pages}) == len(df)
+    assert len(service.similar_villages(profile={'Nitrogen': 'Medium'}, k=4)) == 4
+
+    assert live_stores and max(live_stores) <= 1
+    assert service.locations.loaded_states() == [list(STATES)[-1]]
+    assert service.get_summary() == single.get_summary()
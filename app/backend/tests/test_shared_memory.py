@@ -0,0 +1,47 @@
+"""
+Shared-memory mode: the served store reads its crop/soil codes from
+read-only memory maps of the snapshot and the crop DataFrame is released
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from crop_recommendation import CropRecommendationService
+from location_store import load_location_store
+
+
+def _assert_mapped(matrix):
+    assert isinstance(matrix, np.memmap)
+    assert not matrix.flags.writeable
+
+
+def test_store_maps_code_matrices_read_only(workbook):
+    df, store = load_location_store(workbook)
+
+    _assert_mapped(store.crop_codes)
+    _assert_mapped(store.soil_codes)
+    assert len(store.crop_codes) == len(df) == 6
+    with pytest.raises(ValueError):
+        store.crop_codes[0, 0] = 0
+    assert store.get_crop_suitability(store.find_village_row('Maharashtra', 'Pune', 'Haveli', 'Haveli A'))['Cotton'] \
+        == 'Moderately Suitable'
+
+
+def test_shared_memory_service_releases_dataframe(workbook):
+    service = CropRecommendationService(excel_path=workbook, shared_memory=True)
+
+    assert service.df is None
+    _assert_mapped(service.locations.crop_codes)
+    _assert_mapped(service.locations.soil_codes)
+    assert service.get_crop_suitability('Maharashtra', 'Nashik', 'Sinnar', 'Sinnar B')['Rice'] == 'Moderately Suitable'
+
+    # A reload publishes a new generation without bringing the DataFrame back
+    assert service.reloader.reload()
+    assert service.df is None
+    _assert_mapped(service.locations.crop_codes)
+
+
+def test_default_mode_keeps_dataframe(workbook):
+    service = CropRecommendationService(excel_path=workbook)
+
+    assert isinstance(service.df, pd.DataFrame) and len(service.df) == 6
@@ -0,0 +1,34 @@
+"""
+Modules the website runs from its own copy: app/backend holds the source
+and website/ must carry the same bytes (cp app/backend/<module>.py website/)
+"""
+import os
+
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WEBSITE = os.path.join(BACKEND, os.pardir, os.pardir, 'website')
+
+SHARED_MODULES = [
+    'crop_dataset', 'crop_rules', 'dataset_reload', 'json_payload', 'location_search',
+    'location_store', 'soil_bands', 'soil_scoring', 'soil_store', 'village_similarity',
+]
+
+
+def _read(directory, module):
+    with open(os.path.join(directory, f'{module}.py'), 'rb') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('module', SHARED_MODULES)
+def test_website_copy_matches_backend(module):
+    assert _read(WEBSITE, module) == _read(BACKEND, module), \
+        f"website/{module}.py has drifted; copy app/backend/{module}.py over it"
+
+
+def test_no_unlisted_copies():
+    # Entry points and server config differ per app by design
+    own = {'app', 'main', 'gunicorn.conf'}
+    backend = {name[:-3] for name in os.listdir(BACKEND) if name.endswith('.py')}
+    website = {name[:-3] for name in os.listdir(WEBSITE) if name.endswith('.py')}
+    assert sorted((backend & website) - own) == sorted(SHARED_MODULES)
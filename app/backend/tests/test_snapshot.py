@@ -0,0 +1,59 @@
+"""
+Snapshot rebuilds: one process parses a stale workbook while the others
+wait for it, and readers keep the version they resolved while it is
+replaced
+"""
+import multiprocessing
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import crop_dataset
+from crop_dataset import (
+    SNAPSHOT_POINTER_FILE, load_crop_dataframe, read_snapshot_matrices, snapshot_path_for,
+    snapshot_version_path, write_snapshot
+)
+
+
+def _load_rows(workbook):
+    return len(load_crop_dataframe(workbook))
+
+
+@pytest.mark.skipif(crop_dataset.fcntl is None, reason='rebuilds are only serialized with fcntl')
+def test_concurrent_rebuild_parses_workbook_once(workbook, tmp_path, monkeypatch):
+    parses = tmp_path / 'parses'
+    read_excel = pd.read_excel
+
+    def counting_read_excel(*args, **kwargs):
+        with open(parses, 'a') as f:
+            f.write(f'{os.getpid()}\n')
+        return read_excel(*args, **kwargs)
+
+    # Patched before the fork, so every worker process counts its parses
+    monkeypatch.setattr(pd, 'read_excel', counting_read_excel)
+    with multiprocessing.get_context('fork').Pool(4) as pool:
+        rows = pool.map(_load_rows, [workbook] * 4)
+
+    assert rows == [6] * 4
+    assert len(parses.read_text().split()) == 1
+
+
+def test_readers_keep_the_version_they_mapped(workbook):
+    df = load_crop_dataframe(workbook)
+    snapshot = snapshot_path_for(workbook)
+    first = snapshot_version_path(snapshot)
+    codes = read_snapshot_matrices(snapshot)['crop']['codes']
+
+    write_snapshot(df, snapshot, excel_path=workbook)
+    second = snapshot_version_path(snapshot)
+    assert second != first and os.path.isdir(first)
+    with open(os.path.join(snapshot, SNAPSHOT_POINTER_FILE), encoding='utf-8') as f:
+        assert f.read() == os.path.basename(second)
+
+    # Two rebuilds later the first version is gone, but its mapping still reads
+    write_snapshot(df, snapshot, excel_path=workbook)
+    assert not os.path.exists(first) and os.path.isdir(second)
+    assert np.array_equal(codes, read_snapshot_matrices(snapshot)['crop']['codes'])
+    assert len(load_crop_dataframe(workbook)) == 6
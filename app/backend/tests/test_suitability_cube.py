@@ -0,0 +1,53 @@
+"""
+Suitability cube: counts at every level equal a DataFrame group-by, and a
+rebuild recounts only the blocks whose villages changed
+"""
+from crop_dataset import CROP_COLUMNS, LOCATION_COLUMNS
+from location_store import LocationStore
+from suitability_cube import UNKNOWN_LABEL, SuitabilityCube
+
+
+def test_counts_match_groupby(village_frame):
+    cube = SuitabilityCube.build(LocationStore(village_frame))
+    villages = village_frame.astype(object).fillna(UNKNOWN_LABEL)
+
+    for level in range(4):
+        groups = villages.groupby(LOCATION_COLUMNS[:level]) if level else [((), villages)]
+        for region, rows in groups:
+            region = region if isinstance(region, tuple) else (region,)
+            summary = cube.summary(region, children=False)
+            assert summary['villages'] == len(rows)
+            for crop in CROP_COLUMNS:
+                expected = rows[crop].value_counts()
+                for label in cube.labels:
+                    assert cube.count(region, crop, label) == expected.get(label, 0)
+                    assert summary['counts'][crop].get(label, 0) == expected.get(label, 0)
+
+
+def test_drill_down_and_unknown_regions(village_frame):
+    cube = SuitabilityCube.build(LocationStore(village_frame))
+    summary = cube.summary(('Goa',), crop='Cotton', suitability='Highly Suitable')
+
+    assert [child['name'] for child in summary['children']] == ['Alpha', 'Beta', 'Gamma']
+    assert sum(child['counts']['Cotton']['Highly Suitable'] for child in summary['children']) == \
+        summary['counts']['Cotton']['Highly Suitable']
+    assert list(summary['counts']) == ['Cotton'] and list(summary['counts']['Cotton']) == ['Highly Suitable']
+    assert cube.summary(('Kerala',)) is None
+    assert cube.count(('Goa', 'Alpha'), 'Mango', 'Highly Suitable') == 0
+
+
+def test_rebuild_recounts_changed_blocks_only(village_frame):
+    previous = SuitabilityCube.build(LocationStore(village_frame))
+    changed = village_frame.copy()
+    row = changed.index[(changed['BLOCK NAME'] == 'Beta North').to_numpy()][0]
+    changed.loc[row, 'Cotton'] = 'Not Suitable' if changed.loc[row, 'Cotton'] != 'Not Suitable' else 'Highly Suitable'
+
+    store = LocationStore(changed)
+    rebuilt = SuitabilityCube.build(store, previous=previous)
+    fresh = SuitabilityCube.build(store)
+
+    assert rebuilt.build_stats['blocks_recounted'] == 1
+    assert rebuilt.build_stats['blocks_reused'] == fresh.build_stats['blocks'] - 1
+    for region in [(), ('Goa',), ('Goa', 'Beta'), ('Goa', 'Beta', 'Beta North'), ('Maharashtra', 'Gamma')]:
+        assert rebuilt.summary(region) == fresh.summary(region)
+    assert rebuilt.summary(('Goa', 'Beta', 'Beta North')) != previous.summary(('Goa', 'Beta', 'Beta North'))
@@ -0,0 +1,336 @@
+"""
+Village Similarity Module
+Nearest villages by soil and climate profile, from a KD-tree over the soil
+store built once per dataset version
+"""
+import heapq
+import math
+import time
+import warnings
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from crop_rules import RULE_ENGINE
+from soil_bands import BAND_BOUNDARIES, band_positions
+from soil_store import soil_profiles
+
+# Villages a similarity query returns by default and at most
+DEFAULT_SIMILAR_VILLAGES = 10
+MAX_SIMILAR_VILLAGES = 100
+
+
+def parse_k(value: Any) -> int:
+    """
+    Number of similar villages requested, DEFAULT_SIMILAR_VILLAGES when absent
+
+    Raises:
+        ValueError: Unless an integer between 1 and MAX_SIMILAR_VILLAGES
+    """
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return DEFAULT_SIMILAR_VILLAGES
+    if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+        raise ValueError('k must be an integer')
+    try:
+        k = int(value.strip() if isinstance(value, str) else value)
+    except (TypeError, ValueError):
+        raise ValueError('k must be an integer')
+    if not 1 <= k <= MAX_SIMILAR_VILLAGES:
+        raise ValueError(f'k must be between 1 and {MAX_SIMILAR_VILLAGES}')
+    return k
+
+
+def split_profile(profile: Any) -> Tuple[Dict[str, str], Dict[str, float]]:
+    """
+    Level texts and numeric readings of a posted soil/climate profile
+
+    Null and blank values are left out (the attribute then takes the
+    dataset mean); the level texts still need normalize_input.
+
+    Raises:
+        ValueError: For a profile that is not an object, or a value that is
+            neither text nor a number
+    """
+    if not isinstance(profile, dict):
+        raise ValueError('profile must be an object of soil and climate parameters')
+    levels, readings = {}, {}
+    for name, value in profile.items():
+        if value is None or (isinstance(value, str) and not value.strip()):
+            continue
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            readings[name] = value
+        elif isinstance(value, str):
+            levels[name] = value
+        else:
+            raise ValueError(f"Invalid value for {name}: {value!r} (expected a level name or a number)")
+    return levels, readings
+
+
+class KDTree:
+    """
+    Exact k-nearest-neighbour search in Euclidean space
+
+    Nodes split their points at the median of the widest dimension until a
+    leaf holds at most ``leaf_size``; every node keeps the bounding box of
+    its points. A query visits nodes nearest box first and stops once the
+    nearest box left is farther than the k-th best point found.
+    """
+
+    def __init__(self, points: np.ndarray, leaf_size: int = 64):
+        """
+        Args:
+            points: (n, dims) coordinates
+            leaf_size: Most points a leaf holds
+        """
+        self.points = np.ascontiguousarray(points, dtype=np.float64)
+        n = len(self.points)
+        # Points of node i are index[start[i]:end[i]]; leaves have no children
+        self.index = np.arange(n)
+        starts, ends, lows, highs, children = [], [], [], [], []
+
+        stack = [(0, n, -1, 0)] if n else []
+        while stack:
+            start, end, parent, side = stack.pop()
+            node = len(starts)
+            if parent >= 0:
+                children[parent][side] = node
+            block = self.points[self.index[start:end]]
+            low, high = block.min(axis=0), block.max(axis=0)
+            starts.append(start)
+            ends.append(end)
+            lows.append(low)
+            highs.append(high)
+            children.append([-1, -1])
+            spread = high - low
+            if end - start <= leaf_size or not spread.any():
+                continue
+            dim = int(np.argmax(spread))
+            middle = (start + end) // 2
+            order = np.argpartition(block[:, dim], middle - start)
+            self.index[start:end] = self.index[start:end][order]
+            stack.append((middle, end, node, 1))
+            stack.append((start, middle, node, 0))
+
+        self._start = starts
+        self._end = ends
+        self._low = np.array(lows, dtype=np.float64).reshape(len(lows), self.points.shape[1])
+        self._high = np.array(highs, dtype=np.float64).reshape(len(highs), self.points.shape[1])
+        self._children = children
+        # Leaf points stored contiguously in tree order
+        self._ordered = self.points[self.index]
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def _box_distance(self, node: int, point: np.ndarray) -> float:
+        """Squared distance from a point to a node's bounding box"""
+        gap = np.maximum(self._low[node] - point, 0) + np.maximum(point - self._high[node], 0)
+        return float(gap @ gap)
+
+    def query(self, point, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The k points nearest a point
+
+        Returns:
+            (distances, point indices), nearest first; equal distances keep
+            index order
+        """
+        point = np.asarray(point, dtype=np.float64)
+        k = min(k, len(self))
+        best_d = np.empty(0)
+        best_i = np.empty(0, dtype=np.int64)
+        worst = math.inf
+        heap = [(self._box_distance(0, point), 0)] if k > 0 else []
+        while heap:
+            bound, node = heapq.heappop(heap)
+            # Equal distances may still displace by index order, so only a
+            # strictly farther box is skipped
+            if bound > worst:
+                break
+            left, right = self._children[node]
+            if left < 0:
+                start, end = self._start[node], self._end[node]
+                diff = self._ordered[start:end] - point
+                d = np.einsum('ij,ij->i', diff, diff)
+                near = d <= worst
+                if near.any():
+                    d = np.concatenate((best_d, d[near]))
+                    i = np.concatenate((best_i, self.index[start:end][near]))
+                    keep = np.lexsort((i, d))[:k]
+                    best_d, best_i = d[keep], i[keep]
+                    if len(best_d) == k:
+                        worst = best_d[-1]
+                continue
+            # Both children's boxes in one step
+            pair = [left, right]
+            gap = np.maximum(self._low[pair] - point, 0) + np.maximum(point - self._high[pair], 0)
+            for child, distance in zip(pair, np.einsum('ij,ij->i', gap, gap).tolist()):
+                if distance <= worst:
+                    heapq.heappush(heap, (distance, child))
+        return np.sqrt(best_d), best_i
+
+
+class VillageSimilarityIndex:
+    """
+    Villages nearest a soil and climate profile
+
+    Every soil store column is one dimension: the attribute's band position
+    from lowest (0) to highest, divided by the number of band steps so each
+    attribute spans about 0-1. Numeric readings are placed within their
+    band (soil_bands.band_positions), band names at its middle, and values
+    the dataset lacks take the column mean. Villages sharing a vector are
+    one tree point, as a band-only dataset repeats vectors a lot.
+    """
+
+    def __init__(self, store, keys: List[Tuple[str, str, str, str]], positions: np.ndarray,
+                 attributes: List[str], features: np.ndarray, fill: np.ndarray, build_stats: Dict[str, Any]):
+        """
+        Use ``VillageSimilarityIndex.build`` rather than calling this directly
+
+        Args:
+            store: LocationStore the villages belong to
+            keys: (state, district, block, village) per village
+            positions: Store row of each village
+            attributes: Rule attribute per feature column
+            features: (villages, attributes) feature vectors
+            fill: Per-attribute value used where a profile lacks one
+            build_stats: Timing figures of the build
+        """
+        self.store = store
+        self.keys = keys
+        self.positions = positions
+        self.attributes = attributes
+        self.features = features
+        self.fill = fill
+        self._key_index = {key: i for i, key in enumerate(keys)}
+
+        # Distinct vectors are the tree's points; a point's villages are
+        # members[offsets[p]:offsets[p + 1]], in village order
+        vectors, point_of = np.unique(features, axis=0, return_inverse=True)
+        point_of = point_of.reshape(-1)
+        self.members = np.argsort(point_of, kind='stable')
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(point_of, minlength=len(vectors)))))
+        self.point_of = point_of
+        self.tree = KDTree(vectors)
+        self.build_stats = {**build_stats, 'points': len(vectors)}
+
+    @classmethod
+    def build(cls, store) -> 'VillageSimilarityIndex':
+        """Feature vectors and KD-tree of every village of a LocationStore"""
+        start = time.perf_counter()
+        keys, positions = store.village_rows()
+        soil = soil_profiles(store)
+        attributes = [attribute for attribute in soil.attributes if attribute in BAND_BOUNDARIES]
+
+        features = np.full((len(keys), len(attributes)), np.nan)
+        for i, attribute in enumerate(attributes):
+            column = soil.attributes.index(attribute)
+            readings = soil.readings[positions, column]
+            bands = cls._band_index(attribute)[soil.bands[positions, column]]
+            features[:, i] = np.where(np.isnan(readings), bands, band_positions(attribute, readings))
+            features[:, i] /= cls._steps(attribute)
+        # Mean of what is known; NaN (no value at all) falls back to the middle
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            fill = np.nanmean(features, axis=0) if len(keys) else np.full(len(attributes), np.nan)
+        fill = np.where(np.isnan(fill), 0.5, fill)
+        features = np.where(np.isnan(features), fill, features)
+
+        build_stats = {'seconds': time.perf_counter() - start, 'villages': len(keys)}
+        return cls(store, keys, positions, attributes, features, fill, build_stats)
+
+    @staticmethod
+    def _band_index(attribute: str) -> np.ndarray:
+        """Rule engine code -> band position from the lowest (NaN for code 0)"""
+        bands = BAND_BOUNDARIES[attribute][2]
+        index = np.full(len(RULE_ENGINE.levels[attribute]) + 1, np.nan)
+        for k, band in enumerate(bands):
+            index[RULE_ENGINE.levels[attribute].index(band) + 1] = k
+        return index
+
+    @staticmethod
+    def _steps(attribute: str) -> int:
+        """Band steps between an attribute's lowest and highest band"""
+        return len(BAND_BOUNDARIES[attribute][2]) - 1
+
+    def encode_profile(self, profile: Mapping[str, Any]) -> np.ndarray:
+        """
+        Feature vector of an attribute -> value profile
+
+        Values are level names (as from normalize_input) or numeric readings;
+        "Rainfall overall" is accepted for Rainfall, and missing attributes
+        take the dataset mean.
+
+        Raises:
+            ValueError: For a value that is neither a level nor a number
+        """
+        profile = dict(profile)
+        if 'Rainfall overall' in profile and 'Rainfall' not in profile:
+            profile['Rainfall'] = profile.pop('Rainfall overall')
+        vector = self.fill.copy()
+        for i, attribute in enumerate(self.attributes):
+            value = profile.get(attribute)
+            if value is None or value == '':
+                continue
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                position = float(band_positions(attribute, [value])[0])
+            else:
+                levels = {level.lower(): k for k, level in enumerate(BAND_BOUNDARIES[attribute][2])}
+                position = levels.get(str(value).strip().lower())
+                if position is None:
+                    raise ValueError(f"Invalid value for {attribute}: {value!r}")
+            if not math.isnan(position):
+                vector[i] = position / self._steps(attribute)
+        return vector
+
+    def village_vector(self, location: Tuple[str, str, str, str]) -> Optional[np.ndarray]:
+        """Feature vector of an exact (state, district, block, village), None if unknown"""
+        i = self._key_index.get(tuple(location))
+        return None if i is None else self.features[i]
+
+    def nearest(self, vector: np.ndarray, k: int = 10,
+                exclude: Optional[Tuple[str, str, str, str]] = None) -> List[Dict[str, Any]]:
+        """
+        The k villages nearest a feature vector
+
+        Args:
+            vector: Feature vector, from encode_profile or village_vector
+            k: Number of villages
+            exclude: Village to leave out, normally the one queried
+
+        Returns:
+            Villages nearest first with their distance and crop suitability
+        """
+        skip = self._key_index.get(tuple(exclude)) if exclude is not None else None
+        # Every point holds at least one village, so k points (one more if
+        # a village is left out) always hold the k nearest villages
+        distances, points = self.tree.query(vector, k + (skip is not None))
+        villages = []
+        for distance, point in zip(distances.tolist(), points.tolist()):
+            for i in self.members[self.offsets[point]:self.offsets[point + 1]].tolist():
+                if i == skip:
+                    continue
+                if len(villages) == k:
+                    return villages
+                villages.append(self._result(i, distance))
+        return villages
+
+    def _result(self, i: int, distance: float) -> Dict[str, Any]:
+        """JSON-ready similar village"""
+        state, district, block, village = self.keys[i]
+        return {
+            'state': state,
+            'district': district,
+            'block': block,
+            'village': village,
+            'distance': round(distance, 4),
+            'crop_suitability': {
+                crop: label if isinstance(label, str) else None
+                for crop, label in self.store.get_crop_suitability(int(self.positions[i])).items()
+            }
+        }
+
+
+def similarity_index(store) -> VillageSimilarityIndex:
+    """Village similarity index of a LocationStore, built once per dataset version"""
+    return store.cached('village-similarity', lambda: VillageSimilarityIndex.build(store))
@@ -272,17 +272,26 @@ class ApiService {
     }
   }
 
-  /// Get list of villages for a block
+  /// Get list of villages for a block.
+  /// Pass [limit] to fetch one page; pass the returned 'nextCursor' as
+  /// [cursor] to fetch the next one (null on the last page).
   static Future<Map<String, dynamic>> getVillages(
     String state,
     String district,
-    String block,
-  ) async {
+    String block, {
+    int? limit,
+    String? cursor,
+  }) async {
     try {
       final baseUrl = await getBaseUrl();
       final response = await http.get(
         Uri.parse(
           '$baseUrl/api/crop/villages/${Uri.encodeComponent(state)}/${Uri.encodeComponent(district)}/${Uri.encodeComponent(block)}',
+        ).replace(
+          queryParameters: {
+            if (limit != null) 'limit': limit.toString(),
+            if (cursor != null) 'cursor': cursor,
+          },
         ),
         headers: {'Content-Type': 'application/json'},
       );
@@ -294,6 +303,8 @@ class ApiService {
           'success': true,
           'villages': List<String>.from(data['villages']),
           'count': data['count'],
+          'total': data['total'] ?? data['count'],
+          'nextCursor': data['next_cursor'],
         };
       } else {
         return {
@@ -306,6 +317,40 @@ class ApiService {
     }
   }
 
+  /// Search districts, blocks and villages by name in one request.
+  /// Each result carries its full state/district/block/village path.
+  static Future<Map<String, dynamic>> searchLocations(
+    String query, {
+    int limit = 10,
+  }) async {
+    try {
+      final baseUrl = await getBaseUrl();
+      final response = await http.get(
+        Uri.parse('$baseUrl/api/crop/search').replace(
+          queryParameters: {'q': query, 'limit': limit.toString()},
+        ),
+        headers: {'Content-Type': 'application/json'},
+      );
+
+      final data = jsonDecode(response.body);
+
+      if (response.statusCode == 200) {
+        return {
+          'success': true,
+          'results': List<Map<String, dynamic>>.from(data['results']),
+          'count': data['count'],
+        };
+      } else {
+        return {
+          'success': false,
+          'message': data['message'] ?? 'Failed to search locations',
+        };
+      }
+    } catch (e) {
+      return {'success': false, 'message': 'Network error: ${e.toString()}'};
+    }
+  }
+
   /// Get crop suitability for a specific location
   static Future<Map<String, dynamic>> getCropSuitability({
     required String state,
@@ -370,13 +415,19 @@ class ApiService {
   }
 
   /// Evaluate crops based on soil and climate data
+  ///
+  /// With [explain], the result also carries, per crop, the soil or climate
+  /// factors that failed. A parameter may be a map of band -> probability
+  /// when the band is uncertain; the result then carries the probability
+  /// of each suitability label per crop.
   static Future<Map<String, dynamic>> evaluateCrops(
-    Map<String, String> soilData,
-  ) async {
+    Map<String, dynamic> soilData, {
+    bool explain = false,
+  }) async {
     try {
       final baseUrl = await getBaseUrl();
       final response = await http.post(
-        Uri.parse('$baseUrl/api/crop/evaluate'),
+        Uri.parse('$baseUrl/api/crop/evaluate${explain ? '?explain=true' : ''}'),
         headers: {'Content-Type': 'application/json'},
         body: jsonEncode(soilData),
       );
@@ -389,6 +440,9 @@ class ApiService {
           'crops': data['crops'],
           'grouped': data['grouped'],
           'summary': data['summary'],
+          if (explain) 'explanation': data['explanation'],
+          if (data['probabilities'] != null)
+            'probabilities': data['probabilities'],
         };
       } else {
         return {
@@ -401,6 +455,75 @@ class ApiService {
     }
   }
 
+  /// Every crop scored 0-100 against soil and climate data, best first
+  static Future<Map<String, dynamic>> rankCrops(
+    Map<String, String> soilData,
+  ) async {
+    try {
+      final baseUrl = await getBaseUrl();
+      final response = await http.post(
+        Uri.parse('$baseUrl/api/crop/rank'),
+        headers: {'Content-Type': 'application/json'},
+        body: jsonEncode(soilData),
+      );
+
+      final data = jsonDecode(response.body);
+
+      if (response.statusCode == 200) {
+        return {'success': true, 'crops': data['crops']};
+      } else {
+        return {
+          'success': false,
+          'message': data['message'] ?? 'Failed to rank crops',
+        };
+      }
+    } catch (e) {
+      return {'success': false, 'message': 'Network error: ${e.toString()}'};
+    }
+  }
+
+  /// Villages with the most similar soil and climate to a village, or to
+  /// a soil profile when no village is given, nearest first
+  static Future<Map<String, dynamic>> getSimilarVillages({
+    String? state,
+    String? district,
+    String? block,
+    String? village,
+    Map<String, dynamic>? profile,
+    int k = 10,
+  }) async {
+    try {
+      final baseUrl = await getBaseUrl();
+      final response = await http.post(
+        Uri.parse('$baseUrl/api/crop/similar-villages'),
+        headers: {'Content-Type': 'application/json'},
+        body: jsonEncode({
+          if (village != null) ...{
+            'state': state,
+            'district': district,
+            'block': block,
+            'village': village,
+          },
+          if (profile != null) 'profile': profile,
+          'k': k,
+        }),
+      );
+
+      final data = jsonDecode(response.body);
+
+      if (response.statusCode == 200) {
+        return {'success': true, 'villages': data['villages']};
+      } else {
+        return {
+          'success': false,
+          'message': data['message'] ?? 'Failed to find similar villages',
+        };
+      }
+    } catch (e) {
+      return {'success': false, 'message': 'Network error: ${e.toString()}'};
+    }
+  }
+
   /// Generate growth timeline for a crop
   static Future<Map<String, dynamic>> generateGrowthTimeline({
     required String cropName,
@@ -1,4 +1,5 @@
 ﻿import os
+import hmac
 import json
 from pathlib import Path
 from flask import Flask, render_template, request, jsonify, flash, redirect, url_for, session, send_from_directory
@@ -8,6 +9,14 @@ import numpy as np
 import requests
 from dotenv import load_dotenv
 from openai import OpenAI
+from crop_dataset import ensure_snapshot, load_crop_dataframe, load_snapshot_matrices
+from crop_rules import RULE_ENGINE, evaluate_profile, load_suitability_table
+from dataset_reload import DatasetReloader
+from json_payload import PreparedJson, ndjson_response
+from location_store import LocationStore, load_location_store, paginate_sorted
+from soil_scoring import BASE_SCORE, SOIL_SCORER
+from soil_store import soil_profiles
+from village_similarity import parse_k, similarity_index, split_profile
 
 print("🔦 Importing required libraries...")
 
@@ -74,16 +83,14 @@ def validate_phone_number(phone, country_code='+91'):
 # ---------------------------
 
 EXCEL_PATH = "cropresults_with_state (1).xlsx"
+# Under a preforking server, keep only the lookup store (its crop/soil codes are
+# memory-mapped from the snapshot) so that workers share the dataset
+SHARED_CROP_DATA = os.getenv("CROP_DATA_SHARED", "False") == "True"
 try:
     print("📊 Loading Excel data...")
-    df = pd.read_excel(EXCEL_PATH)
-    df.columns = [col.strip() for col in df.columns]
-    df[['STATE', 'DISTRICT NAME', 'BLOCK NAME', 'VILLAGE NAME']] = (
-        df[['STATE', 'DISTRICT NAME', 'BLOCK NAME', 'VILLAGE NAME']]
-        .ffill()
-        .bfill()
-        .astype(str)
-    )
+    # Cleaned (ffill/bfill) data comes from the columnar snapshot when it is fresh;
+    # location, soil and crop columns are categoricals (int codes + one dictionary)
+    df = load_crop_dataframe(EXCEL_PATH)
     print("✅ Excel data loaded successfully!")
 except Exception as e:
     print(f"⚠️ Warning: Could not load Excel file: {e}")
@@ -95,26 +102,63 @@ except Exception as e:
 # Build Dropdown Hierarchy for Site
 # ---------------------------
 
+# Precomputed location lookups shared by every request of this process
+location_store = LocationStore(pd.DataFrame())
 dropdown_data = {}
 if not df.empty:
     try:
-        for _, row in df.iterrows():
-            state = row['STATE']
-            district = row['DISTRICT NAME']
-            block = row['BLOCK NAME']
-            village = row['VILLAGE NAME']
-            dropdown_data.setdefault(state, {})
-            dropdown_data[state].setdefault(district, {})
-            dropdown_data[state][district].setdefault(block, [])
-            if village not in dropdown_data[state][district][block]:
-                dropdown_data[state][district][block].append(village)
-        print("🗺️ Location hierarchy built successfully!")
+        location_store = LocationStore(df, matrices=load_snapshot_matrices(EXCEL_PATH), version=1)
+        dropdown_data = location_store.get_hierarchy()
+        similarity_index(location_store)
+        print(f"🗺️ Location hierarchy built successfully! ({location_store.describe_build()})")
     except Exception as e:
         print(f"⚠️ Warning: Could not build location hierarchy: {e}")
         dropdown_data = {}
 else:
     print("⚠️ No Excel data available - location features will be limited")
 
+if SHARED_CROP_DATA:
+    # Every route reads through location_store from here on
+    df = pd.DataFrame()
+    print("🔗 Shared-memory mode: crop DataFrame released")
+
+# ---------------------------
+# Hot Reload of the Crop Dataset
+# ---------------------------
+
+def load_crop_generation(version):
+    """Load the workbook and build every location lookup for one dataset version"""
+    new_df, store = load_location_store(EXCEL_PATH, version=version)
+    similarity_index(store)
+    return (pd.DataFrame() if SHARED_CROP_DATA else new_df), store
+
+def publish_crop_generation(generation):
+    """Swap a fully built dataset in; requests keep the store they already read"""
+    global df, location_store, dropdown_data
+    df, location_store = generation
+    dropdown_data = location_store.get_hierarchy()
+
+# Poll the workbook every N seconds (0 disables the watcher); POST
+# /api/admin/reload-dataset with X-Admin-Token triggers a reload on demand
+# in every worker (see DatasetReloader.request_reload)
+CROP_DATA_WATCH_INTERVAL = float(os.getenv("CROP_DATA_WATCH_INTERVAL", "0"))
+ADMIN_RELOAD_TOKEN = os.getenv("ADMIN_RELOAD_TOKEN", "")
+dataset_reloader = DatasetReloader(
+    EXCEL_PATH,
+    load=load_crop_generation,
+    publish=publish_crop_generation,
+    version=location_store.version,
+    # Rebuilt once by the worker handling the admin request; the others
+    # only open the finished snapshot
+    prepare=lambda: ensure_snapshot(EXCEL_PATH)
+)
+dataset_reloader.watch(CROP_DATA_WATCH_INTERVAL)
+
+@app.before_request
+def ensure_dataset_watcher():
+    """Start the workbook watcher in preforked workers (threads do not survive fork)"""
+    dataset_reloader.ensure_watching()
+
 # ---------------------------
 # OpenAI Chat Completion Calls with Fallback
 # ---------------------------
@@ -208,266 +252,115 @@ def normalize_input(d):
     print("✅ Normalized Input:", normalized)
     return normalized
 
-def evaluate_all_crops(d):
-    if "Rainfall overall" in d:
-        d["Rainfall"] = d.pop("Rainfall overall")
-    results = {}
-
-    # Sugarcane
-    cnt = sum([
-        d['Nitrogen'] in ["High", "Medium"],
-        d['Potassium'] in ["High", "Medium"],
-        d['OC'] in ["High", "Medium"],
-        d['EC'] == "Non-Saline",
-        d['pH'] in ["Neutral", "Alkaline"],
-        d['Temperature_Winter'] == "High",
-        d['Rainfall'] in ["High", "Medium"]
-    ])
-    results["Sugarcane"] = "Highly Suitable" if cnt >= 6 else ("Moderately Suitable" if cnt == 5 else "Not Suitable")
-
-    # Cotton
-    cnt = sum([
-        d['Phosphorus'] in ["High", "Medium"],
-        d['Potassium'] in ["High", "Medium"],
-        d['Zinc'] == "Sufficient",
-        d['pH'] in ["Neutral", "Alkaline"],
-        d['Temperature_Winter'] == "High",
-        d['Rainfall'] in ["High", "Medium"]
-    ])
-    results["Cotton"] = "Highly Suitable" if cnt >= 5 else ("Moderately Suitable" if cnt == 4 else "Not Suitable")
-
-    # Soyabean
-    cnt = sum([
-        d['Phosphorus'] in ["High", "Medium"],
-        d['Boron'] == "Sufficient",
-        d['Sulphur'] == "Sufficient",
-        d['OC'] in ["High", "Medium"],
-        d['pH'] in ["Neutral", "Acidic"],
-        d['Rainfall'] in ["High", "Medium"]
-    ])
-    results["Soyabean"] = "Highly Suitable" if cnt >= 5 else (
-        "Moderately Suitable" if cnt == 4 else "Not Suitable"
-    )
+# Every banded soil profile precomputed and memory-mapped; rebuilt here
+# whenever crop_rules.CROP_RULES changes
+load_suitability_table()
 
-    # Rice
-    cnt = sum([
-        d['Nitrogen'] in ["High", "Medium"],
-        d['Phosphorus'] in ["High", "Medium"],
-        d['pH'] in ["Neutral", "Acidic", "Alkaline"],
-        d['EC'] == "Non-Saline",
-        d['Temperature_Winter'] == "High",
-        d['Rainfall'] == "High",
-        d['Boron'] == "Sufficient" or d['Copper'] == "Sufficient"
-    ])
-    results["Rice"] = "Highly Suitable" if cnt >= 5 else ("Moderately Suitable" if cnt == 4 else "Not Suitable")
-
-    # Jowar
-    cnt = sum([
-        d['Potassium'] in ["High", "Medium"],
-        d['Zinc'] == "Sufficient",
-        d['EC'] == "Non-Saline",
-        d['pH'] in ["Neutral", "Alkaline"],
-        d['Temperature_Winter'] == "High",
-        d['Rainfall'] == "Medium"
-    ])
-    results["Jowar"] = "Highly Suitable" if cnt >= 5 else ("Moderately Suitable" if cnt == 4 else "Not Suitable")
-
-    # Tur (Pigeon Pea)
-    cnt = sum([
-        d['Phosphorus'] in ["High", "Medium", "Low"],
-        d['OC'] in ["High", "Medium"],
-        d['Iron'] == "Sufficient",
-        d['pH'] in ["Neutral", "Alkaline", "Acidic"],
-        d['Temperature_Winter'] == "High",
-        d['Rainfall'] in ["High", "Medium"]
-    ])
-    results["Tur (Pigeon Pea)"] = "Highly Suitable" if cnt >= 5 else (
-        "Moderately Suitable" if cnt == 4 else "Not Suitable"
-    )
-
-    # Wheat
-    cnt = sum([
-        d['Nitrogen'] in ["High", "Medium"],
-        d['Phosphorus'] in ["High", "Medium"],
-        d['Potassium'] in ["High", "Medium"],
-        d['Zinc'] == "Sufficient",
-        d['Iron'] == "Sufficient",
-        d['Manganese'] == "Sufficient",
-        d['pH'] == "Neutral",
-        d['Temperature_Monsoon'] == "Medium",
-        d['Rainfall'] in ["High", "Medium"]
-    ])
-    results["Wheat"] = "Highly Suitable" if cnt >= 6 else ("Moderately Suitable" if cnt == 5 else "Not Suitable")
-
-    # Groundnut
-    cnt = sum([
-        d['Phosphorus'] in ["High", "Medium"],
-        d['Potassium'] in ["High", "Medium"],
-        d['Boron'] == "Sufficient",
-        d['EC'] == "Non-Saline",
-        d['pH'] == "Neutral",
-        d['Temperature_Winter'] == "High",
-        d['Rainfall'] == "Medium"
-    ])
-    results["Groundnut"] = "Highly Suitable" if cnt >= 6 else (
-        "Moderately Suitable" if cnt == 5 else "Not Suitable"
-    )
-
-    # Onion
-    cnt = sum([
-        d['Potassium'] in ["High", "Medium"],
-        d['Sulphur'] == "Sufficient",
-        d['Zinc'] == "Sufficient",
-        d['OC'] in ["High", "Medium"],
-        any(t in ["High", "Medium"] for t in [
-            d.get('Temperature_Summer', ''),  # Using get in case keys missing
-            d.get('Temperature_Winter', ''),
-            d.get('Temperature_Monsoon', '')
-        ])
-    ])
-    results["Onion"] = "Highly Suitable" if cnt >= 5 else ("Moderately Suitable" if cnt >= 3 else "Not Suitable")
-
-    # Tomato
-    cnt = sum([
-        d['Nitrogen'] in ["High", "Medium"],
-        d['Phosphorus'] in ["High", "Medium"],
-        d['Potassium'] in ["High", "Medium"],
-        d['Zinc'] == "Sufficient",
-        d['Boron'] == "Sufficient",
-        any(t in ["High", "Medium"] for t in [
-            d.get('Temperature_Summer', ''),
-            d.get('Temperature_Winter', ''),
-            d.get('Temperature_Monsoon', '')
-        ])
-    ])
-    results["Tomato"] = "Highly Suitable" if cnt >= 5 else ("Moderately Suitable" if cnt == 4 else "Not Suitable")
-
-    # Potato
-    cnt = sum([
-        d['Nitrogen'] in ["High", "Medium"],
-        d['Phosphorus'] in ["High", "Medium"],
-        d['Potassium'] in ["High", "Medium"],
-        d['EC'] == "Non-Saline",
-        d['pH'] in ["Neutral", "Alkaline"],
-        d.get('Temperature_Summer', '') in ["High", "Medium"],
-        d.get('Temperature_Monsoon', '') in ["High", "Medium"]
-    ])
-    results["Potato"] = "Highly Suitable" if cnt >= 6 else ("Moderately Suitable" if cnt == 5 else "Not Suitable")
-
-    # Garlic
-    cnt = sum([
-        d['Nitrogen'] in ["High", "Medium"],
-        d['Potassium'] in ["High", "Medium"],
-        d['OC'] in ["High", "Medium"],
-        d['pH'] in ["Neutral", "Alkaline"],
-        d['Zinc'] == "Sufficient",
-        d.get('Temperature_Winter', '') in ["High", "Medium"],
-        d['Rainfall'] in ["High", "Medium"]
-    ])
-    results["Garlic"] = "Highly Suitable" if cnt >= 5 else ("Moderately Suitable" if cnt == 4 else "Not Suitable")
-
-    return results
+def evaluate_all_crops(d):
+    # Rules live in crop_rules.CROP_RULES, shared with the backend
+    return evaluate_profile(d)
 
 # ---------------------------
 # Dynamic Crop Timeline Generation
 # ---------------------------
 
+# Crop slugs used in URLs -> crop names
+CROP_NAME_MAP = {
+    'sugarcane': 'Sugarcane',
+    'cotton': 'Cotton', 
+    'soyabean': 'Soyabean',
+    'rice': 'Rice',
+    'jowar': 'Jowar',
+    'tur': 'Tur (Pigeon Pea)',
+    'wheat': 'Wheat',
+    'groundnut': 'Groundnut',
+    'onion': 'Onion',
+    'tomato': 'Tomato',
+    'potato': 'Potato',
+    'garlic': 'Garlic'
+}
+
+# Soil requirements for each crop
+CROP_REQUIREMENTS = {
+    'Sugarcane': {
+        'ideal_conditions': ['High Nitrogen', 'High/Medium Potassium', 'High/Medium OC', 'Non-Saline EC', 'Neutral/Alkaline pH'],
+        'critical_factors': ['Nitrogen', 'EC', 'pH'],
+        'growth_period': 365,  # days
+        'seasons': ['Kharif', 'Rabi']
+    },
+    'Cotton': {
+        'ideal_conditions': ['High/Medium Phosphorus', 'High/Medium Potassium', 'Sufficient Zinc', 'Neutral/Alkaline pH'],
+        'critical_factors': ['Phosphorus', 'Zinc', 'pH'],
+        'growth_period': 180,
+        'seasons': ['Kharif']
+    },
+    'Soyabean': {
+        'ideal_conditions': ['High/Medium Phosphorus', 'Sufficient Boron', 'Sufficient Sulphur', 'Neutral/Acidic pH'],
+        'critical_factors': ['Phosphorus', 'Boron', 'pH'],
+        'growth_period': 100,
+        'seasons': ['Kharif']
+    },
+    'Rice': {
+        'ideal_conditions': ['High/Medium Nitrogen', 'High/Medium Phosphorus', 'Non-Saline EC', 'High Rainfall'],
+        'critical_factors': ['Nitrogen', 'EC', 'Rainfall'],
+        'growth_period': 120,
+        'seasons': ['Kharif', 'Rabi']
+    },
+    'Jowar': {
+        'ideal_conditions': ['High/Medium Potassium', 'Sufficient Zinc', 'Non-Saline EC', 'Neutral/Alkaline pH'],
+        'critical_factors': ['Potassium', 'Zinc', 'EC'],
+        'growth_period': 110,
+        'seasons': ['Kharif', 'Rabi']
+    },
+    'Tur (Pigeon Pea)': {
+        'ideal_conditions': ['High/Medium OC', 'Sufficient Iron', 'Medium Rainfall'],
+        'critical_factors': ['OC', 'Iron', 'Rainfall'],
+        'growth_period': 150,
+        'seasons': ['Kharif']
+    },
+    'Wheat': {
+        'ideal_conditions': ['High/Medium Nitrogen', 'High/Medium Phosphorus', 'Neutral pH', 'Sufficient Zinc'],
+        'critical_factors': ['Nitrogen', 'Phosphorus', 'pH', 'Zinc'],
+        'growth_period': 120,
+        'seasons': ['Rabi']
+    },
+    'Groundnut': {
+        'ideal_conditions': ['High/Medium Phosphorus', 'Sufficient Boron', 'Non-Saline EC', 'Neutral pH'],
+        'critical_factors': ['Phosphorus', 'Boron', 'EC'],
+        'growth_period': 110,
+        'seasons': ['Kharif', 'Rabi']
+    },
+    'Onion': {
+        'ideal_conditions': ['High/Medium Potassium', 'Sufficient Sulphur', 'High/Medium OC'],
+        'critical_factors': ['Potassium', 'Sulphur', 'OC'],
+        'growth_period': 150,
+        'seasons': ['Rabi', 'Summer']
+    },
+    'Tomato': {
+        'ideal_conditions': ['High/Medium NPK', 'Sufficient Zinc', 'Sufficient Boron'],
+        'critical_factors': ['Nitrogen', 'Phosphorus', 'Potassium'],
+        'growth_period': 120,
+        'seasons': ['Rabi', 'Summer']
+    },
+    'Potato': {
+        'ideal_conditions': ['High/Medium NPK', 'Non-Saline EC', 'Neutral/Alkaline pH'],
+        'critical_factors': ['Nitrogen', 'EC', 'pH'],
+        'growth_period': 90,
+        'seasons': ['Rabi']
+    },
+    'Garlic': {
+        'ideal_conditions': ['High/Medium Nitrogen', 'High/Medium Potassium', 'Sufficient Zinc', 'Neutral/Alkaline pH'],
+        'critical_factors': ['Nitrogen', 'Potassium', 'pH'],
+        'growth_period': 150,
+        'seasons': ['Rabi']
+    }
+}
+
 def analyze_soil_for_crop(crop_name, soil_params):
     """Analyze soil conditions and provide recommendations for specific crop"""
-    crop_map = {
-        'sugarcane': 'Sugarcane',
-        'cotton': 'Cotton', 
-        'soyabean': 'Soyabean',
-        'rice': 'Rice',
-        'jowar': 'Jowar',
-        'tur': 'Tur (Pigeon Pea)',
-        'wheat': 'Wheat',
-        'groundnut': 'Groundnut',
-        'onion': 'Onion',
-        'tomato': 'Tomato',
-        'potato': 'Potato',
-        'garlic': 'Garlic'
-    }
+    formal_crop_name = CROP_NAME_MAP.get(crop_name.lower(), crop_name.title())
     
-    formal_crop_name = crop_map.get(crop_name.lower(), crop_name.title())
-    
-    # Soil requirements for each crop
-    crop_requirements = {
-        'Sugarcane': {
-            'ideal_conditions': ['High Nitrogen', 'High/Medium Potassium', 'High/Medium OC', 'Non-Saline EC', 'Neutral/Alkaline pH'],
-            'critical_factors': ['Nitrogen', 'EC', 'pH'],
-            'growth_period': 365,  # days
-            'seasons': ['Kharif', 'Rabi']
-        },
-        'Cotton': {
-            'ideal_conditions': ['High/Medium Phosphorus', 'High/Medium Potassium', 'Sufficient Zinc', 'Neutral/Alkaline pH'],
-            'critical_factors': ['Phosphorus', 'Zinc', 'pH'],
-            'growth_period': 180,
-            'seasons': ['Kharif']
-        },
-        'Soyabean': {
-            'ideal_conditions': ['High/Medium Phosphorus', 'Sufficient Boron', 'Sufficient Sulphur', 'Neutral/Acidic pH'],
-            'critical_factors': ['Phosphorus', 'Boron', 'pH'],
-            'growth_period': 100,
-            'seasons': ['Kharif']
-        },
-        'Rice': {
-            'ideal_conditions': ['High/Medium Nitrogen', 'High/Medium Phosphorus', 'Non-Saline EC', 'High Rainfall'],
-            'critical_factors': ['Nitrogen', 'EC', 'Rainfall'],
-            'growth_period': 120,
-            'seasons': ['Kharif', 'Rabi']
-        },
-        'Jowar': {
-            'ideal_conditions': ['High/Medium Potassium', 'Sufficient Zinc', 'Non-Saline EC', 'Neutral/Alkaline pH'],
-            'critical_factors': ['Potassium', 'Zinc', 'EC'],
-            'growth_period': 110,
-            'seasons': ['Kharif', 'Rabi']
-        },
-        'Tur (Pigeon Pea)': {
-            'ideal_conditions': ['High/Medium OC', 'Sufficient Iron', 'Medium Rainfall'],
-            'critical_factors': ['OC', 'Iron', 'Rainfall'],
-            'growth_period': 150,
-            'seasons': ['Kharif']
-        },
-        'Wheat': {
-            'ideal_conditions': ['High/Medium Nitrogen', 'High/Medium Phosphorus', 'Neutral pH', 'Sufficient Zinc'],
-            'critical_factors': ['Nitrogen', 'Phosphorus', 'pH', 'Zinc'],
-            'growth_period': 120,
-            'seasons': ['Rabi']
-        },
-        'Groundnut': {
-            'ideal_conditions': ['High/Medium Phosphorus', 'Sufficient Boron', 'Non-Saline EC', 'Neutral pH'],
-            'critical_factors': ['Phosphorus', 'Boron', 'EC'],
-            'growth_period': 110,
-            'seasons': ['Kharif', 'Rabi']
-        },
-        'Onion': {
-            'ideal_conditions': ['High/Medium Potassium', 'Sufficient Sulphur', 'High/Medium OC'],
-            'critical_factors': ['Potassium', 'Sulphur', 'OC'],
-            'growth_period': 150,
-            'seasons': ['Rabi', 'Summer']
-        },
-        'Tomato': {
-            'ideal_conditions': ['High/Medium NPK', 'Sufficient Zinc', 'Sufficient Boron'],
-            'critical_factors': ['Nitrogen', 'Phosphorus', 'Potassium'],
-            'growth_period': 120,
-            'seasons': ['Rabi', 'Summer']
-        },
-        'Potato': {
-            'ideal_conditions': ['High/Medium NPK', 'Non-Saline EC', 'Neutral/Alkaline pH'],
-            'critical_factors': ['Nitrogen', 'EC', 'pH'],
-            'growth_period': 90,
-            'seasons': ['Rabi']
-        },
-        'Garlic': {
-            'ideal_conditions': ['High/Medium Nitrogen', 'High/Medium Potassium', 'Sufficient Zinc', 'Neutral/Alkaline pH'],
-            'critical_factors': ['Nitrogen', 'Potassium', 'pH'],
-            'growth_period': 150,
-            'seasons': ['Rabi']
-        }
-    }
-    
-    crop_info = crop_requirements.get(formal_crop_name, {})
+    crop_info = CROP_REQUIREMENTS.get(formal_crop_name, {})
     recommendations = []
     deficiencies = []
     
@@ -504,30 +397,9 @@ def analyze_soil_for_crop(crop_name, soil_params):
 
 def calculate_soil_score(crop_name, soil_params):
     """Calculate a soil suitability score (0-100) for the crop"""
-    # This is a simplified scoring system
-    score = 50  # Base score
-    
-    crop_preferences = {
-        'Sugarcane': {'Nitrogen': ['High', 'Medium'], 'EC': ['Non-Saline'], 'pH': ['Neutral', 'Alkaline']},
-        'Cotton': {'Phosphorus': ['High', 'Medium'], 'pH': ['Neutral', 'Alkaline'], 'Zinc': ['Sufficient']},
-        'Soyabean': {'Phosphorus': ['High', 'Medium'], 'pH': ['Neutral', 'Acidic'], 'Boron': ['Sufficient']},
-        'Rice': {'Nitrogen': ['High', 'Medium'], 'EC': ['Non-Saline'], 'Rainfall': ['High']},
-        'Wheat': {'Nitrogen': ['High', 'Medium'], 'pH': ['Neutral'], 'Zinc': ['Sufficient']},
-        'Groundnut': {'Phosphorus': ['High', 'Medium'], 'EC': ['Non-Saline'], 'pH': ['Neutral']},
-        'Potato': {'Nitrogen': ['High', 'Medium'], 'EC': ['Non-Saline'], 'pH': ['Neutral', 'Alkaline']},
-        'Garlic': {'Nitrogen': ['High', 'Medium'], 'pH': ['Neutral', 'Alkaline'], 'Potassium': ['High', 'Medium']}
-    }
-    
-    preferences = crop_preferences.get(crop_name, {})
-    
-    for param, preferred_values in preferences.items():
-        if param in soil_params:
-            if soil_params[param] in preferred_values:
-                score += 10
-            else:
-                score -= 5
-    
-    return max(0, min(100, score))
+    # Preferences live in soil_scoring.CROP_PREFERENCES, compiled once;
+    # every crop is scored in the same pass
+    return SOIL_SCORER.score(soil_params).get(crop_name, BASE_SCORE)
 
 def generate_crop_timeline(crop_name, soil_params, crop_evaluations):
     """Generate fully dynamic timeline based on comprehensive soil analysis"""
@@ -1436,19 +1308,9 @@ def get_cost_benchmarks(crop):
 def get_locations():
     """Get hierarchical location data from Excel database"""
     try:
-        # Read Excel file
-        excel_file = Path(ROOT) / "cropresults_with_state (1).xlsx"
-        df = pd.read_excel(excel_file)
-        
-        # Clean column names
-        df.columns = df.columns.str.strip()
-        
-        # Get unique states
-        states = df['STATE'].dropna().unique().tolist()
-        
         return jsonify({
             'success': True,
-            'states': sorted([s for s in states if pd.notna(s)])
+            'states': location_store.get_states()
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
@@ -1458,15 +1320,9 @@ def get_locations():
 def get_districts(state):
     """Get districts for a specific state"""
     try:
-        excel_file = Path(ROOT) / "cropresults_with_state (1).xlsx"
-        df = pd.read_excel(excel_file)
-        df.columns = df.columns.str.strip()
-        
-        districts = df[df['STATE'] == state]['DISTRICT NAME'].dropna().unique().tolist()
-        
         return jsonify({
             'success': True,
-            'districts': sorted([d for d in districts if pd.notna(d)])
+            'districts': location_store.get_districts(state)
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
@@ -1476,37 +1332,73 @@ def get_districts(state):
 def get_blocks(state, district):
     """Get blocks for a specific state and district"""
     try:
-        excel_file = Path(ROOT) / "cropresults_with_state (1).xlsx"
-        df = pd.read_excel(excel_file)
-        df.columns = df.columns.str.strip()
-        
-        blocks = df[(df['STATE'] == state) & (df['DISTRICT NAME'] == district)]['BLOCK NAME'].dropna().unique().tolist()
-        
         return jsonify({
             'success': True,
-            'blocks': sorted([b for b in blocks if pd.notna(b)])
+            'blocks': location_store.get_blocks(state, district)
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+# Largest page /api/get-villages hands out
+MAX_PAGE_SIZE = 1000
+
+def parse_page_limit(value):
+    """Page size from a query string value, None when absent"""
+    if not value:
+        return None
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+    return limit
+
 @app.route('/api/get-villages/<state>/<district>/<block>')
 @require_login
 def get_villages(state, district, block):
-    """Get villages for a specific state, district, and block"""
+    """
+    Get villages for a specific state, district, and block
+    Optional ?limit=&cursor= pagination; ?format=ndjson streams one village per line
+    """
     try:
-        excel_file = Path(ROOT) / "cropresults_with_state (1).xlsx"
-        df = pd.read_excel(excel_file)
-        df.columns = df.columns.str.strip()
-        
-        villages = df[
-            (df['STATE'] == state) & 
-            (df['DISTRICT NAME'] == district) & 
-            (df['BLOCK NAME'] == block)
-        ]['VILLAGE NAME'].dropna().unique().tolist()
-        
+        villages = location_store.get_villages(state, district, block)
+        try:
+            limit = parse_page_limit(request.args.get('limit'))
+            page, next_cursor = paginate_sorted(villages, limit=limit, cursor=request.args.get('cursor') or None)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+
+        if request.args.get('format') == 'ndjson':
+            return ndjson_response(
+                {'state': state, 'district': district, 'block': block, 'village': village}
+                for village in page
+            )
+
+        response = {'success': True, 'villages': page}
+        if limit is not None or request.args.get('cursor'):
+            response['total'] = len(villages)
+            response['next_cursor'] = next_cursor
+        return jsonify(response)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/search-locations')
+@require_login
+def search_locations():
+    """Type-ahead search over district, block and village names (?q=&limit=&type=)"""
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'success': False, 'error': 'Missing search text'}), 400
+        try:
+            limit = min(max(int(request.args.get('limit', 10)), 1), 50)
+        except ValueError:
+            limit = 10
+        kinds = [kind.strip() for kind in request.args.get('type', '').split(',') if kind.strip()]
         return jsonify({
             'success': True,
-            'villages': sorted([v for v in villages if pd.notna(v)])
+            'results': location_store.search(query, limit=limit, kinds=kinds or None)
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
@@ -1634,23 +1526,17 @@ def calculate_water_requirement():
 def get_location_data(state, district, block, village):
     """Get soil and climate data for specific location"""
     try:
-        excel_file = Path(ROOT) / "cropresults_with_state (1).xlsx"
-        df = pd.read_excel(excel_file)
-        df.columns = df.columns.str.strip()
+        # One dataset version answers the whole request, even across a reload
+        store = location_store
         
         # Find matching location
-        location_data = df[
-            (df['STATE'] == state) & 
-            (df['DISTRICT NAME'] == district) & 
-            (df['BLOCK NAME'] == block) & 
-            (df['VILLAGE NAME'] == village)
-        ]
+        position = store.find_village_row(state, district, block, village)
         
-        if location_data.empty:
+        if position is None:
             return jsonify({'success': False, 'error': 'Location not found'})
         
         # Get first matching row
-        row = location_data.iloc[0]
+        row = store.get_soil_values(position)
         
         # Extract soil and climate data
         soil_data = {
@@ -1664,11 +1550,9 @@ def get_location_data(state, district, block, village):
         
         # Extract crop suitability
         crop_suitability = {}
-        crop_columns = ['Sugarcane', 'Cotton', 'Soyabean', 'Rice', 'Jowar', 'Tur (Pigeon Pea)', 'Wheat', 'Groundnut', 'Onion', 'Tomato', 'Potato', 'Garlic']
         
-        for crop in crop_columns:
-            if crop in row:
-                crop_suitability[crop.lower().replace(' ', '_').replace('(', '').replace(')', '')] = row[crop]
+        for crop, suitability in store.get_crop_suitability(position).items():
+            crop_suitability[crop.lower().replace(' ', '_').replace('(', '').replace(')', '')] = suitability
         
         # Extract climate data
         climate_data = {
@@ -2669,9 +2553,100 @@ def predict_manual():
     crop_data = evaluate_all_crops(form_data)
     return render_template("index.html", crop_data=crop_data, manual=True)
 
+# Session soil_data key (stored by /predict-manual) -> rule attribute
+SESSION_SOIL_ATTRIBUTES = {
+    'nitrogen': 'Nitrogen', 'phosphorus': 'Phosphorus', 'potassium': 'Potassium',
+    'organic_carbon': 'OC', 'ec': 'EC', 'ph': 'pH', 'copper': 'Copper', 'boron': 'Boron',
+    'sulphur': 'Sulphur', 'iron': 'Iron', 'zinc': 'Zinc', 'manganese': 'Manganese',
+    'temp_summer': 'Temperature_Summer', 'temp_winter': 'Temperature_Winter',
+    'temp_monsoon': 'Temperature_Monsoon', 'rainfall': 'Rainfall'
+}
+
+@app.route('/api/what-if', methods=['POST'])
+@require_login
+def what_if_soil_changes():
+    """Fewest soil changes that make a crop Highly Suitable, for the posted
+    profile or the one last entered on /predict-manual; "already" is true,
+    with no options, when the crop is there already"""
+    try:
+        data = request.get_json(silent=True) or {}
+        profile = data.get('profile')
+        if not profile:
+            soil_data = session.get('soil_data') or {}
+            profile = {attr: soil_data.get(key, '') for key, attr in SESSION_SOIL_ATTRIBUTES.items() if soil_data.get(key)}
+        if not profile or not data.get('crop'):
+            return jsonify({'success': False, 'error': 'A crop and a soil profile (or a prior manual analysis) are required'}), 400
+
+        result = RULE_ENGINE.what_if(
+            normalize_input(profile),
+            data['crop'],
+            target=data.get('target') or 'Highly Suitable',
+            limit=min(max(int(data.get('limit', 5)), 1), 20)
+        )
+        return jsonify({'success': True, **result})
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/crop/rank', methods=['POST'])
+@require_login
+def rank_crops():
+    """Every crop scored 0-100 against the posted profile (or the one last
+    entered on /predict-manual), best first, in one call"""
+    try:
+        data = request.get_json(silent=True) or {}
+        profile = data.get('profile')
+        if not profile:
+            soil_data = session.get('soil_data') or {}
+            profile = {attr: soil_data.get(key, '') for key, attr in SESSION_SOIL_ATTRIBUTES.items() if soil_data.get(key)}
+        if not profile or not isinstance(profile, dict):
+            return jsonify({'success': False, 'error': 'A soil profile (or a prior manual analysis) is required'}), 400
+
+        return jsonify({'success': True, 'crops': SOIL_SCORER.rank(normalize_input(profile))})
+    except (AttributeError, TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/crop/similar-villages', methods=['POST'])
+@require_login
+def similar_villages():
+    """Villages with the soil and climate nearest the posted village or
+    profile (or the one last entered on /predict-manual), nearest first"""
+    try:
+        data = request.get_json(silent=True) or {}
+        k = parse_k(data.get('k'))
+        index = similarity_index(location_store)
+
+        location = None
+        if data.get('village'):
+            location = tuple(data.get(level) or '' for level in ('state', 'district', 'block', 'village'))
+            vector = index.village_vector(location)
+            if vector is None:
+                return jsonify({'success': False, 'error': 'Location not found'}), 404
+        else:
+            profile = data.get('profile')
+            if not profile:
+                soil_data = session.get('soil_data') or {}
+                profile = {attr: soil_data.get(key, '') for key, attr in SESSION_SOIL_ATTRIBUTES.items() if soil_data.get(key)}
+            if not profile:
+                return jsonify({'success': False, 'error': 'A village or a soil profile (or a prior manual analysis) is required'}), 400
+            # Numeric readings pass through; level texts are normalized
+            levels, readings = split_profile(profile)
+            vector = index.encode_profile({**normalize_input(levels), **readings})
+
+        return jsonify({'success': True, 'villages': index.nearest(vector, k, exclude=location)})
+    except (AttributeError, TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/data')
 def get_dropdown_data():
-    return jsonify(dropdown_data)
+    # Serialized and compressed once per dataset version; 304 on If-None-Match
+    store = location_store
+    return store.cached('data', lambda: PreparedJson(store.get_hierarchy())).response()
 
 @app.route('/mandis/<state>')
 def get_mandis(state):
@@ -2953,31 +2928,17 @@ def get_location_soil_data(state, district, block, village):
     Extract soil nutrient data from Excel file based on location
     """
     try:
-        import pandas as pd
-        excel_file = r"cropresults_with_state (1).xlsx"
-        df = pd.read_excel(excel_file)
-        
-        # Clean column names (remove trailing spaces)
-        df.columns = df.columns.str.strip()
-        
-        # Filter by location hierarchy (most specific to least specific)
-        location_filter = df['STATE'] == state
+        store = location_store
         
-        if district and district.strip():
-            location_filter &= (df['DISTRICT NAME'] == district)
-        if block and block.strip():
-            location_filter &= (df['BLOCK NAME'] == block)
-        if village and village.strip():
-            location_filter &= (df['VILLAGE NAME'] == village)
+        # Match the location hierarchy (most specific to least specific)
+        position = store.find_row(state, district, block, village)
         
-        filtered_data = df[location_filter]
-        
-        if filtered_data.empty:
+        if position is None:
             print(f"⚠️  No data found for location: {state}, {district}, {block}, {village}")
             return None
         
         # Get the first matching record
-        record = filtered_data.iloc[0]
+        record = store.get_soil_values(position)
         
         # Extract soil data in the same format as manual input
         location_soil_data = {
@@ -3493,14 +3454,10 @@ def generate_dynamic_plan():
 
 @app.route('/village-data/<state>/<district>/<block>/<village>')
 def village_data(state, district, block, village):
-    row = df[
-        (df['STATE'] == state) &
-        (df['DISTRICT NAME'] == district) &
-        (df['BLOCK NAME'] == block) &
-        (df['VILLAGE NAME'] == village)
-    ]
+    store = location_store
+    position = store.find_village_row(state, district, block, village)
 
-    if row.empty:
+    if position is None:
         return jsonify({'error': 'No data found'}), 404
 
     # Store location-based soil data in session
@@ -3511,13 +3468,7 @@ def village_data(state, district, block, village):
         session['data_source'] = 'location_based'
         print(f"💾 Stored location-based soil data for: {village}, {district}, {state}")
 
-    crop_columns = [
-        'Sugarcane', 'Cotton', 'Soyabean', 'Rice', 'Jowar',
-        'Tur (Pigeon Pea)', 'Wheat', 'Groundnut', 'Onion', 'Tomato',
-        'Potato', 'Garlic'
-    ]
-
-    crop_data = {col: row.iloc[0][col] for col in crop_columns}
+    crop_data = store.get_crop_suitability(position)
     
     # Add soil data availability info
     response_data = crop_data.copy()
@@ -3889,11 +3840,7 @@ def test_page():
 def get_maharashtra_districts():
     """Get all districts in Maharashtra from Excel"""
     try:
-        df = pd.read_excel('cropresults_with_state (1).xlsx')
-        # Clean district names and remove NaN
-        districts = df['DISTRICT NAME '].dropna().str.strip().unique()
-        districts = [d for d in districts if pd.notna(d) and d != '']
-        districts.sort()
+        districts = location_store.stripped_districts()
         return jsonify({'status': 'success', 'districts': districts})
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)})
@@ -3902,12 +3849,7 @@ def get_maharashtra_districts():
 def get_maharashtra_blocks(district):
     """Get blocks for a specific district in Maharashtra"""
     try:
-        df = pd.read_excel('cropresults_with_state (1).xlsx')
-        # Filter by district and get blocks
-        district_data = df[df['DISTRICT NAME '].str.strip() == district]
-        blocks = district_data['BLOCK NAME '].dropna().str.strip().unique()
-        blocks = [b for b in blocks if pd.notna(b) and b != '']
-        blocks.sort()
+        blocks = location_store.stripped_blocks(district)
         return jsonify({'status': 'success', 'blocks': blocks})
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)})
@@ -3916,15 +3858,7 @@ def get_maharashtra_blocks(district):
 def get_maharashtra_villages(district, block):
     """Get villages for a specific district and block in Maharashtra"""
     try:
-        df = pd.read_excel('cropresults_with_state (1).xlsx')
-        # Filter by district and block
-        filtered_data = df[
-            (df['DISTRICT NAME '].str.strip() == district) & 
-            (df['BLOCK NAME '].str.strip() == block)
-        ]
-        villages = filtered_data['VILLAGE NAME '].dropna().str.strip().unique()
-        villages = [v for v in villages if pd.notna(v) and v != '']
-        villages.sort()
+        villages = location_store.stripped_villages(district, block)
         return jsonify({'status': 'success', 'villages': villages})
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)})
@@ -3959,8 +3893,6 @@ def get_maharashtra_crops():
 def get_location_crop_suitability(district, block, village, crop):
     """Get crop suitability for specific location"""
     try:
-        df = pd.read_excel('cropresults_with_state (1).xlsx')
-        
         # Find the crop column name
         crop_column_map = {
             'sugarcane': 'Sugarcane',
@@ -3981,33 +3913,36 @@ def get_location_crop_suitability(district, block, village, crop):
         if not crop_column:
             return jsonify({'status': 'error', 'message': 'Invalid crop type'})
         
-        # Filter data for specific location
-        location_data = df[
-            (df['DISTRICT NAME '].str.strip() == district) & 
-            (df['BLOCK NAME '].str.strip() == block) &
-            (df['VILLAGE NAME '].str.strip() == village)
-        ]
+        # Find the specific location
+        store = location_store
+        position = store.find_stripped_row(district, block, village)
         
-        if location_data.empty:
+        if position is None:
             return jsonify({'status': 'error', 'message': 'Location not found'})
         
         # Get suitability and soil data
-        suitability = location_data[crop_column].iloc[0] if not location_data[crop_column].empty else 'Not Available'
-        
-        # Get soil parameters
+        suitability = store.get_crop_suitability(position).get(crop_column, 'Not Available')
+        soil = soil_profiles(store)
+        readings = soil.reading_values(position)
+        bands = soil.band_values(position)
+        
+        # Numeric readings with the usual defaults where the dataset has none
+        # (the Maharashtra workbook holds bands only), and the band of each
+        soil_keys = {
+            'nitrogen': ('NITROGEN', 0), 'phosphorus': ('PHOSPHORUS', 0), 'potassium': ('POTASSIUM', 0),
+            'ph': ('pH', 7.0), 'organic_carbon': ('OC', 0), 'ec': ('EC', 0)
+        }
         soil_data = {
-            'nitrogen': float(location_data['NITROGEN'].iloc[0]) if pd.notna(location_data['NITROGEN'].iloc[0]) else 0,
-            'phosphorus': float(location_data['PHOSPHORUS'].iloc[0]) if pd.notna(location_data['PHOSPHORUS'].iloc[0]) else 0,
-            'potassium': float(location_data['POTASSIUM'].iloc[0]) if pd.notna(location_data['POTASSIUM'].iloc[0]) else 0,
-            'ph': float(location_data['pH'].iloc[0]) if pd.notna(location_data['pH'].iloc[0]) else 7.0,
-            'organic_carbon': float(location_data['OC'].iloc[0]) if pd.notna(location_data['OC'].iloc[0]) else 0,
-            'ec': float(location_data['EC'].iloc[0]) if pd.notna(location_data['EC'].iloc[0]) else 0
+            key: default if readings.get(col) is None else readings[col]
+            for key, (col, default) in soil_keys.items()
         }
+        soil_bands = {key: bands.get(col) for key, (col, _) in soil_keys.items()}
         
         return jsonify({
             'status': 'success',
             'suitability': suitability,
             'soil_data': soil_data,
+            'soil_bands': soil_bands,
             'location': {
                 'district': district,
                 'block': block,
@@ -4018,6 +3953,43 @@ def get_location_crop_suitability(district, block, village, crop):
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)})
 
+# ---------------------------
+# Health and Dataset Reload
+# ---------------------------
+
+@app.route('/health')
+def health_check():
+    """Health check with the crop dataset version being served"""
+    store = location_store
+    status = dataset_reloader.status()
+    return jsonify({
+        'status': 'healthy',
+        'dataset_version': store.version,
+        'dataset': {
+            'version': store.version,
+            'fingerprint': store.fingerprint,
+            'rows': store.rows,
+            'reloading': status['reloading'],
+            'last_reload': status['last_reload'],
+            'last_error': status['last_error']
+        }
+    })
+
+@app.route('/api/admin/reload-dataset', methods=['POST'])
+def reload_dataset():
+    """Rebuild the crop dataset in the background; requires X-Admin-Token"""
+    token = request.headers.get('X-Admin-Token', '')
+    if not ADMIN_RELOAD_TOKEN or not hmac.compare_digest(token.encode(), ADMIN_RELOAD_TOKEN.encode()):
+        return jsonify({'success': False, 'error': 'Forbidden'}), 403
+
+    # Every worker process reloads, through the shared trigger file
+    started = dataset_reloader.request_reload()
+    return jsonify({
+        'success': True,
+        'message': 'Dataset reload started' if started else 'Dataset reload already in progress',
+        'dataset_version': location_store.version
+    }), 202
+
 # ---------------------------
 # Run the Server
 # ---------------------------
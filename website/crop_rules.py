@@ -0,0 +1,795 @@
+"""
+Crop Rules Module
+The crop suitability rules as one declarative table, compiled into lookup
+arrays so any number of soil profiles is scored against every crop at once
+"""
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# Category values each soil/climate attribute can take; anything else
+# (including a missing attribute) satisfies no rule
+ATTRIBUTE_LEVELS = {
+    'Nitrogen': ('High', 'Medium', 'Low'),
+    'Phosphorus': ('High', 'Medium', 'Low'),
+    'Potassium': ('High', 'Medium', 'Low'),
+    'OC': ('High', 'Medium', 'Low'),
+    'EC': ('Non-Saline', 'Saline'),
+    'pH': ('Neutral', 'Alkaline', 'Acidic'),
+    'Zinc': ('Sufficient', 'Deficient'),
+    'Boron': ('Sufficient', 'Deficient'),
+    'Sulphur': ('Sufficient', 'Deficient'),
+    'Copper': ('Sufficient', 'Deficient'),
+    'Iron': ('Sufficient', 'Deficient'),
+    'Manganese': ('Sufficient', 'Deficient'),
+    'Temperature_Summer': ('High', 'Medium', 'Low'),
+    'Temperature_Winter': ('High', 'Medium', 'Low'),
+    'Temperature_Monsoon': ('High', 'Medium', 'Low'),
+    'Rainfall': ('High', 'Medium', 'Low'),
+}
+ATTRIBUTES = list(ATTRIBUTE_LEVELS)
+
+# Attributes a farmer can change (fertilizer, amendments, liming); the
+# temperature and rainfall bands are taken as given
+AMENDABLE_ATTRIBUTES = [
+    'Nitrogen', 'Phosphorus', 'Potassium', 'OC', 'EC', 'pH',
+    'Zinc', 'Boron', 'Sulphur', 'Copper', 'Iron', 'Manganese'
+]
+
+# Result labels, indexed by the codes the engine returns
+SUITABILITY_LABELS = ('Not Suitable', 'Moderately Suitable', 'Highly Suitable')
+NOT_SUITABLE, MODERATELY_SUITABLE, HIGHLY_SUITABLE = range(3)
+
+_HM = ('High', 'Medium')
+_TEMPERATURES = ('Temperature_Summer', 'Temperature_Winter', 'Temperature_Monsoon')
+
+# crop -> conditions and thresholds. A condition is (attribute, allowed
+# values); a tuple of attributes means any one of them may satisfy it.
+# A crop is Highly Suitable when at least `highly` conditions hold and
+# Moderately Suitable when at least `moderately` hold.
+CROP_RULES: Dict[str, Dict[str, Any]] = {
+    'Sugarcane': {'highly': 6, 'moderately': 5, 'conditions': [
+        ('Nitrogen', _HM), ('Potassium', _HM), ('OC', _HM), ('EC', ('Non-Saline',)),
+        ('pH', ('Neutral', 'Alkaline')), ('Temperature_Winter', ('High',)), ('Rainfall', _HM),
+    ]},
+    'Cotton': {'highly': 5, 'moderately': 4, 'conditions': [
+        ('Phosphorus', _HM), ('Potassium', _HM), ('Zinc', ('Sufficient',)),
+        ('pH', ('Neutral', 'Alkaline')), ('Temperature_Winter', ('High',)), ('Rainfall', _HM),
+    ]},
+    'Soyabean': {'highly': 5, 'moderately': 4, 'conditions': [
+        ('Phosphorus', _HM), ('Boron', ('Sufficient',)), ('Sulphur', ('Sufficient',)),
+        ('OC', _HM), ('pH', ('Neutral', 'Acidic')), ('Rainfall', _HM),
+    ]},
+    'Rice': {'highly': 5, 'moderately': 4, 'conditions': [
+        ('Nitrogen', _HM), ('Phosphorus', _HM), ('pH', ('Neutral', 'Acidic', 'Alkaline')),
+        ('EC', ('Non-Saline',)), ('Temperature_Winter', ('High',)), ('Rainfall', ('High',)),
+        (('Boron', 'Copper'), ('Sufficient',)),
+    ]},
+    'Jowar': {'highly': 5, 'moderately': 4, 'conditions': [
+        ('Potassium', _HM), ('Zinc', ('Sufficient',)), ('EC', ('Non-Saline',)),
+        ('pH', ('Neutral', 'Alkaline')), ('Temperature_Winter', ('High',)), ('Rainfall', ('Medium',)),
+    ]},
+    'Tur (Pigeon Pea)': {'highly': 5, 'moderately': 4, 'conditions': [
+        ('Phosphorus', ('High', 'Medium', 'Low')), ('OC', _HM), ('Iron', ('Sufficient',)),
+        ('pH', ('Neutral', 'Alkaline', 'Acidic')), ('Temperature_Winter', ('High',)), ('Rainfall', _HM),
+    ]},
+    'Wheat': {'highly': 6, 'moderately': 5, 'conditions': [
+        ('Nitrogen', _HM), ('Phosphorus', _HM), ('Potassium', _HM), ('Zinc', ('Sufficient',)),
+        ('Iron', ('Sufficient',)), ('Manganese', ('Sufficient',)), ('pH', ('Neutral',)),
+        ('Temperature_Monsoon', ('Medium',)), ('Rainfall', _HM),
+    ]},
+    'Groundnut': {'highly': 6, 'moderately': 5, 'conditions': [
+        ('Phosphorus', _HM), ('Potassium', _HM), ('Boron', ('Sufficient',)), ('EC', ('Non-Saline',)),
+        ('pH', ('Neutral',)), ('Temperature_Winter', ('High',)), ('Rainfall', ('Medium',)),
+    ]},
+    'Onion': {'highly': 5, 'moderately': 3, 'conditions': [
+        ('Potassium', _HM), ('Sulphur', ('Sufficient',)), ('Zinc', ('Sufficient',)),
+        ('OC', _HM), (_TEMPERATURES, _HM),
+    ]},
+    'Tomato': {'highly': 5, 'moderately': 4, 'conditions': [
+        ('Nitrogen', _HM), ('Phosphorus', _HM), ('Potassium', _HM), ('Zinc', ('Sufficient',)),
+        ('Boron', ('Sufficient',)), (_TEMPERATURES, _HM),
+    ]},
+    'Potato': {'highly': 6, 'moderately': 5, 'conditions': [
+        ('Nitrogen', _HM), ('Phosphorus', _HM), ('Potassium', _HM), ('EC', ('Non-Saline',)),
+        ('pH', ('Neutral', 'Alkaline')), ('Temperature_Summer', _HM), ('Temperature_Monsoon', _HM),
+    ]},
+    'Garlic': {'highly': 5, 'moderately': 4, 'conditions': [
+        ('Nitrogen', _HM), ('Potassium', _HM), ('OC', _HM), ('pH', ('Neutral', 'Alkaline')),
+        ('Zinc', ('Sufficient',)), ('Temperature_Winter', _HM), ('Rainfall', _HM),
+    ]},
+}
+
+# Profiles scored per block of work in evaluate_codes; keeps the temporary
+# arrays of million-profile batches cache-sized
+EVALUATE_CHUNK_ROWS = 1 << 16
+
+# what_if level grids kept per engine (one per attribute set, the full
+# amendable set is about 31k rows); least recently used ones are dropped
+GRID_CACHE_SIZE = 8
+
+# Precomputed table of every banded profile; rebuilt whenever the rules,
+# the levels or this format change (see SuitabilityTable)
+TABLE_FORMAT_VERSION = 1
+TABLE_META_FILE = 'meta.json'
+TABLE_DATA_FILE = 'labels.npy'
+DEFAULT_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'crop_rules.table')
+
+
+def rules_checksum(rules: Mapping[str, Mapping[str, Any]] = CROP_RULES,
+                   levels: Mapping[str, Iterable[str]] = ATTRIBUTE_LEVELS) -> str:
+    """Content hash of a rule table and its attribute levels"""
+    spec = {
+        'format': TABLE_FORMAT_VERSION,
+        'levels': {name: list(values) for name, values in levels.items()},
+        'rules': rules
+    }
+    return hashlib.sha1(json.dumps(spec, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+class CropRuleEngine:
+    """
+    Crop rules compiled into lookup arrays
+
+    Profiles are encoded as one small integer per attribute (0 for an
+    unknown value). For every attribute the engine holds a table
+    ``code -> per-crop bitmask of the conditions that value satisfies``;
+    OR-ing the rows picked by a profile's codes gives the conditions met
+    for each crop, a popcount table turns those into counts, and the
+    thresholds into label codes. Scoring N profiles is a handful of
+    gathers over N x crops arrays with no per-profile Python.
+    """
+
+    def __init__(self, rules: Mapping[str, Mapping[str, Any]] = CROP_RULES,
+                 levels: Mapping[str, Iterable[str]] = ATTRIBUTE_LEVELS):
+        """
+        Args:
+            rules: crop -> {'conditions', 'highly', 'moderately'}, as CROP_RULES
+            levels: attribute -> category values, as ATTRIBUTE_LEVELS
+        """
+        self.crops = list(rules)
+        self.checksum = rules_checksum(rules, levels)
+        self.attributes = list(levels)
+        # Code 0 is "unknown"; level i of an attribute is code i + 1
+        self.levels = {name: list(values) for name, values in levels.items()}
+        self._codes = {name: {value: i + 1 for i, value in enumerate(values)}
+                       for name, values in self.levels.items()}
+        self.conditions = [list(rules[crop]['conditions']) for crop in self.crops]
+
+        widest = max(len(conditions) for conditions in self.conditions)
+        if widest > 16:
+            raise ValueError(f"at most 16 conditions per crop are supported, got {widest}")
+
+        # attribute -> (codes, crops) uint16 bitmask of satisfied conditions
+        self._masks = {
+            name: np.zeros((len(values) + 1, len(self.crops)), dtype=np.uint16)
+            for name, values in self.levels.items()
+        }
+        for j, conditions in enumerate(self.conditions):
+            for bit, (attributes, allowed) in enumerate(conditions):
+                if isinstance(attributes, str):
+                    attributes = (attributes,)
+                for name in attributes:
+                    for value in allowed:
+                        self._masks[name][self._codes[name][value], j] |= 1 << bit
+        # Only attributes some rule reads take part in evaluation
+        self._used = [i for i, name in enumerate(self.attributes) if self._masks[name].any()]
+
+        # The same masks with every crop's 16 bits packed into one int, for
+        # scoring a single profile without array overhead
+        self._packed = {
+            name: {
+                value: sum(int(mask) << (16 * j) for j, mask in enumerate(masks[code]))
+                for value, code in self._codes[name].items()
+            }
+            for name, masks in self._masks.items() if masks.any()
+        }
+
+        self._widest = widest
+        self._popcount = np.array([bin(i).count('1') for i in range(1 << widest)], dtype=np.int8)
+        self._highly = np.array([rules[crop]['highly'] for crop in self.crops], dtype=np.int8)
+        self._moderately = np.array([rules[crop]['moderately'] for crop in self.crops], dtype=np.int8)
+        self._popcount_list = self._popcount.tolist()
+        # Level combinations enumerated by what_if, per attribute set
+        self._grids: 'OrderedDict[Tuple[str, ...], np.ndarray]' = OrderedDict()
+        self._grids_lock = threading.Lock()
+        self._highly_list = self._highly.tolist()
+        self._moderately_list = self._moderately.tolist()
+
+    def encode(self, profiles: Iterable[Mapping[str, Any]]) -> np.ndarray:
+        """
+        Encode soil profiles for evaluate_codes
+
+        Args:
+            profiles: Normalized attribute -> value mappings
+
+        Returns:
+            (profiles, attributes) int8 codes, 0 where a value is missing
+            or not one of the attribute's levels
+        """
+        profiles = profiles if isinstance(profiles, list) else list(profiles)
+        codes = np.zeros((len(profiles), len(self.attributes)), dtype=np.int8)
+        for i, name in enumerate(self.attributes):
+            lookup = self._codes[name]
+            codes[:, i] = np.fromiter(
+                (lookup.get(profile.get(name), 0) for profile in profiles),
+                dtype=np.int8, count=len(profiles)
+            )
+        return codes
+
+    def encode_columns(self, columns: Mapping[str, Any], rows: Optional[int] = None) -> np.ndarray:
+        """
+        Encode column-oriented profiles, e.g. a DataFrame
+
+        Args:
+            columns: attribute -> sequence of values; missing attributes
+                encode as unknown
+            rows: Number of profiles, needed only when no attribute is given
+
+        Returns:
+            (profiles, attributes) int8 codes as from encode
+        """
+        if rows is None:
+            rows = len(next(iter(columns[name] for name in self.attributes if name in columns), []))
+        codes = np.zeros((rows, len(self.attributes)), dtype=np.int8)
+        for i, name in enumerate(self.attributes):
+            if name in columns:
+                categorical = pd.Categorical(columns[name], categories=self.levels[name])
+                codes[:, i] = categorical.codes + 1
+        return codes
+
+    def condition_bits(self, codes: np.ndarray) -> np.ndarray:
+        """
+        Conditions met by encoded profiles
+
+        Returns:
+            (profiles, crops) uint16; bit k of column j is set when
+            condition k of crop j holds
+        """
+        codes = np.asarray(codes)
+        bits = np.zeros((len(codes), len(self.crops)), dtype=np.uint16)
+        for i in self._used:
+            bits |= self._masks[self.attributes[i]][codes[:, i]]
+        return bits
+
+    def conditions_met(self, bits: np.ndarray) -> np.ndarray:
+        """Number of conditions met, from condition_bits output"""
+        return self._popcount[bits]
+
+    def evaluate_codes(self, codes: np.ndarray, with_bits: bool = False):
+        """
+        Score encoded profiles against every crop
+
+        Args:
+            codes: (profiles, attributes) codes from encode or encode_columns
+            with_bits: Also return the condition bitmasks the labels were
+                derived from (see condition_bits and explain); they are
+                computed either way, so this only costs the extra array
+
+        Returns:
+            (profiles, crops) int8 label codes indexing SUITABILITY_LABELS,
+            or (labels, bits) with with_bits
+        """
+        codes = np.asarray(codes)
+        labels = np.empty((len(codes), len(self.crops)), dtype=np.int8)
+        bits = np.empty((len(codes), len(self.crops)), dtype=np.uint16) if with_bits else None
+        for start in range(0, len(codes), EVALUATE_CHUNK_ROWS):
+            chunk = slice(start, start + EVALUATE_CHUNK_ROWS)
+            chunk_bits = self.condition_bits(codes[chunk])
+            if with_bits:
+                bits[chunk] = chunk_bits
+            met = self._popcount[chunk_bits]
+            labels[chunk] = np.where(
+                met >= self._highly, HIGHLY_SUITABLE,
+                np.where(met >= self._moderately, MODERATELY_SUITABLE, NOT_SUITABLE)
+            )
+        return (labels, bits) if with_bits else labels
+
+    def _packed_bits(self, profile: Mapping[str, Any]) -> int:
+        """Condition bits of one profile, 16 per crop packed into one int"""
+        bits = 0
+        for name, packed in self._packed.items():
+            bits |= packed.get(profile.get(name), 0)
+        return bits
+
+    def evaluate_one(self, profile: Mapping[str, Any]) -> Dict[str, str]:
+        """
+        Score one soil profile against every crop
+
+        Same result as ``evaluate([profile])[0]``, computed on packed ints,
+        which is several times faster than the array path for one profile.
+        """
+        bits = self._packed_bits(profile)
+        results = {}
+        for j, crop in enumerate(self.crops):
+            met = self._popcount_list[(bits >> (16 * j)) & 0xFFFF]
+            code = (HIGHLY_SUITABLE if met >= self._highly_list[j]
+                    else MODERATELY_SUITABLE if met >= self._moderately_list[j] else NOT_SUITABLE)
+            results[crop] = SUITABILITY_LABELS[code]
+        return results
+
+    def explain(self, bits: Iterable[int], profile: Mapping[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """
+        Decode one profile's condition bitmasks
+
+        Args:
+            bits: Per-crop condition bitmask, e.g. a row of condition_bits
+            profile: The normalized profile, to report the values that failed
+
+        Returns:
+            crop -> {'suitability', 'mask', 'conditions_met',
+            'conditions_total', 'needed_for_highly', 'needed_for_moderately',
+            'failed': [{'factor', 'attributes', 'accepted', 'actual'}]}
+        """
+        explanation = {}
+        for j, (crop, mask) in enumerate(zip(self.crops, bits)):
+            mask = int(mask)
+            met = self._popcount_list[mask]
+            code = (HIGHLY_SUITABLE if met >= self._highly_list[j]
+                    else MODERATELY_SUITABLE if met >= self._moderately_list[j] else NOT_SUITABLE)
+            failed = []
+            for bit, (attributes, accepted) in enumerate(self.conditions[j]):
+                if mask >> bit & 1:
+                    continue
+                attributes = (attributes,) if isinstance(attributes, str) else tuple(attributes)
+                failed.append({
+                    'factor': ' or '.join(attributes),
+                    'attributes': list(attributes),
+                    'accepted': list(accepted),
+                    'actual': {name: profile.get(name) for name in attributes}
+                })
+            explanation[crop] = {
+                'suitability': SUITABILITY_LABELS[code],
+                'mask': mask,
+                'conditions_met': met,
+                'conditions_total': len(self.conditions[j]),
+                'needed_for_highly': self._highly_list[j],
+                'needed_for_moderately': self._moderately_list[j],
+                'failed': failed
+            }
+        return explanation
+
+    def explain_one(self, profile: Mapping[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """Score one profile and say which conditions each crop failed"""
+        bits = self._packed_bits(profile)
+        return self.explain([(bits >> (16 * j)) & 0xFFFF for j in range(len(self.crops))], profile)
+
+    def evaluate(self, profiles: Iterable[Mapping[str, Any]], explain: bool = False):
+        """
+        Score soil profiles against every crop
+
+        Args:
+            profiles: Normalized attribute -> value mappings
+            explain: Also return one explain() result per profile
+
+        Returns:
+            One crop -> suitability label dict per profile, or (results,
+            explanations) with explain
+        """
+        profiles = profiles if isinstance(profiles, list) else list(profiles)
+        codes = self.encode(profiles)
+        if explain:
+            labels, bits = self.evaluate_codes(codes, with_bits=True)
+        else:
+            labels = self.evaluate_codes(codes)
+        results = [
+            dict(zip(self.crops, (SUITABILITY_LABELS[code] for code in row)))
+            for row in labels.tolist()
+        ]
+        if not explain:
+            return results
+        return results, [self.explain(row, profile) for row, profile in zip(bits.tolist(), profiles)]
+
+    def _level_probabilities(self, name: str, value: Any) -> np.ndarray:
+        """
+        Probability of each code of an attribute
+
+        A plain value is certain (an unknown one is code 0, as in encode);
+        a mapping gives level -> probability and is scaled to sum to 1.
+
+        Raises:
+            ValueError: For an unknown level, a negative or non-numeric
+                probability, or probabilities that sum to zero
+        """
+        p = np.zeros(len(self.levels[name]) + 1)
+        if not isinstance(value, Mapping):
+            p[self._codes[name].get(value, 0)] = 1.0
+            return p
+        for level, probability in value.items():
+            code = self._codes[name].get(level)
+            if code is None:
+                raise ValueError(f"Unknown {name} level: {level}")
+            if isinstance(probability, bool) or not isinstance(probability, (int, float)) or probability < 0:
+                raise ValueError(f"{name} probabilities must be non-negative numbers")
+            p[code] += probability
+        total = p.sum()
+        if not total > 0:
+            raise ValueError(f"{name} probabilities must not all be zero")
+        return p / total
+
+    def probabilities(self, profile: Mapping[str, Any]) -> Dict[str, Dict[str, float]]:
+        """
+        Probability of each suitability label per crop for uncertain bands
+
+        Attributes are taken as independent. The joint band space is never
+        expanded: for every crop the engine keeps the exact probability of
+        each condition bitmask (at most 2^16 states, 2^9 for the current
+        rules) and folds the attributes in one at a time, each of its bands
+        OR-ing its condition bits into every state. All crops advance
+        together in one bincount per band, so the result is exact at a cost
+        of a few dozen small array operations.
+
+        Args:
+            profile: Normalized attribute -> value, or attribute ->
+                {level: probability} for an uncertain attribute
+
+        Returns:
+            crop -> {label: probability} for every SUITABILITY_LABELS entry
+
+        Raises:
+            ValueError: For a malformed distribution (see _level_probabilities)
+        """
+        n, states = len(self.crops), 1 << self._widest
+        offsets = (np.arange(n, dtype=np.int64) * states)[:, None]
+        masks = np.arange(states, dtype=np.int64)[None, :]
+        dist = np.zeros((n, states))
+        dist[:, 0] = 1.0
+        for i in self._used:
+            name = self.attributes[i]
+            p = self._level_probabilities(name, profile.get(name))
+            codes = np.flatnonzero(p)
+            if len(codes) == 1 and not self._masks[name][codes[0]].any():
+                continue
+            folded = np.zeros(n * states)
+            for code in codes:
+                target = offsets + (masks | self._masks[name][code].astype(np.int64)[:, None])
+                folded += np.bincount(target.ravel(), weights=(dist * p[code]).ravel(), minlength=n * states)
+            dist = folded.reshape(n, states)
+
+        met = self._popcount[:states].astype(np.int64)[None, :]
+        highly = (dist * (met >= self._highly[:, None])).sum(axis=1)
+        at_least_moderately = (dist * (met >= self._moderately[:, None])).sum(axis=1)
+        return {
+            crop: {
+                SUITABILITY_LABELS[NOT_SUITABLE]: max(1.0 - float(at_least_moderately[j]), 0.0),
+                SUITABILITY_LABELS[MODERATELY_SUITABLE]: max(float(at_least_moderately[j] - highly[j]), 0.0),
+                SUITABILITY_LABELS[HIGHLY_SUITABLE]: min(float(highly[j]), 1.0)
+            }
+            for j, crop in enumerate(self.crops)
+        }
+
+    def _grid(self, attributes: Tuple[str, ...]) -> np.ndarray:
+        """Every combination of levels of some attributes, as engine codes"""
+        with self._grids_lock:
+            grid = self._grids.get(attributes)
+            if grid is not None:
+                self._grids.move_to_end(attributes)
+                return grid
+        radices = [len(self.levels[name]) for name in attributes]
+        index = np.arange(int(np.prod(radices)), dtype=np.int64)
+        grid = np.zeros((len(index), len(attributes)), dtype=np.int8)
+        for i in reversed(range(len(attributes))):
+            index, digit = np.divmod(index, radices[i])
+            grid[:, i] = digit + 1
+        with self._grids_lock:
+            self._grids[attributes] = grid
+            while len(self._grids) > GRID_CACHE_SIZE:
+                self._grids.popitem(last=False)
+        return grid
+
+    @staticmethod
+    def _changeable(attributes: Optional[Iterable[str]]) -> Tuple[str, ...]:
+        """
+        what_if attributes as distinct AMENDABLE_ATTRIBUTES names, in that
+        list's order, so any spelling of a set shares one grid
+
+        Raises:
+            ValueError: Unless a list of amendable attribute names
+        """
+        if attributes is None:
+            return tuple(AMENDABLE_ATTRIBUTES)
+        if not isinstance(attributes, (list, tuple)):
+            raise ValueError('attributes must be a list of attribute names')
+        invalid = [name if isinstance(name, str) else repr(name)
+                   for name in attributes if not isinstance(name, str) or name not in AMENDABLE_ATTRIBUTES]
+        if invalid:
+            raise ValueError(f"Unknown or unchangeable attributes: {', '.join(invalid)} "
+                             f"(choose from {', '.join(AMENDABLE_ATTRIBUTES)})")
+        chosen = set(attributes)
+        return tuple(name for name in AMENDABLE_ATTRIBUTES if name in chosen)
+
+    def what_if(self, profile: Mapping[str, Any], crop: str, target: str = 'Highly Suitable',
+                attributes: Optional[Iterable[str]] = None, limit: int = 5) -> Dict[str, Any]:
+        """
+        Smallest sets of changes that bring a crop to a target suitability
+
+        Every combination of levels of the changeable attributes (about 31k
+        for the soil attributes) is scored in one evaluate_codes call; the
+        other attributes keep the profile's values. Candidates reaching the
+        target are ranked by number of changes, then by how well all crops
+        do on the changed profile.
+
+        Args:
+            profile: Normalized attribute -> value mapping
+            crop: Crop to improve
+            target: Suitability label to reach
+            attributes: Attributes that may change, a list of
+                AMENDABLE_ATTRIBUTES names (default all of them)
+            limit: Alternatives to return
+
+        Returns:
+            {'crop', 'target', 'current', 'already', 'achievable',
+            'best_reachable', 'options': [{'changes': [{'attribute', 'from',
+            'to'}], 'suitability': {crop: label}}]}; when the crop is
+            already at or above the target, 'already' is True and 'options'
+            empty, and no search is made (so there is no 'best_reachable')
+        """
+        if crop not in self.crops:
+            raise ValueError(f"Unknown crop: {crop}")
+        if target not in SUITABILITY_LABELS:
+            raise ValueError(f"Unknown suitability: {target}")
+        attributes = self._changeable(attributes)
+
+        j, goal = self.crops.index(crop), SUITABILITY_LABELS.index(target)
+        current = self.evaluate_one(profile)[crop]
+        if SUITABILITY_LABELS.index(current) >= goal:
+            return {
+                'crop': crop,
+                'target': target,
+                'current': current,
+                'already': True,
+                'achievable': True,
+                'options': []
+            }
+
+        original = self.encode([profile])[0]
+        grid = self._grid(attributes)
+        columns = [self.attributes.index(name) for name in attributes]
+        codes = np.repeat(original[None, :], len(grid), axis=0)
+        codes[:, columns] = grid
+
+        labels = self.evaluate_codes(codes)
+        changes = (grid != original[columns]).sum(axis=1)
+        reached = np.flatnonzero(labels[:, j] >= goal)
+        result = {
+            'crop': crop,
+            'target': target,
+            'current': current,
+            'already': False,
+            'achievable': bool(len(reached)),
+            'best_reachable': SUITABILITY_LABELS[int(labels[:, j].max())],
+            'options': []
+        }
+        if not len(reached):
+            return result
+
+        # Fewest changes first, then the most suitability across all crops;
+        # one option per set of changed attributes (its best levels)
+        order = np.lexsort((-labels[reached].sum(axis=1, dtype=np.int64), changes[reached]))
+        seen = set()
+        for row in reached[order]:
+            changed = tuple(np.flatnonzero(grid[row] != original[columns]).tolist())
+            if changed in seen:
+                continue
+            seen.add(changed)
+            if len(result['options']) >= limit:
+                break
+            result['options'].append({
+                'changes': [
+                    {
+                        'attribute': name,
+                        'from': profile.get(name),
+                        'to': self.levels[name][grid[row, i] - 1]
+                    }
+                    for i, name in enumerate(attributes) if grid[row, i] != original[columns[i]]
+                ],
+                'suitability': dict(zip(self.crops, (SUITABILITY_LABELS[code] for code in labels[row].tolist())))
+            })
+        return result
+
+
+class SuitabilityTable:
+    """
+    Every banded soil profile's result, precomputed and bit-packed
+
+    All rule attributes take a handful of levels, so the profiles form a
+    mixed-radix space of about 2.5 million points. Each point stores its 12
+    crop labels at 2 bits apiece in 3 bytes (about 7.5 MB), and a profile
+    is answered by computing its index and reading one row. Profiles with
+    a missing or unrecognized value are not in the table and fall back to
+    the rule engine.
+    """
+
+    def __init__(self, engine: CropRuleEngine, packed: np.ndarray, checksum: str):
+        """
+        Use ``SuitabilityTable.build`` or ``load_suitability_table`` rather
+        than calling this directly
+
+        Args:
+            engine: Engine the table was computed from
+            packed: (profiles, 3) uint8 rows, little-endian 2-bit labels
+            checksum: sha1 of the packed rows
+        """
+        self.engine = engine
+        self.packed = packed
+        # Flat byte view for single-row reads without numpy scalar overhead
+        self._bytes = memoryview(packed).cast('B')
+        self.checksum = checksum
+        self.attributes = [engine.attributes[i] for i in engine._used]
+        self._codes = [engine._codes[name] for name in self.attributes]
+        self._decoded: Dict[int, Dict[str, str]] = {}
+
+    @staticmethod
+    def radices(engine: CropRuleEngine) -> List[int]:
+        """Number of levels of each indexed attribute, most significant first"""
+        return [len(engine.levels[engine.attributes[i]]) for i in engine._used]
+
+    @classmethod
+    def build(cls, engine: CropRuleEngine) -> 'SuitabilityTable':
+        """Evaluate every banded profile with the engine"""
+        radices = cls.radices(engine)
+        total = int(np.prod(radices))
+        index = np.arange(total, dtype=np.int64)
+        codes = np.zeros((total, len(engine.attributes)), dtype=np.int8)
+        for i, radix in zip(reversed(engine._used), reversed(radices)):
+            index, digit = np.divmod(index, radix)
+            codes[:, i] = digit + 1
+
+        labels = engine.evaluate_codes(codes).astype(np.uint32)
+        packed = np.zeros(total, dtype=np.uint32)
+        for j in range(len(engine.crops)):
+            packed |= labels[:, j] << (2 * j)
+        rows = packed.view(np.uint8).reshape(total, 4)[:, :3].copy()
+        return cls(engine, rows, hashlib.sha1(rows.tobytes()).hexdigest()[:16])
+
+    def index(self, profile: Mapping[str, Any]) -> Optional[int]:
+        """Row of a profile, or None if one of its values is not a level"""
+        index = 0
+        for name, codes in zip(self.attributes, self._codes):
+            code = codes.get(profile.get(name))
+            if code is None:
+                return None
+            index = index * len(codes) + code - 1
+        return index
+
+    def evaluate_one(self, profile: Mapping[str, Any]) -> Dict[str, str]:
+        """Same result as ``CropRuleEngine.evaluate_one``, read from the table"""
+        index = self.index(profile)
+        if index is None:
+            return self.engine.evaluate_one(profile)
+        packed = int.from_bytes(self._bytes[3 * index:3 * index + 3], 'little')
+        decoded = self._decoded.get(packed)
+        if decoded is None:
+            decoded = {
+                crop: SUITABILITY_LABELS[(packed >> (2 * j)) & 3]
+                for j, crop in enumerate(self.engine.crops)
+            }
+            self._decoded[packed] = decoded
+        return dict(decoded)
+
+    def write(self, path: str) -> str:
+        """
+        Save the table as a directory with labels.npy and meta.json
+
+        Written next to its final location and renamed into place, like
+        the dataset snapshots, so readers never see a half-written table.
+        """
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        np.save(os.path.join(tmp_path, TABLE_DATA_FILE), self.packed)
+        meta = {
+            'format': TABLE_FORMAT_VERSION,
+            'rules_checksum': self.engine.checksum,
+            'data_checksum': self.checksum,
+            'crops': self.engine.crops,
+            'attributes': self.attributes,
+            'profiles': len(self.packed),
+            'created': time.time()
+        }
+        # meta.json is written last: its presence marks a complete table
+        with open(os.path.join(tmp_path, TABLE_META_FILE), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+        old_path = f"{path}.old-{os.getpid()}"
+        if os.path.exists(path):
+            os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+        return path
+
+    @classmethod
+    def read(cls, path: str, engine: CropRuleEngine) -> Optional['SuitabilityTable']:
+        """
+        Memory-map a saved table
+
+        Returns:
+            The table, or None if it is missing, damaged or was built from
+            different rules than the engine's
+        """
+        try:
+            with open(os.path.join(path, TABLE_META_FILE), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('format') != TABLE_FORMAT_VERSION or meta.get('rules_checksum') != engine.checksum:
+                return None
+            packed = np.load(os.path.join(path, TABLE_DATA_FILE), mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+
+        if packed.shape != (int(np.prod(cls.radices(engine))), 3):
+            return None
+        if hashlib.sha1(packed).hexdigest()[:16] != meta.get('data_checksum'):
+            return None
+        return cls(engine, packed, meta['data_checksum'])
+
+
+RULE_ENGINE = CropRuleEngine()
+
+_table: Optional[SuitabilityTable] = None
+_table_lock = threading.Lock()
+
+
+def load_suitability_table(path: Optional[str] = None) -> SuitabilityTable:
+    """
+    Load the precomputed table for RULE_ENGINE, rebuilding it when stale
+
+    The saved table is used when its rules checksum matches the current
+    CROP_RULES and its data checksum verifies; otherwise it is rebuilt and
+    saved in place. A table that cannot be saved is still used from memory.
+
+    Args:
+        path: Table directory (default: crop_rules.table next to this module)
+    """
+    global _table
+    path = path or DEFAULT_TABLE_PATH
+    with _table_lock:
+        table = SuitabilityTable.read(path, RULE_ENGINE)
+        if table is not None:
+            print(f"✓ Loaded crop suitability table ({len(table.packed)} profiles)")
+        else:
+            start = time.perf_counter()
+            table = SuitabilityTable.build(RULE_ENGINE)
+            try:
+                table.write(path)
+                print(f"✓ Built crop suitability table ({len(table.packed)} profiles) "
+                      f"in {time.perf_counter() - start:.2f}s: {path}")
+            except OSError as e:
+                print(f"⚠️ Could not save crop suitability table ({e}); using it from memory")
+        _table = table
+        return table
+
+
+def evaluate_profile(data: Dict[str, str]) -> Dict[str, str]:
+    """
+    Suitability of every crop for one normalized soil profile
+
+    Answered from the precomputed table once load_suitability_table has
+    run, otherwise by the rule engine. "Rainfall overall" is accepted as
+    the name of the Rainfall attribute.
+    """
+    if "Rainfall overall" in data:
+        data["Rainfall"] = data.pop("Rainfall overall")
+    table = _table
+    if table is not None:
+        return table.evaluate_one(data)
+    return RULE_ENGINE.evaluate_one(data)
+
+
+if __name__ == '__main__':
+    # Table build step: python crop_rules.py [table_path]
+    target = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_TABLE_PATH
+    start = time.perf_counter()
+    built = SuitabilityTable.build(RULE_ENGINE)
+    built.write(target)
+    print(f"✓ Table written to {target}: {len(built.packed)} profiles, "
+          f"rules {RULE_ENGINE.checksum}, data {built.checksum}, {time.perf_counter() - start:.2f}s")
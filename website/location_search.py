@@ -0,0 +1,191 @@
+"""
+Location Search Module
+Type-ahead search over district, block and village names: a sorted prefix
+index for "starts with" matches and a trigram index for misspellings
+"""
+import re
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+# Entry tuples are location paths; their length says what they name
+KIND_BY_DEPTH = {2: 'district', 3: 'block', 4: 'village'}
+KIND_ORDER = {'district': 0, 'block': 1, 'village': 2}
+
+# Candidates scoring below this trigram similarity are not returned
+MIN_TRIGRAM_SIMILARITY = 0.3
+# Prefix matches scanned per query before ranking (bounds 1-letter queries)
+MAX_PREFIX_CANDIDATES = 128
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+_REPEATS = re.compile(r'(.)\1+')
+_ASPIRATED = re.compile(r'([b-df-gj-np-tv-z])h')
+_WORD_START = re.compile(r'(?<= )\S')
+_FOLD = str.maketrans({'w': 'v', 'z': 'j', 'q': 'k', 'f': 'p', 'y': 'i'})
+
+
+def fold_name(name: str) -> str:
+    """
+    Reduce a romanized place name to a spelling-insensitive search key
+
+    Lower-cases, drops punctuation and merges the usual transliteration
+    variants: doubled letters (Pimpalgaon/Pimpalgaaon), ee/oo vs i/u,
+    aspirated consonants (Khed/Ked, Kolhapur/Kolapur) and w/v, z/j, q/k,
+    f/ph, y/i.
+    """
+    key = _NON_ALNUM.sub(' ', str(name).lower()).strip()
+    key = key.replace('ee', 'i').replace('oo', 'u')
+    key = _REPEATS.sub(r'\1', key)
+    key = _ASPIRATED.sub(r'\1', key)
+    return key.translate(_FOLD)
+
+
+def _trigrams(key: str) -> set:
+    """Trigrams of a padded key, so short names still produce some"""
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class LocationSearchIndex:
+    """
+    Ranked name search over location paths
+
+    Ranking, best first: exact name, name prefix, prefix of a later word in
+    the name, then trigram similarity. Ties go to districts before blocks
+    before villages and then to shorter names.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, ...]]):
+        """
+        Args:
+            entries: Location paths, e.g. (state, district) for a district or
+                (state, district, block, village) for a village
+        """
+        self._entries: List[Tuple[str, ...]] = list(entries)
+
+        # Entries that share a folded name share one key
+        key_ids: Dict[str, int] = {}
+        key_entries: List[List[int]] = []
+        for entry_id, entry in enumerate(self._entries):
+            key = fold_name(entry[-1])
+            if not key:
+                continue
+            if key not in key_ids:
+                key_ids[key] = len(key_entries)
+                key_entries.append([])
+            key_entries[key_ids[key]].append(entry_id)
+        self._keys = list(key_ids)
+        self._key_entries = [
+            sorted(ids, key=lambda i: (len(self._entries[i]), self._entries[i]))
+            for ids in key_entries
+        ]
+
+        # Prefix index: every word-start suffix of every key, sorted, so a
+        # bisect finds all names that start with (or have a word starting
+        # with) the query
+        suffixes = []
+        for key_id, key in enumerate(self._keys):
+            suffixes.append((key, key_id))
+            # Later words of multi-word names: "kalas bk" is also found by "bk"
+            for word in _WORD_START.finditer(key):
+                suffixes.append((key[word.start():], key_id))
+        suffixes.sort()
+        self._prefix_strings = [s for s, _ in suffixes]
+        self._prefix_ids = [key_id for _, key_id in suffixes]
+
+        # Trigram index: trigram -> ids of the keys containing it
+        postings: Dict[str, List[int]] = {}
+        self._trigram_counts = np.zeros(len(self._keys), dtype=np.int16)
+        for key_id, key in enumerate(self._keys):
+            grams = _trigrams(key)
+            self._trigram_counts[key_id] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(key_id)
+        self._postings = {gram: np.asarray(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _prefix_matches(self, query: str) -> Dict[int, float]:
+        """Key id -> score for names (or words in names) starting with the query"""
+        matches: Dict[int, float] = {}
+        start = bisect_left(self._prefix_strings, query)
+        for i in range(start, min(start + MAX_PREFIX_CANDIDATES, len(self._prefix_strings))):
+            text = self._prefix_strings[i]
+            if not text.startswith(query):
+                break
+            key_id = self._prefix_ids[i]
+            key = self._keys[key_id]
+            if key == query:
+                score = 3.0
+            elif key.startswith(query):
+                score = 2.0
+            else:
+                score = 1.5
+            # Closer length to the query ranks higher within a tier
+            score -= min(len(key) - len(query), 40) / 100
+            matches[key_id] = max(score, matches.get(key_id, 0.0))
+        return matches
+
+    def _fuzzy_matches(self, query: str, limit: int) -> Dict[int, float]:
+        """Key id -> trigram similarity for the best misspelling candidates"""
+        grams = [gram for gram in _trigrams(query) if gram in self._postings]
+        if not grams:
+            return {}
+        shared = np.bincount(
+            np.concatenate([self._postings[gram] for gram in grams]),
+            minlength=len(self._keys)
+        )
+        query_count = len(_trigrams(query))
+        similarity = shared / (query_count + self._trigram_counts - shared)
+        candidates = np.flatnonzero(similarity >= MIN_TRIGRAM_SIMILARITY)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-similarity[candidates], limit - 1)[:limit]]
+        return {int(key_id): float(similarity[key_id]) for key_id in candidates}
+
+    def search(self, query: str, limit: int = 10, kinds: Optional[Iterable[str]] = None,
+               state: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Find the locations whose names best match a query
+
+        Args:
+            query: Free text, e.g. "agasti" or "pimpalgav"
+            limit: Maximum number of results
+            kinds: Restrict to some of 'district', 'block', 'village'
+            state: Restrict to locations in this state
+
+        Returns:
+            Ranked matches; each carries its full path (state, district,
+            block, village as applicable), a display label, and its score
+        """
+        key = fold_name(query)
+        if not key or limit <= 0:
+            return []
+        kinds = set(kinds) if kinds else None
+
+        scores = self._prefix_matches(key)
+        if len(key) >= 3:
+            for key_id, similarity in self._fuzzy_matches(key, limit * 4).items():
+                scores.setdefault(key_id, similarity)
+
+        ranked = []
+        for key_id, score in scores.items():
+            for entry_id in self._key_entries[key_id]:
+                entry = self._entries[entry_id]
+                kind = KIND_BY_DEPTH.get(len(entry))
+                if (kinds is None or kind in kinds) and (state is None or entry[0] == state):
+                    ranked.append((-score, KIND_ORDER.get(kind, 3), len(entry[-1].strip()), entry))
+        ranked.sort()
+
+        return [self._result(entry, -neg_score) for neg_score, _, _, entry in ranked[:limit]]
+
+    @staticmethod
+    def _result(entry: Tuple[str, ...], score: float) -> Dict[str, Any]:
+        """JSON-ready match; names are kept exactly as stored for follow-up lookups"""
+        result = {'type': KIND_BY_DEPTH.get(len(entry))}
+        result.update(zip(('state', 'district', 'block', 'village'), entry))
+        result['label'] = ', '.join(name.strip() for name in reversed(entry))
+        result['score'] = round(score, 3)
+        return result
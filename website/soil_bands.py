@@ -0,0 +1,87 @@
+"""
+Soil Bands Module
+Numeric soil test and climate readings binned into the bands the crop rules
+use; every band boundary is defined here
+"""
+from typing import Dict, Tuple
+
+import numpy as np
+
+from crop_rules import RULE_ENGINE
+
+# attribute -> (unit, boundaries, bands from lowest to highest). A reading
+# equal to a boundary falls in the upper band. Nutrient limits are the Soil
+# Health Card ratings (available N, P, K in kg/ha; DTPA micronutrients, hot
+# water boron and sulphur in ppm); climate bands match the manual input form.
+BAND_BOUNDARIES: Dict[str, Tuple[str, Tuple[float, ...], Tuple[str, ...]]] = {
+    'Nitrogen': ('kg/ha', (280, 560), ('Low', 'Medium', 'High')),
+    'Phosphorus': ('kg/ha', (10, 25), ('Low', 'Medium', 'High')),
+    'Potassium': ('kg/ha', (110, 280), ('Low', 'Medium', 'High')),
+    'OC': ('%', (0.5, 0.75), ('Low', 'Medium', 'High')),
+    'EC': ('dS/m', (4,), ('Non-Saline', 'Saline')),
+    'pH': ('', (6.5, 7.5), ('Acidic', 'Neutral', 'Alkaline')),
+    'Zinc': ('ppm', (0.6,), ('Deficient', 'Sufficient')),
+    'Boron': ('ppm', (0.5,), ('Deficient', 'Sufficient')),
+    'Sulphur': ('ppm', (10,), ('Deficient', 'Sufficient')),
+    'Copper': ('ppm', (0.2,), ('Deficient', 'Sufficient')),
+    'Iron': ('ppm', (4.5,), ('Deficient', 'Sufficient')),
+    'Manganese': ('ppm', (2,), ('Deficient', 'Sufficient')),
+    'Temperature_Summer': ('°C', (28, 35), ('Low', 'Medium', 'High')),
+    'Temperature_Winter': ('°C', (10, 20), ('Low', 'Medium', 'High')),
+    'Temperature_Monsoon': ('°C', (22, 30), ('Low', 'Medium', 'High')),
+    'Rainfall': ('mm', (500, 1000), ('Low', 'Medium', 'High')),
+}
+
+# Band position (as np.digitize returns it) -> rule engine level code
+_ENGINE_CODES = {
+    name: np.array([RULE_ENGINE.levels[name].index(band) + 1 for band in bands], dtype=np.int8)
+    for name, (_, _, bands) in BAND_BOUNDARIES.items()
+}
+
+
+def band_codes(attribute: str, readings) -> np.ndarray:
+    """
+    Rule engine codes of numeric readings of one attribute
+
+    Args:
+        attribute: Crop rule attribute, a BAND_BOUNDARIES key
+        readings: Numbers in the attribute's unit; NaN for a missing reading
+
+    Returns:
+        int8 codes as from CropRuleEngine.encode, 0 where the reading is missing
+    """
+    readings = np.asarray(readings)
+    if not np.issubdtype(readings.dtype, np.floating):
+        readings = readings.astype(np.float64)
+    _, boundaries, _ = BAND_BOUNDARIES[attribute]
+    # Compared at the readings' precision, so 0.6 stored as float32 is
+    # still on the boundary
+    codes = _ENGINE_CODES[attribute][np.digitize(readings, np.asarray(boundaries, dtype=readings.dtype))]
+    codes[np.isnan(readings)] = 0
+    return codes
+
+
+def band_positions(attribute: str, readings) -> np.ndarray:
+    """
+    Numeric readings as continuous positions on an attribute's band scale
+
+    Band k (0 for the lowest) spans k - 0.5 to k + 0.5 and a reading sits
+    in it linearly, so a reading at the middle of a band lands on k, where
+    a band name alone would put it. The open lowest and highest bands take
+    the width of their neighbour (0 to the boundary and its double when
+    there is only one boundary); positions beyond are clipped.
+
+    Returns:
+        float64 positions, NaN where the reading is missing
+    """
+    readings = np.asarray(readings, dtype=np.float64)
+    boundaries = np.asarray(BAND_BOUNDARIES[attribute][1], dtype=np.float64)
+    if len(boundaries) > 1:
+        edges = np.concatenate((
+            [2 * boundaries[0] - boundaries[1]], boundaries, [2 * boundaries[-1] - boundaries[-2]]
+        ))
+    else:
+        edges = np.array([0.0, boundaries[0], 2 * boundaries[0]])
+    band = np.digitize(readings, boundaries)
+    low, high = edges[band], edges[band + 1]
+    return band - 0.5 + np.clip((readings - low) / (high - low), 0, 1)
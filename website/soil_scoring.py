@@ -0,0 +1,141 @@
+"""
+Soil Scoring Module
+0-100 soil scores for every crop at once, from per-crop preferred soil
+levels compiled into one weight table at import
+"""
+from typing import Any, Dict, Iterable, List, Mapping
+
+import numpy as np
+
+from crop_rules import ATTRIBUTE_LEVELS, CROP_RULES, SUITABILITY_LABELS, evaluate_profile
+
+# Soil levels each crop prefers; crops without an entry keep the base score
+CROP_PREFERENCES = {
+    'Sugarcane': {'Nitrogen': ['High', 'Medium'], 'EC': ['Non-Saline'], 'pH': ['Neutral', 'Alkaline']},
+    'Cotton': {'Phosphorus': ['High', 'Medium'], 'pH': ['Neutral', 'Alkaline'], 'Zinc': ['Sufficient']},
+    'Soyabean': {'Phosphorus': ['High', 'Medium'], 'pH': ['Neutral', 'Acidic'], 'Boron': ['Sufficient']},
+    'Rice': {'Nitrogen': ['High', 'Medium'], 'EC': ['Non-Saline'], 'Rainfall': ['High']},
+    'Wheat': {'Nitrogen': ['High', 'Medium'], 'pH': ['Neutral'], 'Zinc': ['Sufficient']},
+    'Groundnut': {'Phosphorus': ['High', 'Medium'], 'EC': ['Non-Saline'], 'pH': ['Neutral']},
+    'Potato': {'Nitrogen': ['High', 'Medium'], 'EC': ['Non-Saline'], 'pH': ['Neutral', 'Alkaline']},
+    'Garlic': {'Nitrogen': ['High', 'Medium'], 'pH': ['Neutral', 'Alkaline'], 'Potassium': ['High', 'Medium']}
+}
+
+# Score of a crop before any preference is checked, and the points a
+# preferred (or any other given) level adds
+BASE_SCORE = 50
+PREFERRED_POINTS = 10
+OTHER_POINTS = -5
+
+# Lane width and per-attribute bias of the packed single-profile path; a
+# lane holds one crop's points, biased to stay non-negative
+_LANE_BITS = 16
+_LANE_BIAS = -OTHER_POINTS
+
+
+class SoilScorer:
+    """
+    Soil scores of every crop for a profile in one vectorized pass
+
+    Each attribute value encodes as 0 (not given), its level's position
+    (1-based) or one past the last level (a value that is not one of the
+    levels). A weight table holds, per attribute, code and crop, the points
+    that value is worth to that crop, so scoring is a gather over the
+    profile's codes and a sum: 50, plus 10 per preferred level the profile
+    has, minus 5 per preferred attribute given at any other value, clamped
+    to 0-100.
+    """
+
+    def __init__(self, preferences: Mapping[str, Mapping[str, List[str]]] = CROP_PREFERENCES,
+                 crops: Iterable[str] = CROP_RULES):
+        """
+        Args:
+            preferences: Crop -> attribute -> preferred levels
+            crops: Crops to score, in output order
+        """
+        self.crops = list(crops)
+        self.attributes = list(ATTRIBUTE_LEVELS)
+        self._codes = {
+            name: {level: k + 1 for k, level in enumerate(levels)}
+            for name, levels in ATTRIBUTE_LEVELS.items()
+        }
+        self._unknown = np.array([len(ATTRIBUTE_LEVELS[name]) + 1 for name in self.attributes], dtype=np.int8)
+
+        width = int(self._unknown.max()) + 1
+        weights = np.zeros((len(self.attributes), width, len(self.crops)), dtype=np.int16)
+        for j, crop in enumerate(self.crops):
+            for name, preferred in preferences.get(crop, {}).items():
+                i = self.attributes.index(name)
+                weights[i, 1:, j] = OTHER_POINTS
+                for level in preferred:
+                    weights[i, self._codes[name][level], j] = PREFERRED_POINTS
+        self._weights = weights
+
+        # Single profiles: every crop's points for an attribute value packed
+        # into one int, so a profile is one dict probe and add per attribute
+        def pack(row):
+            return sum(int(points + _LANE_BIAS) << (_LANE_BITS * j) for j, points in enumerate(row))
+        self._packed = {
+            name: ({level: pack(weights[i, code]) for level, code in self._codes[name].items()},
+                   pack(weights[i, self._unknown[i]]))
+            for i, name in enumerate(self.attributes) if weights[i].any()
+        }
+        self._packed_absent = pack(np.zeros(len(self.crops), dtype=np.int16))
+        self._bias = BASE_SCORE - _LANE_BIAS * len(self._packed)
+
+    def encode(self, profiles: Iterable[Mapping[str, Any]]) -> np.ndarray:
+        """(profiles, attributes) int8 codes of attribute -> level mappings"""
+        profiles = profiles if isinstance(profiles, list) else list(profiles)
+        codes = np.zeros((len(profiles), len(self.attributes)), dtype=np.int8)
+        for i, name in enumerate(self.attributes):
+            lookup, unknown = self._codes[name], int(self._unknown[i])
+            codes[:, i] = np.fromiter(
+                (lookup.get(profile[name], unknown) if name in profile else 0 for profile in profiles),
+                dtype=np.int8, count=len(profiles)
+            )
+        return codes
+
+    def score_codes(self, codes: np.ndarray) -> np.ndarray:
+        """(profiles, crops) 0-100 scores of encoded profiles"""
+        points = self._weights[np.arange(len(self.attributes)), codes].sum(axis=1)
+        return np.clip(BASE_SCORE + points, 0, 100)
+
+    def score(self, profile: Mapping[str, Any]) -> Dict[str, int]:
+        """
+        Crop -> 0-100 score of one profile
+
+        Same result as ``score_codes(encode([profile]))[0]``, summed on
+        packed ints, which avoids the array overhead for one profile.
+        """
+        total = 0
+        for name, (levels, unknown) in self._packed.items():
+            total += levels.get(profile[name], unknown) if name in profile else self._packed_absent
+        mask = (1 << _LANE_BITS) - 1
+        return {
+            crop: min(max(((total >> (_LANE_BITS * j)) & mask) + self._bias, 0), 100)
+            for j, crop in enumerate(self.crops)
+        }
+
+    def rank(self, profile: Mapping[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Every crop with its score and rule suitability, best score first
+
+        Ties keep the suitability order (Highly before Moderately before
+        Not Suitable), then crop order. "Rainfall overall" is accepted as
+        the name of the Rainfall attribute, as in evaluate_profile.
+        """
+        profile = dict(profile)
+        suitability = evaluate_profile(profile)
+        scores = self.score(profile)
+        order = {label: k for k, label in enumerate(SUITABILITY_LABELS)}
+        ranked = sorted(
+            self.crops,
+            key=lambda crop: (-scores[crop], -order.get(suitability.get(crop), -1))
+        )
+        return [
+            {'crop': crop, 'score': scores[crop], 'suitability': suitability.get(crop)}
+            for crop in ranked
+        ]
+
+
+SOIL_SCORER = SoilScorer()
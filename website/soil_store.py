@@ -0,0 +1,124 @@
+"""
+Soil Store Module
+Typed soil and climate values of every dataset row, decoded once per
+dataset version: float32 readings where the dataset holds numbers and int8
+rule engine band codes for every value
+"""
+import math
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from crop_dataset import SOIL_COLUMNS
+from crop_rules import RULE_ENGINE
+from soil_bands import band_codes
+
+# Dataset soil column -> crop rule attribute
+SOIL_ATTRIBUTES = dict(zip(SOIL_COLUMNS, [
+    'Nitrogen', 'Phosphorus', 'Potassium', 'OC', 'EC', 'pH',
+    'Copper', 'Boron', 'Sulphur', 'Iron', 'Zinc', 'Manganese',
+    'Temperature_Summer', 'Temperature_Winter', 'Temperature_Monsoon',
+    'Rainfall'
+]))
+
+
+def _reading(label: Any) -> float:
+    """Numeric value of a dataset cell, NaN for a band name or a missing cell"""
+    if isinstance(label, (bool, np.bool_)):
+        return math.nan
+    if isinstance(label, (int, float, np.integer, np.floating)):
+        return float(label)
+    try:
+        return float(str(label).strip())
+    except ValueError:
+        return math.nan
+
+
+def label_band_codes(attribute: str, labels) -> np.ndarray:
+    """
+    Rule engine codes of dataset cell values of one attribute
+
+    Band names match the attribute's levels case-insensitively (the
+    workbook spells "Non-saline"); numeric values are banded by
+    soil_bands.band_codes; anything else is 0.
+    """
+    labels = list(labels)
+    readings = np.array([_reading(label) for label in labels], dtype=np.float32)
+    levels = {level.lower(): k + 1 for k, level in enumerate(RULE_ENGINE.levels[attribute])}
+    names = np.array([levels.get(str(label).strip().lower(), 0) for label in labels], dtype=np.int8)
+    return np.where(np.isnan(readings), names, band_codes(attribute, readings)).astype(np.int8)
+
+
+class SoilProfileStore:
+    """
+    Row-aligned soil readings and bands of a LocationStore
+
+    Cells may hold a band name ("Medium", "Non-saline", ...) or a numeric
+    reading. Each distinct cell value of the store's label table is decoded
+    once by label_band_codes, numbers also kept as readings, so the band
+    boundaries stay in soil_bands; rows are then decoded by indexing the
+    lookup tables with the store's soil codes.
+    """
+
+    def __init__(self, columns, readings: np.ndarray, bands: np.ndarray):
+        """
+        Use ``SoilProfileStore.build`` rather than calling this directly
+
+        Args:
+            columns: Dataset soil columns, in array column order
+            readings: (rows, columns) float32 readings, NaN where the
+                dataset holds a band name or nothing
+            bands: (rows, columns) int8 rule engine codes (1-based level
+                of the column's attribute), 0 where unknown
+        """
+        self.columns = list(columns)
+        self.attributes = [SOIL_ATTRIBUTES[col] for col in self.columns]
+        self.readings = readings
+        self.bands = bands
+        self._levels = [[None] + list(RULE_ENGINE.levels[attribute]) for attribute in self.attributes]
+
+    @classmethod
+    def build(cls, store) -> 'SoilProfileStore':
+        """Decode the soil matrix of a LocationStore"""
+        columns = [col for col in store.soil_columns if col in SOIL_ATTRIBUTES]
+        soil_codes = np.asarray(store.soil_codes)
+        readings = np.full((len(soil_codes), len(columns)), np.nan, dtype=np.float32)
+        bands = np.zeros((len(soil_codes), len(columns)), dtype=np.int8)
+
+        # Each distinct cell value decoded once; the trailing entry decodes
+        # the -1 "missing" code
+        label_readings = np.array([_reading(label) for label in store.soil_labels] + [math.nan], dtype=np.float32)
+        for i, col in enumerate(columns):
+            lookup = np.append(label_band_codes(SOIL_ATTRIBUTES[col], store.soil_labels), np.int8(0))
+            codes = soil_codes[:, store.soil_columns.index(col)]
+            readings[:, i] = label_readings[codes]
+            bands[:, i] = lookup[codes]
+        return cls(columns, readings, bands)
+
+    def band_values(self, position: int) -> Dict[str, Optional[str]]:
+        """Soil/climate column -> rule level name of a row, None if unknown"""
+        return {
+            col: levels[code]
+            for col, levels, code in zip(self.columns, self._levels, self.bands[position].tolist())
+        }
+
+    def reading_values(self, position: int) -> Dict[str, Optional[float]]:
+        """Soil/climate column -> numeric reading of a row, None if the dataset has none"""
+        # Through str, so 7.8 stored as float32 reads back as 7.8
+        return {
+            col: None if math.isnan(value) else float(str(value))
+            for col, value in zip(self.columns, self.readings[position])
+        }
+
+    def profile(self, position: int) -> Dict[str, str]:
+        """Rule attribute -> level of a row, as evaluate_profile takes it; unknown values left out"""
+        return {
+            attribute: levels[code]
+            for attribute, levels, code in zip(self.attributes, self._levels, self.bands[position].tolist())
+            if code
+        }
+
+
+def soil_profiles(store) -> SoilProfileStore:
+    """Soil store of a LocationStore, built once per dataset version"""
+    return store.cached('soil-profiles', lambda: SoilProfileStore.build(store))